@@ -0,0 +1,68 @@
+"""
+Benchmark of parsing a 100k bar `get_ohlc` response into NumPy columns.
+
+Builds a synthetic ``dataReponse`` of 100,000 one minute bars, then compares the time and the
+memory (peak while parsing and retained afterwards, measured with tracemalloc) of the usual
+bar by bar parse into a list of dicts, the bar by bar parse into arrays and the vectorized
+`parse_ohlc` used by ``get_ohlc(..., as_arrays=True)`` and `get_ohlc_history`.
+"""
+import random
+import time
+import tracemalloc
+
+from utradeconnect.ohlcHistory import _parse_ohlc_bars, parse_ohlc
+
+COUNT = 100000
+ROUNDS = 5
+
+
+def response(count):
+    random.seed(7)
+    bars = []
+    timestamp = 1672651500
+    price = 2500.0
+    for _ in range(count):
+        price = round(price + random.uniform(-2, 2), 2)
+        bars.append('{}|{}|{}|{}|{}|{}|{}|'.format(timestamp, price, round(price + 1.5, 2), round(price - 1.25, 2),
+                                                    round(price + 0.35, 2), random.randint(100, 50000),
+                                                    random.randint(0, 900000)))
+        timestamp += 60
+    return {'type': 'success', 'code': 's-instrument-0002', 'result': {'dataReponse': ','.join(bars)}}
+
+
+def dict_parse(response):
+    """Parse the bars the way consumers typically do it by hand."""
+    bars = []
+    for bar in response['result']['dataReponse'].split(','):
+        fields = bar.split('|')
+        bars.append({'timestamp': int(fields[0]), 'open': float(fields[1]), 'high': float(fields[2]),
+                     'low': float(fields[3]), 'close': float(fields[4]), 'volume': int(fields[5]),
+                     'openInterest': int(fields[6])})
+    return bars
+
+
+def bars_parse(response):
+    return _parse_ohlc_bars(response['result']['dataReponse'])
+
+
+def measure(label, parse, response):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        parse(response)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = parse(response)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print('{:<32} {:>8.1f} ms {:>8.2f} us/bar {:>9.1f} MB peak {:>9.1f} MB retained'.format(
+        label, best * 1e3, best / COUNT * 1e6, peak / 2 ** 20, retained / 2 ** 20))
+
+
+if __name__ == '__main__':
+    data = response(COUNT)
+    print('{} bars, response string {:.1f} MB'.format(COUNT, len(data['result']['dataReponse']) / 2 ** 20))
+    measure('list of dicts', dict_parse, data)
+    measure('bar by bar into arrays', bars_parse, data)
+    measure('parse_ohlc (vectorized)', parse_ohlc, data)
@@ -0,0 +1,61 @@
+"""
+Benchmark of replaying a tick journal through the `MDSocket_io` callbacks.
+
+Records a synthetic session of 1501, 1502 and 1512 partial messages into temporary journals,
+raw and packed, then replays them as fast as possible into no-op callbacks, with and without
+decoding, and prints the events/second dispatched on one core. Packed entries are dispatched as
+records, so they skip decoding whatever the socket's `decode` setting.
+"""
+import tempfile
+import time
+
+from utradeconnect import MDSocket_io
+from utradeconnect.replay import JournalReplay
+from utradeconnect.tickJournal import TickJournalWriter
+
+MESSAGES = (
+    ('1501-json-partial', 't:1_{},ltp:1567.5,ltq:75,lut:1204115,ltt:1204115,ap:1566.84,v:4059,tb:15230,ts:14567,'
+                          'c:1560.3,o:1565,h:1570,l:1560,pc:0.46,bi:0|58|1567.5|1,ai:0|73|1568|2'),
+    ('1502-json-partial', 't:2_{},bi:0|50|101.5|2|1|75|101.45|3|2|150|101.4|5|3|25|101.35|1|4|300|101.3|7,'
+                          'ai:0|25|101.55|1|1|100|101.6|4|2|50|101.65|2|3|75|101.7|3|4|200|101.75|6'),
+    ('1512-json-partial', 't:1_{},ltp:2510.15,ltq:10,ltt:1335084020,lut:1335084021'),
+)
+COUNT = 300000
+
+
+class BenchmarkSocket(MDSocket_io):
+    """Counts every event instead of printing it."""
+
+    def __init__(self, **kwargs):
+        super().__init__('', '', base_url='replay', **kwargs)
+        self.count = 0
+        for _, handler in self.events:
+            setattr(self, handler, self.on_tick)
+
+    def on_tick(self, data):
+        self.count += 1
+
+
+def record(directory, packed):
+    """Write COUNT synthetic events one millisecond apart."""
+    journal = TickJournalWriter(directory, packed=packed)
+    receivedAt = time.time_ns()
+    for number in range(COUNT):
+        event, message = MESSAGES[number % len(MESSAGES)]
+        journal.record(event, message.format(22 + number % 50), receivedAt + number * 1000000)
+    journal.close()
+    return receivedAt
+
+
+if __name__ == '__main__':
+    for packed in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            recordedAt = record(directory, packed)
+            for decode in (False, True):
+                socket = BenchmarkSocket(decode=decode)
+                result = JournalReplay(socket, directory).run()
+                print('packed={!s:<5} decode={!s:<5}  {:>8,} events in {:.2f}s   {:>10,.0f} events/s'.format(
+                    packed, decode, socket.count, result['seconds'], result['eventsPerSecond']))
+            socket = BenchmarkSocket()
+            result = JournalReplay(socket, directory).run(speed=10.0, end=recordedAt + 1000 * 1000000)
+            print('paced x10, first recorded second: {} events in {:.3f}s'.format(result['events'], result['seconds']))
@@ -39,6 +39,7 @@ setup(
         "six==1.15.0",
         "urllib3==1.26.4",
         "websocket-client==0.57.0",
+        "numpy>=1.20",
         "python-dotenv",
         "Sphinx",
         "sphinx-copybutton",
@@ -47,6 +48,9 @@ setup(
         "setuptools",
         "wheel"
     ],
+    extras_require={
+        "async": ["aiohttp>=3.7"],
+    },
     project_urls={
         'Documentation': 'https://docs.utrade.solutions/',
         'Source': 'https://github.com/utrade/utradeconnect',
@@ -3,14 +3,18 @@ The `utradeconnect` module provides classes for connecting to the Utrade platfor
 
 Available classes:
 - `UtradeConnect`: Main class for establishing a connection to the Utrade platform.
+- `AsyncUtradeConnect`: asyncio version of `UtradeConnect` (requires aiohttp).
 - `MDSocket_io`: Class for handling market data socket connections.
+- `AsyncMDSocket_io`: asyncio market data socket delivering events through a queue (requires aiohttp).
 - `OrderSocket_io`: Class for handling order socket connections.
 """
 
 from utradeconnect.index import UtradeConnect
+from utradeconnect.asyncIndex import AsyncUtradeConnect
 from utradeconnect.marketSocket import MDSocket_io
+from utradeconnect.asyncMarketSocket import AsyncMDSocket_io
 from utradeconnect.orderSocket import OrderSocket_io
 from utradeconnect.__version__ import __version__
-__all__= ["UtradeConnect", 'MDSocket_io', 'OrderSocket_io']
+__all__= ["UtradeConnect", "AsyncUtradeConnect", 'MDSocket_io', 'AsyncMDSocket_io', 'OrderSocket_io']
 
 VERSION = __version__
\ No newline at end of file
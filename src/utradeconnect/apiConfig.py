@@ -52,6 +52,54 @@ market_routes = {
 
 all_routes = {**orders_routes, **market_routes}
 
+# Request priorities of the scheduler in `APIRequest`, lower values are served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Rate limit group and default priority of every route. The broker limits requests per
+# second per group; order entry outranks the order book, trade book and portfolio polling
+# that shares its group or runs next to it.
+route_groups = {
+    "user.login": ("session", PRIORITY_HIGH),
+    "user.logout": ("session", PRIORITY_HIGH),
+    "market.login": ("session", PRIORITY_HIGH),
+    "market.logout": ("session", PRIORITY_HIGH),
+    "order.place": ("orders", PRIORITY_HIGH),
+    "order.modify": ("orders", PRIORITY_HIGH),
+    "order.cancel": ("orders", PRIORITY_HIGH),
+    "order.cancelall": ("orders", PRIORITY_HIGH),
+    "bracketorder.place": ("orders", PRIORITY_HIGH),
+    "bracketorder.modify": ("orders", PRIORITY_HIGH),
+    "bracketorder.cancel": ("orders", PRIORITY_HIGH),
+    "order.place.cover": ("orders", PRIORITY_HIGH),
+    "order.modify.cover": ("orders", PRIORITY_HIGH),
+    "order.exit.cover": ("orders", PRIORITY_HIGH),
+    "portfolio.positions.convert": ("orders", PRIORITY_HIGH),
+    "portfolio.squareoff": ("orders", PRIORITY_HIGH),
+    "orders": ("orders", PRIORITY_LOW),
+    "order.status": ("orders", PRIORITY_LOW),
+    "order.history": ("orders", PRIORITY_LOW),
+    "order.dealer.status": ("orders", PRIORITY_LOW),
+    "trades": ("orders", PRIORITY_LOW),
+    "dealer.trades": ("orders", PRIORITY_LOW),
+    "user.profile": ("portfolio", PRIORITY_LOW),
+    "user.balance": ("portfolio", PRIORITY_LOW),
+    "portfolio.positions": ("portfolio", PRIORITY_LOW),
+    "portfolio.holdings": ("portfolio", PRIORITY_LOW),
+    "portfolio.dealerpositions": ("portfolio", PRIORITY_LOW),
+    "market.instruments.ohlc": ("market", PRIORITY_LOW),
+}
+
+# Token buckets per group used with ``rate_limits=True``: sustained requests per second and
+# burst size. These are conservative starting points, not the broker's published limits, so set
+# them to your account's limits. Groups without an entry (session) are not limited.
+rate_limits = {
+    "orders": {"rate": 10, "burst": 10},
+    "portfolio": {"rate": 5, "burst": 5},
+    "market": {"rate": 10, "burst": 10},
+}
+
 def get_orders_routes():
     """
     Returns the dictionary containing API routes for Orders.
@@ -78,3 +126,30 @@ def get_all_routes():
         dict: Dictionary containing all API routes.
     """
     return all_routes
+
+def get_route_group(route):
+    """
+    Returns the rate limit group and default priority of a route.
+
+    Market data routes not listed in `route_groups` belong to the "market" group, anything else
+    to the "orders" group, both at normal priority.
+
+    Args:
+        route (str): The route name, e.g. "order.place".
+
+    Returns:
+        tuple: ``(group, priority)``.
+    """
+    group = route_groups.get(route)
+    if group is None:
+        group = ("market" if route in market_routes else "orders", PRIORITY_NORMAL)
+    return group
+
+def get_rate_limits():
+    """
+    Returns the token bucket settings per route group used when client-side rate limiting is enabled.
+
+    Returns:
+        dict: Group name -> {"rate": requests per second, "burst": bucket size}.
+    """
+    return rate_limits
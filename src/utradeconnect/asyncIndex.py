@@ -0,0 +1,69 @@
+from utradeconnect.asyncMarket import AsyncUtradeMarketConnect
+from utradeconnect.asyncOrders import AsyncUtradeOrderConnect
+
+
+class AsyncUtradeConnect(AsyncUtradeMarketConnect, AsyncUtradeOrderConnect):
+    """
+    AsyncUtradeConnect class represents an asyncio connection to the Utrade API.
+
+    It exposes an awaitable version of every `UtradeConnect` method over a pooled async HTTP
+    transport, so quotes, orders and positions can be requested concurrently from one event loop:
+
+        async with AsyncUtradeConnect(apiKey, secretKey, source, root=BASE_URL, pool=50) as connect:
+            await connect.marketdata_login()
+            quotes = await asyncio.gather(*(connect.get_quote(chunk, 1501, "JSON") for chunk in chunks))
+
+    Args:
+        apiKey (str): The API key for authentication.
+        secretKey (str): The secret key for authentication.
+        source (str): The source identifier for the connection.
+
+    Attributes:
+        apiKey (str): The API key for authentication.
+        secretKey (str): The secret key for authentication.
+        source (str): The source identifier for the connection.
+        root (str): The root URL for the connection to the Utrade API, defaults to production environment.
+        debug (bool): A boolean flag indicating if debug mode is enabled, defaults to False.
+        timeout (int): The timeout for the connection, defaults to 100.
+        pool (int or dict): The number of keep-alive connections per host, or a pool configuration dict, see `APIRequest`.
+        concurrency (int): The maximum number of requests in flight, defaults to the pool size.
+        disable_ssl (bool): A boolean flag indicating if SSL is disabled, defaults to False.
+        market_data_api_key (str): optional, The API key for authentication for the market data connection, defaults to apiKey.
+        market_data_api_secret (str): optional, The secret key for authentication for the market data connection, defaults to secretKey.
+        rate_limits (dict or bool): optional, Client-side requests per second per route group, as for `UtradeConnect`;
+            queued requests wait on the event loop. Defaults to None, no client-side limiting.
+    """
+
+    def __init__(
+            self,
+            apiKey,
+            secretKey,
+            source,
+            root=None,
+            debug=False,
+            timeout=None,
+            pool=None,
+            concurrency=None,
+            disable_ssl=False,
+            market_data_api_key=None,
+            market_data_api_secret=None,
+            rate_limits=None,
+            ):
+        config = {
+            "source": source,
+            "base_url": root[:-1] if root and root.endswith('/') else root,
+            "debug": debug,
+            "timeout": timeout,
+            "pool": pool,
+            "concurrency": concurrency,
+            "disable_ssl": disable_ssl,
+            "rate_limits": rate_limits
+            }
+        # initialize the AsyncUtradeMarketConnect and AsyncUtradeOrderConnect classes
+        if not market_data_api_key:
+            market_data_api_key = apiKey
+        if not market_data_api_secret:
+            market_data_api_secret = secretKey
+        AsyncUtradeMarketConnect.__init__(self, config, apiKey=market_data_api_key, secretKey=market_data_api_secret)
+        # Both halves share the session created above, and with it one connection pool
+        AsyncUtradeOrderConnect.__init__(self, config, apiKey=apiKey, secretKey=secretKey, apiRequest=self.apiRequest)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from utradeconnect.base import AsyncUtradeCommon
+from utradeconnect.bulkQuote import QUOTE_CHUNK_SIZE, check_publish_format, chunk_instruments, merge_quotes
+from utradeconnect.exception import UtradeGeneralException
+from utradeconnect.instrumentMaster import InstrumentMaster
+from utradeconnect.market import UtradeMarketAPI
+from utradeconnect.masterCache import InstrumentMasterCache
+
+
+class AsyncUtradeMarketConnect(UtradeMarketAPI, AsyncUtradeCommon):
+    """
+    Asynchronous market data APIs.
+
+    Awaitable counterparts of every `UtradeMarketConnect` method. The request methods are the
+    shared `UtradeMarketAPI` ones, building the same parameters and handling the responses the
+    same way; only their requests are awaited on the async transport, so calls can be issued
+    concurrently from a single event loop. Bulk quotes and the instrument master cache, which
+    orchestrate several requests, have their asyncio versions here.
+    """
+
+    def __init__(self, config, apiKey, secretKey, apiRequest=None) -> None:
+        # initialize the AsyncUtradeCommon class
+        super().__init__(config=config, apiKey=apiKey, secretKey=secretKey, apiRequest=apiRequest)
+
+    async def get_bulk_quote(self, instruments, eventCode, publishFormat="JSON", chunk_size=QUOTE_CHUNK_SIZE,
+                             raise_errors=True):
+        """
+        Retrieves quotes for any number of instruments in concurrent, server sized chunks.
+
+        The chunks are requested concurrently; the client's `concurrency` limit bounds how many
+        are in flight. Quotes are merged back in input order.
+
+        Args:
+            instruments (list): List of instrument dicts with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): Event code for the quote request, e.g. 1501.
+            publishFormat (str, optional): Format in which the quotes should be published, only "JSON" is
+                supported. Defaults to "JSON".
+            chunk_size (int, optional): Instruments per request. Defaults to `QUOTE_CHUNK_SIZE`.
+            raise_errors (bool, optional): Raise if any chunk fails instead of returning the quotes
+                of the chunks that succeeded. Defaults to True.
+
+        Returns:
+            dict: ``result.listQuotes[i]`` is the quote of ``instruments[i]`` (None if missing),
+            and ``chunks`` lists the size, latency in seconds and error of every request.
+
+        Raises:
+            UtradeInputException: If `publishFormat` is not JSON, see `bulkQuote.check_publish_format`.
+            UtradeGeneralException: If a chunk fails and `raise_errors` is set.
+        """
+        check_publish_format(publishFormat)
+        async def fetch(chunk):
+            start = time.perf_counter()
+            try:
+                response = await self.get_quote(chunk, eventCode, publishFormat)
+            except Exception as e:
+                return chunk, None, time.perf_counter() - start, e
+            return chunk, response, time.perf_counter() - start, None
+
+        results = await asyncio.gather(*(fetch(chunk) for chunk in chunk_instruments(instruments, chunk_size)))
+        return merge_quotes(instruments, results, raise_errors)
+
+    async def get_instrument_master(self, exchangeSegmentList, cache_dir=None, refresh=False, max_age=None):
+        """
+        Retrieves the master data and parses it into an indexed `InstrumentMaster`.
+
+        With `cache_dir` the master is cached on disk per segment list and trading date: the first
+        call of the day downloads and writes it, later calls from any process on the host
+        memory-map the file instead of downloading.
+
+        Args:
+            exchangeSegmentList (list): A list of exchange segments, e.g. ["NSECM", "NSEFO"].
+            cache_dir (str, optional): Directory of the on-disk master cache. Defaults to None, no caching.
+            refresh (bool, optional): Download and rewrite the cached master even if it is fresh.
+            max_age (float, optional): Seconds after which a cached master of today is also refreshed.
+
+        Returns:
+            InstrumentMaster: The master, answering lookups by instrument ID, symbol and contract.
+
+        Raises:
+            UtradeGeneralException: If an error occurs while retrieving or parsing master data.
+        """
+        try:
+            if cache_dir is None:
+                return InstrumentMaster.from_response(await self.get_master(exchangeSegmentList))
+            cache = InstrumentMasterCache(cache_dir, max_age)
+            loop = asyncio.get_running_loop()
+
+            def fetch(segments):
+                # Runs in the executor thread while the event loop downloads the master
+                return asyncio.run_coroutine_threadsafe(self.get_master(segments), loop).result()
+
+            # The cache takes a file lock and reads and writes files, keep it off the event loop
+            return await loop.run_in_executor(None, lambda: cache.get(exchangeSegmentList, fetch, refresh=refresh))
+        except UtradeGeneralException:
+            raise
+        except Exception as e:
+            # Handle exceptions and return a description of the error
+            raise UtradeGeneralException("Error while loading instrument master: " + str(e))
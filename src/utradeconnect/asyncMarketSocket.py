@@ -0,0 +1,196 @@
+import asyncio
+import configparser
+import os
+
+import socketio
+
+from utradeconnect.ticks import decode_event
+
+# Queued once the connection has ended for good, ends `async for` over the socket
+_CLOSED = object()
+
+
+class AsyncMDSocket_io:
+    """An asyncio market data Socket.IO client.
+
+    Unlike `MDSocket_io`, `connect` returns as soon as the connection is established instead of
+    blocking the calling thread in `wait()`, so the socket, the `AsyncUtradeConnect` REST client
+    and strategy code can all run on one event loop. Every market data event (1501, 1502, 1505,
+    1507, 1510, 1512 and 1105, full and partial) is put on an `asyncio.Queue` as an
+    ``(event, data)`` tuple, e.g. ``('1501-json-full', '{...}')``, and can be consumed with
+    ``await socket.get()`` or ``async for event, data in socket``. Iteration ends once the
+    connection has ended for good: after `disconnect`, or when the server drops it and the socket
+    does not reconnect (reconnection disabled or the reconnection attempts exhausted).
+
+    :param token: The market data token obtained from `marketdata_login`.
+    :param userID: The user ID obtained from `marketdata_login`.
+    :param base_url: The root URL, read from config.ini when not given.
+    :param broadcast_mode: 'Full' or 'Partial', read from config.ini when not given.
+    :param queue_size: Maximum number of undelivered events, 0 for unbounded. When the queue is
+                       full the oldest event is dropped and counted in `dropped`.
+    :param reconnection: 'True' if the client should automatically attempt to
+                         reconnect to the server after an interruption.
+    :param reconnection_attempts: How many reconnection attempts to issue
+                                  before giving up, or 0 for infinity attempts.
+    :param reconnection_delay: How long to wait in seconds before the first
+                               reconnection attempt.
+    :param reconnection_delay_max: The maximum delay between reconnection attempts.
+    :param randomization_factor: Randomization amount for each delay between
+                                 reconnection attempts.
+    :param logger: 'True' to enable socket.io and engine.io logging.
+    :param decode: 'True' to queue typed records from `utradeconnect.ticks`
+                   instead of the raw message strings.
+    """
+
+    events = (
+        '1501-json-full', '1501-json-partial',
+        '1502-json-full', '1502-json-partial',
+        '1505-json-full', '1505-json-partial',
+        '1507-json-full',
+        '1510-json-full', '1510-json-partial',
+        '1512-json-full', '1512-json-partial',
+        '1105-json-full', '1105-json-partial',
+    )
+
+    def __init__(self, token, userID, base_url=None, broadcast_mode="FULL", queue_size=0, reconnection=True,
+                 reconnection_attempts=0, reconnection_delay=1, reconnection_delay_max=50000,
+                 randomization_factor=0.5, logger=False, decode=False):
+        self.sid = socketio.AsyncClient(reconnection=reconnection, reconnection_attempts=reconnection_attempts,
+                                        reconnection_delay=reconnection_delay,
+                                        reconnection_delay_max=reconnection_delay_max,
+                                        randomization_factor=randomization_factor, logger=logger,
+                                        engineio_logger=logger)
+        self.eventlistener = self.sid
+        self.queue_size = queue_size
+        self.decode = decode
+        self.queue = None
+        self.dropped = 0
+        self.closed = False
+        self._watcher = None
+
+        self.sid.on('connect', self._on_connect)
+        self.sid.on('disconnect', self._on_disconnect)
+        for event in self.events:
+            self.sid.on(event, self._make_handler(event))
+
+        """Get the root url from config file"""
+        currDirMain = os.getcwd()
+        configParser = configparser.ConfigParser()
+        configFilePath = os.path.join(currDirMain, 'config.ini')
+        configParser.read(configFilePath)
+
+        self.port = base_url if base_url else configParser.get('root_url', 'root')
+        self.userID = userID
+        publishFormat = 'JSON'
+        self.broadcastMode = broadcast_mode if broadcast_mode else configParser.get('root_url', 'broadcastMode')
+        self.token = token
+
+        port = f'{self.port}/?token='
+
+        self.connection_url = port + token + '&userID=' + self.userID + '&publishFormat=' + publishFormat + '&broadcastMode=' + self.broadcastMode
+        self.socketio_path = '/api/V2/market/socket/socket.io'
+
+    def _get_queue(self):
+        """Create the event queue inside the running loop on first use."""
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.queue_size)
+        return self.queue
+
+    def _make_handler(self, event):
+        """Build the socket.io handler that queues every message of `event`."""
+        def handler(data):
+            if self.decode:
+                data = decode_event(event, data)
+            self._put((event, data))
+        return handler
+
+    def _put(self, item):
+        """Queue an item, dropping the oldest undelivered one if the queue is full."""
+        queue = self._get_queue()
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            self.dropped += 1
+            queue.put_nowait(item)
+
+    async def connect(self, headers={}, transports='websocket', namespaces=None):
+        """
+        Connect to the socket.
+
+        Returns once the connection is established; events are then delivered through the queue
+        while the caller keeps using the event loop.
+        """
+        self._get_queue()
+        self.closed = False
+        await self.sid.connect(self.connection_url, headers, transports, namespaces, self.socketio_path)
+        self._watcher = asyncio.ensure_future(self._watch())
+
+    async def _watch(self):
+        """Close the queue once `wait` returns, i.e. the socket gave up reconnecting."""
+        await self.sid.wait()
+        self._close()
+
+    def _close(self):
+        """End iteration after the events already queued."""
+        if not self.closed:
+            self.closed = True
+            self._put(_CLOSED)
+
+    async def wait(self):
+        """Wait until the connection with the server ends."""
+        await self.sid.wait()
+
+    async def disconnect(self):
+        """Disconnect from the socket and end iteration after the events already queued."""
+        await self.sid.disconnect()
+        self._close()
+
+    async def get(self):
+        """
+        Wait for the next market data event.
+
+        Returns:
+            tuple: The ``(event, data)`` pair, e.g. ``('1501-json-full', '{...}')``, or None once
+            the connection has ended and every queued event was delivered.
+        """
+        queue = self._get_queue()
+        item = await queue.get()
+        if item is _CLOSED:
+            # Left in place so every later call returns at once too
+            queue.put_nowait(item)
+            return None
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    async def _on_connect(self):
+        self.on_connect()
+
+    async def _on_disconnect(self):
+        self.on_disconnect()
+        if not self.sid.reconnection:
+            self._close()
+
+    def on_connect(self):
+        """Connect from the socket.
+
+        This method is called when the socket connection is established.
+        This method can be overridden to perform any action on successful connection.
+        """
+        print('Market Data Socket connected successfully!')
+
+    def on_disconnect(self):
+        """Disconnected from the socket"""
+        print('Market Data Socket disconnected!')
+
+    def get_emitter(self):
+        """For getting the event listener"""
+        return self.eventlistener
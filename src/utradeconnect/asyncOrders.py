@@ -0,0 +1,24 @@
+from utradeconnect.base import AsyncUtradeCommon
+from utradeconnect.orders import UtradeOrderAPI
+
+
+class AsyncUtradeOrderConnect(UtradeOrderAPI, AsyncUtradeCommon):
+    """
+    Asynchronous interactive (order and portfolio) APIs.
+
+    Awaitable counterparts of every `UtradeOrderConnect` method. The methods are the shared
+    `UtradeOrderAPI` ones, building the same parameters and handling the responses the same
+    way; only their requests are awaited on the async transport, so calls can be issued
+    concurrently from a single event loop.
+    """
+
+    def __init__(self, config, apiKey, secretKey, apiRequest=None):
+        """
+        Initialize the Orders class.
+
+        Args:
+            config (dict): The configuration dictionary.
+            apiRequest (optional): A transport to share instead of creating one.
+        """
+        # initialize the AsyncUtradeCommon class
+        super().__init__(config=config, apiKey=apiKey, secretKey=secretKey, apiRequest=apiRequest)
@@ -0,0 +1,240 @@
+import asyncio
+from urllib.parse import urljoin
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from utradeconnect.apiConfig import get_all_routes, get_route_group
+from utradeconnect.exception import UtradeGeneralException, UtradeNetworkException
+from utradeconnect.rateLimiter import AsyncRequestScheduler
+from utradeconnect.request import APIRequest, ConfigReader, parse_response
+
+
+class AsyncAPIRequest:
+    """
+    Represents an asynchronous API request.
+
+    The asyncio counterpart of `APIRequest`. Requests share the route table from `apiConfig`
+    and go through a single pooled `aiohttp.ClientSession`, so many calls can be in flight
+    concurrently from one event loop. The number of requests in flight is bounded by
+    `concurrency`; excess calls wait for a free slot instead of opening more connections.
+    Client-side rate limits and HTTP 429 retries work as for `APIRequest`, with the queued
+    requests waiting on the event loop.
+
+    Args:
+        base_url (str, optional): The base URL for the API. Defaults to None.
+        token (str, optional): The authorization token. Defaults to None.
+        disable_ssl (bool, optional): Whether to disable SSL verification. Defaults to False.
+        debug (bool, optional): Whether to enable debug mode. Defaults to False.
+        timeout (int, optional): The timeout for the request in seconds. Defaults to 100.
+        pool (int or dict, optional): Connection pool configuration, same as for `APIRequest`.
+            `pool_maxsize` limits the connections per host and `pool_connections` the number of hosts.
+        concurrency (int, optional): Maximum number of requests in flight. Defaults to `pool_maxsize`.
+        rate_limits (dict or bool, optional): Client-side token buckets per route group, same as for
+            `APIRequest`. Defaults to None, no client-side limiting.
+        throttle_retries (int, optional): Times a request answered with HTTP 429 is queued and
+            sent again before failing. Defaults to 3.
+
+    Raises:
+        UtradeGeneralException: If aiohttp is not installed.
+    """
+
+    def __init__(self, base_url=None, token=None, disable_ssl=False, debug=False, timeout=100, pool=None,
+                 concurrency=None, rate_limits=None, throttle_retries=3):
+        if aiohttp is None:
+            raise UtradeGeneralException("aiohttp is required for the async client, install utradeconnect[async]")
+
+        config_reader = ConfigReader()
+        self.root = base_url if base_url is not None else config_reader.get_root_url()
+        self.token = token
+        self.disable_ssl = disable_ssl if disable_ssl is not None else config_reader.is_ssl_disabled()
+        self.debug = debug
+        self.timeout = timeout
+        self.pool = APIRequest._get_pool_config(pool)
+        self.concurrency = concurrency or self.pool["pool_maxsize"]
+        self._routes = get_all_routes()
+        self.scheduler = APIRequest._create_scheduler(rate_limits, AsyncRequestScheduler)
+        self.throttle_retries = throttle_retries
+        # The session and semaphore are bound to the running loop, create them on first use
+        self.reqsession = None
+        self._semaphore = None
+
+    def _get_session(self):
+        """
+        Create the pooled client session on first use.
+
+        Returns:
+            aiohttp.ClientSession: The session used for every request.
+        """
+        if self.reqsession is None or self.reqsession.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool["pool_maxsize"] * self.pool["pool_connections"],
+                limit_per_host=self.pool["pool_maxsize"],
+                ssl=False if self.disable_ssl else None,
+            )
+            self.reqsession = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self.reqsession
+
+    @staticmethod
+    def _encode_query(params):
+        """
+        Encode query parameters the way `requests` does.
+
+        Args:
+            params (dict or str): The query parameters.
+
+        Returns:
+            dict or str: The parameters with None values dropped and the rest converted to str.
+        """
+        if not isinstance(params, dict):
+            return params
+        return {key: str(value) for key, value in params.items() if value is not None}
+
+    def get_rate_limit_stats(self):
+        """
+        Queueing metrics of the client-side rate limiter.
+
+        Returns:
+            dict: Route group -> bucket metrics, see `APIRequest.get_rate_limit_stats`. Empty when
+            limiting is disabled.
+        """
+        if self.scheduler is None:
+            return {}
+        return self.scheduler.stats()
+
+    async def close(self):
+        """
+        Close the client session and every pooled connection.
+        """
+        if self.reqsession is not None and not self.reqsession.closed:
+            await self.reqsession.close()
+
+    async def _get(self, route, params=None, priority=None):
+        """
+        Alias for sending a GET request.
+
+        Args:
+            route (str): The route to send the GET request to.
+            params (dict, optional): The parameters to include in the GET request.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
+
+        Returns:
+            The response from the GET request.
+        """
+        return await self._request(route, "GET", params, priority)
+
+    async def _post(self, route, params=None, priority=None):
+        """
+        Alias for sending a POST request.
+
+        Args:
+            route (str): The route to send the request to.
+            params (dict, optional): The parameters to include in the request. Defaults to None.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
+
+        Returns:
+            The response from the POST request.
+        """
+        return await self._request(route, "POST", params, priority)
+
+    async def _put(self, route, params=None, priority=None):
+        """
+        Alias for sending a PUT request.
+
+        Args:
+            route (str): The route for the PUT request.
+            params (dict, optional): The parameters to be sent with the request. Defaults to None.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
+
+        Returns:
+            The response from the PUT request.
+        """
+        return await self._request(route, "PUT", params, priority)
+
+    async def _delete(self, route, params=None, priority=None):
+        """
+        Alias for sending a DELETE request.
+
+        Args:
+            route (str): The route for the DELETE request.
+            params (dict, optional): The parameters to be included in the request.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
+
+        Returns:
+            The response from the DELETE request.
+        """
+        return await self._request(route, "DELETE", params, priority)
+
+    async def _request(self, route, method, parameters=None, priority=None):
+        """Make an asynchronous HTTP request.
+
+        With client-side rate limiting enabled the request first takes a token from its route
+        group's bucket, see `APIRequest._request`; a 429 response holds the group back for the
+        server's Retry-After and the request is sent again.
+
+        Args:
+            route (str): The route for the request.
+            method (str): The HTTP method for the request.
+            parameters (dict, optional): The parameters for the request. Defaults to None.
+            priority (int, optional): The scheduler priority, lower is served first. Defaults to
+                the route's, see `apiConfig.route_groups`.
+
+        Returns:
+            dict: The response data from the server.
+
+        Raises:
+            UtradeDataException: If the server response cannot be parsed as JSON or has an unknown content type.
+            UtradeTokenException: If the server response contains an error and the status code is 400.
+            UtradeNetworkException: If the server still answers 429 after `throttle_retries` attempts.
+        """
+        params = parameters if parameters else {}
+
+        # Form a restful URL
+        uri = self._routes[route].format(params)
+        url = urljoin(self.root, uri)
+        headers = {}
+
+        if self.token:
+            # Set authorization header
+            headers.update({'Content-Type': 'application/json', 'Authorization': self.token})
+
+        group, route_priority = get_route_group(route)
+        if priority is None:
+            priority = route_priority
+        session = self._get_session()
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                await self.scheduler.acquire(group, priority)
+            async with self._semaphore:
+                async with session.request(method,
+                                           url,
+                                           data=params if method in ["POST", "PUT"] else None,
+                                           params=self._encode_query(params) if method in ["GET", "DELETE"] else None,
+                                           headers=headers) as r:
+                    content = await r.read()
+                    content_type = r.headers.get("content-type", "")
+                    status_code = r.status
+                    retry_after = APIRequest._retry_after(r)
+
+            if status_code != 429:
+                break
+            # Rate limited by the server, hold the group back and queue the request again
+            if attempt >= self.throttle_retries:
+                raise UtradeNetworkException("Rate limited by the server ({route}): {content}".format(
+                    route=route, content=content), code=429)
+            attempt += 1
+            if self.scheduler is not None:
+                await self.scheduler.throttled(group, retry_after)
+            else:
+                await asyncio.sleep(retry_after if retry_after is not None else 1.0)
+
+        return parse_response(content, content_type, status_code, self.debug)
@@ -0,0 +1,435 @@
+"""
+OHLCV bars built locally from the market data stream.
+
+`BarBuilder` turns 1501 Touchline and 1512 LTP ticks into bars of a fixed interval for every
+instrument it sees, so the latest bars are available without polling `get_ohlc`. Bars are
+bucketed by the exchange time of the last trade, aligned to multiples of the interval on the
+exchange clock, and the finished bars of each instrument are kept in a `BarSeries` of
+preallocated NumPy ring arrays.
+
+Volume is taken from the cumulative traded quantity of 1501 events, so missed ticks do not lose
+volume; instruments only streaming 1512 add up the last traded quantities instead. 1510 events
+carry the open interest into the forming bar, and 1505 candles sent by the server replace the
+locally built values of the matching bar (see `BarBuilder`).
+"""
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.instrumentMaster import segment_code
+
+# Unix time of the exchange clock's zero: market data times count seconds from 1980-01-01 00:00 IST
+EXCHANGE_EPOCH = 315513000
+
+
+def exchange_time(unixTime=None):
+    """
+    Convert a Unix time to the exchange clock of market data timestamps.
+
+    Args:
+        unixTime (float, optional): Seconds since 1970-01-01 UTC. Defaults to now.
+
+    Returns:
+        float: Seconds since 1980-01-01 00:00 IST.
+    """
+    return (time.time() if unixTime is None else unixTime) - EXCHANGE_EPOCH
+
+
+class Bar(namedtuple('Bar', [
+        'exchangeSegment', 'exchangeInstrumentID', 'barTime', 'open', 'high', 'low', 'close', 'volume',
+        'openInterest', 'ticks', 'reconciled'])):
+    """
+    One OHLCV bar, `barTime` being its start on the exchange clock.
+
+    `ticks` counts the ticks the bar was built from and `reconciled` is True once the values
+    were replaced by a server 1505 candle.
+    """
+    __slots__ = ()
+
+
+# Positions in the forming bar state list
+_TIME, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _OI, _TICKS, _CUMULATIVE, _LAST_CLOSED = range(10)
+
+
+class BarSeries:
+    """
+    The finished bars of one instrument in NumPy ring arrays.
+
+    Once `capacity` bars were stored, every new bar overwrites the oldest one.
+
+    Args:
+        exchangeSegment (int): The exchange segment code.
+        exchangeInstrumentID (int): The instrument ID.
+        capacity (int): Bars kept.
+
+    Attributes:
+        barTime, open, high, low, close, volume, openInterest, ticks (numpy.ndarray): The ring
+            arrays, in storage order; use `arrays` for chronological copies.
+        count (int): Bars stored since creation, including the overwritten ones.
+    """
+
+    def __init__(self, exchangeSegment, exchangeInstrumentID, capacity):
+        self.exchangeSegment = exchangeSegment
+        self.exchangeInstrumentID = exchangeInstrumentID
+        self.capacity = capacity
+        self.barTime = np.zeros(capacity, dtype=np.int64)
+        self.open = np.full(capacity, np.nan)
+        self.high = np.full(capacity, np.nan)
+        self.low = np.full(capacity, np.nan)
+        self.close = np.full(capacity, np.nan)
+        self.volume = np.zeros(capacity, dtype=np.int64)
+        self.openInterest = np.zeros(capacity, dtype=np.int64)
+        self.ticks = np.zeros(capacity, dtype=np.int64)
+        self.reconciled = np.zeros(capacity, dtype=bool)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, barTime, open, high, low, close, volume, openInterest, ticks, reconciled=False):
+        """Store a finished bar, overwriting the oldest one when the ring is full."""
+        slot = self.count % self.capacity
+        self.barTime[slot] = barTime
+        self.open[slot] = open
+        self.high[slot] = high
+        self.low[slot] = low
+        self.close[slot] = close
+        self.volume[slot] = volume
+        self.openInterest[slot] = openInterest or 0
+        self.ticks[slot] = ticks
+        self.reconciled[slot] = reconciled
+        self.count += 1
+        return slot
+
+    def find(self, barTime, search=16):
+        """
+        The ring slot of a recent bar.
+
+        Args:
+            barTime (int): The bar start.
+            search (int, optional): How many of the latest bars to look through. Defaults to 16.
+
+        Returns:
+            int: The slot, or None if the bar is not among them.
+        """
+        for back in range(1, min(search, len(self)) + 1):
+            slot = (self.count - back) % self.capacity
+            if self.barTime[slot] == barTime:
+                return slot
+            if self.barTime[slot] < barTime:
+                return None
+        return None
+
+    def __getitem__(self, index):
+        """The bar at `index` in chronological order, -1 being the latest."""
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('bar index out of range')
+        slot = (self.count - size + index) % self.capacity
+        return self._bar(slot)
+
+    def _bar(self, slot):
+        return tuple.__new__(Bar, (
+            self.exchangeSegment, self.exchangeInstrumentID, int(self.barTime[slot]), float(self.open[slot]),
+            float(self.high[slot]), float(self.low[slot]), float(self.close[slot]), int(self.volume[slot]),
+            int(self.openInterest[slot]), int(self.ticks[slot]), bool(self.reconciled[slot])))
+
+    def arrays(self, last=None):
+        """
+        Chronological copies of the ring arrays.
+
+        Args:
+            last (int, optional): Only the latest `last` bars. Defaults to all stored bars.
+
+        Returns:
+            dict: barTime, open, high, low, close, volume, openInterest, ticks and reconciled arrays.
+        """
+        size = len(self)
+        if last is not None:
+            size = min(size, last)
+        slots = (np.arange(self.count - size, self.count) % self.capacity) if size else np.empty(0, np.int64)
+        return {name: getattr(self, name)[slots] for name in (
+            'barTime', 'open', 'high', 'low', 'close', 'volume', 'openInterest', 'ticks', 'reconciled')}
+
+
+class BarBuilder:
+    """
+    Builds OHLCV bars of one interval for every instrument from market data ticks.
+
+    A bar closes when the first trade of a later bar arrives for the instrument, or when
+    `close_due` runs after the bar's end (`start` runs it periodically on a timer thread), so
+    illiquid instruments still get their bars. Intervals without trades produce no bar. Ticks
+    of a bar that was already closed are counted in `late` and ignored.
+
+    When the server sends 1505 candles of the same interval, each candle replaces the open, high,
+    low, close, volume and open interest of its bar: a closed bar is updated in its ring slot and
+    emitted again, a candle of the forming bar is applied when that bar closes. Candles of other
+    intervals are ignored.
+
+    Args:
+        interval (int): The bar length in seconds, e.g. 60 or 3600.
+        capacity (int, optional): Finished bars kept per instrument. Defaults to 1000.
+        on_bar (callable, optional): Called with every finished `Bar`, and again with
+            ``reconciled=True`` when a candle replaced a closed bar's values. Defaults to None.
+        candle_interval (int, optional): The interval of the server 1505 candles. Defaults to 60.
+        candle_time (str, optional): Whether 1505 `barTime` is the 'start' or the 'end' of the
+            candle. Defaults to 'start'.
+        clock (callable, optional): Returns the current time on the exchange clock for
+            `close_due`. Defaults to `exchange_time`.
+
+    Raises:
+        UtradeInputException: If the interval or candle time is invalid.
+    """
+
+    def __init__(self, interval, capacity=1000, on_bar=None, candle_interval=60, candle_time='start',
+                 clock=exchange_time):
+        if interval <= 0 or int(interval) != interval:
+            raise UtradeInputException("Bar interval must be a positive number of seconds")
+        if candle_time not in ('start', 'end'):
+            raise UtradeInputException("candle_time must be 'start' or 'end'")
+        self.interval = int(interval)
+        self.capacity = capacity
+        self.on_bar = on_bar
+        self.candle_interval = candle_interval
+        self.candle_time = candle_time
+        self.clock = clock
+        self.series = {}
+        self._forming = {}
+        self._pendingCandles = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._stopped = threading.Event()
+        self.late = 0
+        self.reconciled = 0
+
+    def _state(self, key):
+        state = self._forming.get(key)
+        if state is None:
+            state = self._forming[key] = [None, None, None, None, None, 0, None, 0, None, None]
+            self.series[key] = BarSeries(key[0], key[1], self.capacity)
+        return state
+
+    def update(self, record):
+        """
+        Apply a decoded 1501, 1505, 1510 or 1512 record.
+
+        Args:
+            record: A `Touchline`, `Candle`, `OpenInterest` or `LTP` record from `utradeconnect.ticks`.
+        """
+        eventCode = record.eventCode
+        if eventCode == 1505:
+            self.reconcile(record)
+            return
+        key = (record.exchangeSegment, record.exchangeInstrumentID)
+        closed = None
+        with self._lock:
+            state = self._state(key)
+            if eventCode == 1510:
+                if record.openInterest is not None:
+                    state[_OI] = record.openInterest
+                return
+            if eventCode != 1501 and eventCode != 1512:
+                return
+            price = record.lastTradedPrice
+            if price is None:
+                return
+            tradeTime = record.lastTradedTime
+            if tradeTime is None:
+                tradeTime = record.lastUpdateTime
+            if tradeTime is None:
+                tradeTime = self.clock()
+            barTime = int(tradeTime) - int(tradeTime) % self.interval
+
+            volume = 0
+            if eventCode == 1501 and record.totalTradedQuantity is not None:
+                cumulative = record.totalTradedQuantity
+                if state[_CUMULATIVE] is not None and cumulative > state[_CUMULATIVE]:
+                    volume = cumulative - state[_CUMULATIVE]
+                state[_CUMULATIVE] = cumulative
+            elif state[_CUMULATIVE] is None and record.lastTradedQuantity:
+                # Only 1512 for this instrument, 1501 volume would already include the trade
+                volume = record.lastTradedQuantity
+
+            current = state[_TIME]
+            if barTime != current:
+                if current is not None:
+                    late = barTime < current
+                else:
+                    late = state[_LAST_CLOSED] is not None and barTime <= state[_LAST_CLOSED]
+                if late:
+                    self.late += 1
+                    return
+                if current is not None:
+                    closed = self._close(key, state)
+                state[_TIME] = barTime
+                state[_OPEN] = state[_HIGH] = state[_LOW] = state[_CLOSE] = price
+                state[_VOLUME] = volume
+                state[_TICKS] = 1
+            else:
+                if price > state[_HIGH]:
+                    state[_HIGH] = price
+                elif price < state[_LOW]:
+                    state[_LOW] = price
+                state[_CLOSE] = price
+                state[_VOLUME] += volume
+                state[_TICKS] += 1
+        if closed is not None and self.on_bar is not None:
+            self.on_bar(closed)
+
+    def _close(self, key, state):
+        """Move the forming bar into the series, applying a candle that arrived for it."""
+        series = self.series[key]
+        barTime = state[_TIME]
+        candle = self._pendingCandles.pop(key + (barTime,), None)
+        if candle is not None and candle.open is not None:
+            slot = series.append(barTime, candle.open, candle.high, candle.low, candle.close,
+                                 candle.barVolume or 0, candle.openInterest or state[_OI], state[_TICKS], True)
+            self.reconciled += 1
+        else:
+            slot = series.append(barTime, state[_OPEN], state[_HIGH], state[_LOW], state[_CLOSE], state[_VOLUME],
+                                 state[_OI], state[_TICKS])
+        state[_TIME] = None
+        state[_LAST_CLOSED] = barTime
+        return series._bar(slot)
+
+    def reconcile(self, candle):
+        """
+        Replace the values of the bar matching a server 1505 candle.
+
+        Args:
+            candle (Candle): The decoded 1505 record.
+
+        Returns:
+            bool: False if the candle interval differs from the bar interval or the bar is no
+            longer kept.
+        """
+        if self.candle_interval != self.interval or candle.barTime is None:
+            return False
+        start = candle.barTime - self.interval if self.candle_time == 'end' else candle.barTime
+        barTime = start - start % self.interval
+        key = (candle.exchangeSegment, candle.exchangeInstrumentID)
+        with self._lock:
+            state = self._state(key)
+            if state[_TIME] is not None and barTime >= state[_TIME]:
+                self._pendingCandles[key + (barTime,)] = candle
+                return True
+            series = self.series[key]
+            slot = series.find(barTime)
+            if slot is None or candle.open is None:
+                return False
+            series.open[slot] = candle.open
+            series.high[slot] = candle.high
+            series.low[slot] = candle.low
+            series.close[slot] = candle.close
+            series.volume[slot] = candle.barVolume or 0
+            if candle.openInterest is not None:
+                series.openInterest[slot] = candle.openInterest
+            series.reconciled[slot] = True
+            self.reconciled += 1
+            bar = series._bar(slot)
+        if self.on_bar is not None:
+            self.on_bar(bar)
+        return True
+
+    def close_due(self, now=None):
+        """
+        Close every forming bar whose interval has ended.
+
+        Args:
+            now (float, optional): The current time on the exchange clock. Defaults to `clock()`.
+
+        Returns:
+            list: The bars closed.
+        """
+        if now is None:
+            now = self.clock()
+        closed = []
+        with self._lock:
+            for key, state in self._forming.items():
+                if state[_TIME] is not None and state[_TIME] + self.interval <= now:
+                    closed.append(self._close(key, state))
+            # Candles of bars that never formed are dropped once their bar is over
+            for pending in [pending for pending in self._pendingCandles if pending[2] + self.interval <= now
+                            and self._forming[pending[:2]][_TIME] != pending[2]]:
+                del self._pendingCandles[pending]
+        if self.on_bar is not None:
+            for bar in closed:
+                self.on_bar(bar)
+        return closed
+
+    def forming(self, exchangeSegment, exchangeInstrumentID):
+        """
+        The bar currently being built for an instrument.
+
+        Returns:
+            Bar: The forming bar, or None if the instrument has no trade in the current interval.
+        """
+        key = (segment_code(exchangeSegment), int(exchangeInstrumentID))
+        with self._lock:
+            state = self._forming.get(key)
+            if state is None or state[_TIME] is None:
+                return None
+            return tuple.__new__(Bar, key + (state[_TIME], state[_OPEN], state[_HIGH], state[_LOW], state[_CLOSE],
+                                             state[_VOLUME], state[_OI] or 0, state[_TICKS], False))
+
+    def get(self, exchangeSegment, exchangeInstrumentID):
+        """
+        The finished bars of an instrument.
+
+        Returns:
+            BarSeries: The bars, or None if the instrument never ticked.
+        """
+        return self.series.get((segment_code(exchangeSegment), int(exchangeInstrumentID)))
+
+    def start(self, period=1.0):
+        """
+        Run `close_due` every `period` seconds on a daemon thread.
+
+        Args:
+            period (float, optional): Seconds between runs. Defaults to 1.0.
+        """
+        if self._timer is not None:
+            return
+        self._stopped.clear()
+
+        def run():
+            while not self._stopped.wait(period):
+                self.close_due()
+
+        self._timer = threading.Thread(target=run, name='utrade-bar-timer', daemon=True)
+        self._timer.start()
+
+    def stop(self):
+        """Stop the `close_due` timer thread."""
+        self._stopped.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+
+    def attach(self, socket):
+        """
+        Build bars from a market data socket.
+
+        The instruments must be subscribed to 1501 and/or 1512, and to 1510 and 1505 for open
+        interest and candle reconciliation.
+
+        Args:
+            socket (MDSocket_io): The market data socket.
+        """
+        for eventCode in (1501, 1505, 1510, 1512):
+            socket.add_listener(eventCode, self.update)
+
+    def detach(self, socket):
+        """
+        Stop building bars from a socket.
+
+        Args:
+            socket (MDSocket_io): The socket passed to `attach`.
+        """
+        for eventCode in (1501, 1505, 1510, 1512):
+            socket.remove_listener(eventCode, self.update)
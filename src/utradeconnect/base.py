@@ -1,8 +1,37 @@
+import functools
+from collections import namedtuple
+
 from utradeconnect.request import APIRequest
+from utradeconnect.asyncRequest import AsyncAPIRequest
 from utradeconnect.exception import UtradeGeneralException
 
+# A request yielded by an `api_call` method, sent as ``apiRequest._request(route, method, params)``
+Request = namedtuple('Request', ['route', 'method', 'params'])
+
+
+def api_call(steps):
+    """
+    Turn an API method written as a generator of requests into a method of either client.
+
+    The method builds its parameters, yields a `Request` and receives the decoded response at the
+    yield, or the transport's exception raised there, then handles it and returns the result. It
+    never touches the transport itself, so one definition serves both clients: `UtradeCommon`
+    sends the requests with the blocking `APIRequest` and returns the result, `AsyncUtradeCommon`
+    awaits them on `AsyncAPIRequest` and returns a coroutine.
+
+    Args:
+        steps (function): The generator function.
+
+    Returns:
+        function: The API method.
+    """
+    @functools.wraps(steps)
+    def call(self, *args, **kwargs):
+        return self._run(steps(self, *args, **kwargs))
+    return call
+
 class UtradeCommon:
-    def __init__(self, config, apiKey, secretKey) -> None:
+    def __init__(self, config, apiKey, secretKey, apiRequest=None) -> None:
             """
             Initialize data common to all UtradeConnect classes.
 
@@ -13,8 +42,12 @@ class UtradeCommon:
                     - disable_ssl (bool, optional): Whether to disable SSL verification. Defaults to False.
                     - debug (bool, optional): Whether to enable debug mode. Defaults to False.
                     - timeout (int, optional): The timeout for API requests in milliseconds. Defaults to 100.
+                    - pool (int or dict, optional): Connection pool size or configuration, see `APIRequest`. Defaults to None.
+                    - rate_limits (dict or bool, optional): Client-side rate limits per route group, True or a dict to enable them, see `APIRequest`. Defaults to None, off.
                 apiKey (str): The API key for authentication.
                 secretKey (str): The secret key for authentication.
+                apiRequest (APIRequest, optional): A transport to share instead of creating one, so a
+                    client initialised as both market and order connection keeps one session and pool.
             Raises:
                 UtradeGeneralException: If there is an error initializing the Utrade Connection.
             """
@@ -25,16 +58,37 @@ class UtradeCommon:
                 self.apiKey = apiKey
                 self.secretKey = secretKey
                 self.source = config['source']
-                self.apiRequest = APIRequest(
+                self.apiRequest = apiRequest or APIRequest(
                     base_url=config.get('base_url',None),
                     disable_ssl=config.get('disable_ssl', False),
                     debug=config.get('debug', False),
-                    timeout=config.get('timeout', 100)
+                    timeout=config.get('timeout', 100),
+                    pool=config.get('pool', None),
+                    rate_limits=config.get('rate_limits', None)
                 )
 
             except Exception as e:
                 raise UtradeGeneralException("Error initializing Utrade Connection: {}".format(e))
 
+    def _run(self, steps):
+        """
+        Run an `api_call` method, sending the requests it yields one after the other.
+
+        :param steps: The generator returned by the method.
+        :return: The method's result.
+        """
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    response = self.apiRequest._request(*request)
+                except Exception as e:
+                    request = steps.throw(e)
+                else:
+                    request = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
     def _set_common_variables(self, access_token, user_id, is_investor_client):
         """
         Set common variables received after a successful authentication.
@@ -47,3 +101,118 @@ class UtradeCommon:
         self.userID = user_id
         self.isInvestorClient = is_investor_client
         self.apiRequest.token = self.token
+        # Open the configured number of keep-alive connections now that the session is authenticated
+        if self.apiRequest.pool.get("prewarm"):
+            self.apiRequest.warmup()
+
+    def warmup_connections(self, connections=None):
+        """
+        Pre-open keep-alive connections to the API host, typically right after login.
+
+        :param connections: The number of connections to open. Defaults to the `prewarm` pool setting.
+        :return: The connection pool statistics after warming up.
+        """
+        return self.apiRequest.warmup(connections)
+
+    def get_connection_stats(self):
+        """
+        Connection reuse metrics of the underlying HTTP session.
+
+        :return: The connection pool statistics, see `APIRequest.get_pool_stats`.
+        """
+        return self.apiRequest.get_pool_stats()
+
+    def get_rate_limit_stats(self):
+        """
+        Queueing metrics of the client-side rate limiter per route group.
+
+        :return: The requests, queued requests, 429 responses and queue wait times per group, see `APIRequest.get_rate_limit_stats`.
+        """
+        return self.apiRequest.get_rate_limit_stats()
+
+
+class AsyncUtradeCommon:
+    def __init__(self, config, apiKey, secretKey, apiRequest=None) -> None:
+            """
+            Initialize data common to all AsyncUtradeConnect classes.
+
+            Args:
+                config (dict): A dictionary containing the configuration parameters, as for `UtradeCommon`.
+                    - concurrency (int, optional): Maximum number of requests in flight. Defaults to the pool size.
+                apiKey (str): The API key for authentication.
+                secretKey (str): The secret key for authentication.
+                apiRequest (AsyncAPIRequest, optional): A transport to share instead of creating one.
+            Raises:
+                UtradeGeneralException: If there is an error initializing the Utrade Connection.
+            """
+            try:
+                self.token = None
+                self.userID = None
+                self.isInvestorClient = None
+                self.apiKey = apiKey
+                self.secretKey = secretKey
+                self.source = config['source']
+                self.apiRequest = apiRequest or AsyncAPIRequest(
+                    base_url=config.get('base_url',None),
+                    disable_ssl=config.get('disable_ssl', False),
+                    debug=config.get('debug', False),
+                    timeout=config.get('timeout', 100),
+                    pool=config.get('pool', None),
+                    concurrency=config.get('concurrency', None),
+                    rate_limits=config.get('rate_limits', None)
+                )
+
+            except Exception as e:
+                raise UtradeGeneralException("Error initializing Utrade Connection: {}".format(e))
+
+    def _set_common_variables(self, access_token, user_id, is_investor_client):
+        """
+        Set common variables received after a successful authentication.
+
+        :param access_token: The access token obtained after authentication.
+        :param user_id: The user's ID.
+        :param is_investor_client: A flag indicating if the user is an investor client.
+        """
+        self.token = access_token
+        self.userID = user_id
+        self.isInvestorClient = is_investor_client
+        self.apiRequest.token = self.token
+
+    async def _run(self, steps):
+        """
+        Run an `api_call` method, awaiting the requests it yields one after the other.
+
+        :param steps: The generator returned by the method.
+        :return: The method's result.
+        """
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    response = await self.apiRequest._request(*request)
+                except Exception as e:
+                    request = steps.throw(e)
+                else:
+                    request = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    def get_rate_limit_stats(self):
+        """
+        Queueing metrics of the client-side rate limiter per route group.
+
+        :return: The requests, queued requests, 429 responses and queue wait times per group, see `AsyncAPIRequest.get_rate_limit_stats`.
+        """
+        return self.apiRequest.get_rate_limit_stats()
+
+    async def close(self):
+        """
+        Close the underlying HTTP session.
+        """
+        await self.apiRequest.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,101 @@
+"""
+Helpers for splitting large quote requests into chunks and merging the chunk responses.
+
+A `get_quote` response carries the quotes as ``result.listQuotes``, one JSON string per
+instrument, and the requested instruments as ``result.quotesList``. The server does not
+promise to answer in request order, so quotes are matched back to the requested instruments
+by their ``ExchangeSegment`` and ``ExchangeInstrumentID``, which requires JSON quotes.
+"""
+import json
+
+from utradeconnect.exception import UtradeGeneralException, UtradeInputException
+from utradeconnect.instrumentMaster import segment_code
+
+# Instruments per getQuotes call
+QUOTE_CHUNK_SIZE = 50
+
+
+def chunk_instruments(instruments, size=QUOTE_CHUNK_SIZE):
+    """
+    Split an instrument list into request sized chunks.
+
+    Args:
+        instruments (list): ``{'exchangeSegment': ..., 'exchangeInstrumentID': ...}`` dicts.
+        size (int, optional): Instruments per chunk. Defaults to `QUOTE_CHUNK_SIZE`.
+
+    Returns:
+        list: The chunks, in input order.
+    """
+    return [instruments[start:start + size] for start in range(0, len(instruments), size)]
+
+
+def check_publish_format(publishFormat):
+    """
+    Reject publish formats whose quotes cannot be matched back to the requested instruments.
+
+    Args:
+        publishFormat (str): The requested publish format.
+
+    Raises:
+        UtradeInputException: If the format is not JSON.
+    """
+    if str(publishFormat).upper() != 'JSON':
+        raise UtradeInputException("Bulk quotes need publishFormat 'JSON' to match quotes to instruments, "
+                                   "got {!r}".format(publishFormat))
+
+
+def _quote_key(quote):
+    """The (exchangeSegment, exchangeInstrumentID) of a quote given as JSON text or dict."""
+    if not isinstance(quote, dict):
+        quote = json.loads(quote)
+    return segment_code(quote['ExchangeSegment']), int(quote['ExchangeInstrumentID'])
+
+
+def merge_quotes(instruments, chunks, raise_errors=True):
+    """
+    Merge the responses of chunked quote requests back into one response in input order.
+
+    Args:
+        instruments (list): The instruments requested, in input order.
+        chunks (list): One ``(chunk, response, latency, error)`` tuple per chunk request, where
+            `error` is the exception raised by a failed request and `response` is then None.
+        raise_errors (bool, optional): Raise if any chunk failed instead of returning the quotes
+            of the chunks that succeeded. Defaults to True.
+
+    Returns:
+        dict: ``{'type': 'success', 'result': {'listQuotes': [...], 'quotesList': [...]},
+        'chunks': [...]}``. ``listQuotes[i]`` is the quote of ``instruments[i]``, None when it
+        was not returned; ``chunks`` holds the size, latency in seconds and error of every
+        chunk request.
+
+    Raises:
+        UtradeGeneralException: If a chunk failed and `raise_errors` is set.
+    """
+    positions = {}
+    for position, instrument in enumerate(instruments):
+        key = (segment_code(instrument['exchangeSegment']), int(instrument['exchangeInstrumentID']))
+        positions.setdefault(key, []).append(position)
+
+    quotes = [None] * len(instruments)
+    stats = []
+    errors = []
+    for chunk, response, latency, error in chunks:
+        if error is None and response.get('type') == 'error':
+            error = UtradeGeneralException(response.get('description') or str(response))
+        stats.append({'size': len(chunk), 'latency': latency, 'error': str(error) if error else None})
+        if error is not None:
+            errors.append(error)
+            continue
+        result = response.get('result') or {}
+        for quote in result.get('listQuotes') or []:
+            for position in positions.get(_quote_key(quote), ()):
+                quotes[position] = quote
+
+    if errors and raise_errors:
+        raise UtradeGeneralException("Error while retrieving quotes: {} of {} chunks failed, first error: {}".format(
+            len(errors), len(stats), errors[0]))
+    return {
+        'type': 'success' if not errors else 'partial',
+        'result': {'listQuotes': quotes, 'quotesList': instruments},
+        'chunks': stats,
+    }
@@ -0,0 +1,219 @@
+import threading
+from collections import namedtuple
+
+from utradeconnect.exception import UtradeInputException
+
+# Partial depth messages carry level deltas, their bid/ask groups are applied in order
+_DEPTH_EVENT = 1502
+_DEPTH_SIDES = (('bidLevels', 'bidSizes', 'bidPrices', 'bidOrders'), ('askLevels', 'askSizes', 'askPrices', 'askOrders'))
+
+
+def merge_partial(eventCode, older, newer):
+    """
+    Combine two partial updates of one instrument into one carrying the effect of both.
+
+    Partial ("json-partial") messages only carry the fields that changed, so the older update
+    cannot simply be replaced: every field the newer update lacks is taken from the older one.
+    Partial 1502 depth levels are deltas per level number, so the levels of both updates are
+    combined by level number, the newer update winning for a level both carry, and the merged
+    side is ordered by level; it never holds more levels than the ladder. A full ladder side in
+    the newer update replaces the older side.
+
+    Args:
+        eventCode (int): The event code of both updates, e.g. 1501.
+        older: The pending update, a raw partial message or its `utradeconnect.ticks` record.
+        newer: The update that arrived after it, of the same kind.
+
+    Returns:
+        The merged update, of the same kind as `newer`.
+    """
+    if isinstance(newer, str):
+        return _merge_partial_messages(eventCode, older, newer)
+    values = [value if value is not None else previous for previous, value in zip(older, newer)]
+    if eventCode == _DEPTH_EVENT:
+        positions = {name: index for index, name in enumerate(newer._fields)}
+        for side in _DEPTH_SIDES:
+            levels, sizes = positions[side[0]], positions[side[1]]
+            if older[sizes] is None or newer[sizes] is None or newer[levels] is None:
+                continue
+            # The older side is a full ladder when it has no level numbers
+            olderLevels = older[levels] if older[levels] is not None else range(len(older[sizes]))
+            columns = [positions[name] for name in side[1:]]
+            merged = dict(zip(olderLevels, zip(*(older[column] for column in columns))))
+            merged.update(zip(newer[levels], zip(*(newer[column] for column in columns))))
+            ordered = sorted(merged)
+            values[levels] = tuple(ordered)
+            for index, column in enumerate(columns):
+                values[column] = tuple(merged[level][index] for level in ordered)
+    return tuple.__new__(type(newer), values)
+
+
+def _merge_partial_messages(eventCode, older, newer):
+    """`merge_partial` of raw ``key:value,...`` messages."""
+    pairs = {}
+    for pair in older.split(','):
+        key, _, value = pair.partition(':')
+        pairs[key] = value
+    for pair in newer.split(','):
+        key, _, value = pair.partition(':')
+        if eventCode == _DEPTH_EVENT and key in ('bi', 'ai') and pairs.get(key):
+            value = _merge_level_groups(pairs[key], value)
+        pairs[key] = value
+    # The instrument first, like the server sends it
+    instrument = pairs.pop('t', None)
+    merged = ['{}:{}'.format(key, value) for key, value in pairs.items()]
+    if instrument is not None:
+        merged.insert(0, 't:' + instrument)
+    return ','.join(merged)
+
+
+def _merge_level_groups(older, newer):
+    """Combine two ``level|size|price|orders`` group lists by level number, the newer group winning."""
+    groups = {}
+    for value in (older, newer):
+        parts = value.split('|')
+        for start in range(0, len(parts) - 3, 4):
+            groups[int(parts[start])] = parts[start:start + 4]
+    return '|'.join('|'.join(groups[level]) for level in sorted(groups))
+
+
+class ConflatedBatch(namedtuple('ConflatedBatch', ['ticks', 'conflated'])):
+    """
+    The updates handed over by one `TickConflator.drain`.
+
+    Attributes:
+        ticks (list): The latest update of every key that changed since the previous drain, in the
+            order the keys were first updated.
+        conflated (int): How many updates were superseded by a newer one and never delivered.
+    """
+    __slots__ = ()
+
+
+class TickConflator:
+    """
+    Keeps only the latest pending update per (exchangeSegment, exchangeInstrumentID, eventCode).
+
+    The socket receive thread pushes every update and a consumer drains whenever it is ready,
+    so a slow consumer processes at most one update per instrument and event per drain instead
+    of an ever growing backlog of stale ticks. Partial updates are deltas and are pushed with a
+    `merge` function (see `merge_partial`), so the delivered update still carries every field
+    that changed since the previous drain. Safe to use from different threads.
+
+    The consumer either drains itself or lets `start` drain on a timer, which bounds how long an
+    update can wait.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pendingConflated = 0
+        self.received = 0
+        self.conflated = 0
+        self.drained = 0
+        self.errors = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def push(self, key, tick, merge=None):
+        """
+        Record an update, replacing any pending update with the same key.
+
+        Args:
+            key (tuple): The (exchangeSegment, exchangeInstrumentID, eventCode) of the update.
+            tick: The update to deliver.
+            merge (callable, optional): Called as ``merge(pending, tick)`` when an update with the
+                same key is pending, the result replaces it. Defaults to None, `tick` replaces it.
+        """
+        with self._lock:
+            self.received += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._pendingConflated += 1
+                if merge is not None:
+                    tick = merge(pending, tick)
+            self._pending[key] = tick
+
+    def drain(self):
+        """
+        Take every pending update.
+
+        Returns:
+            ConflatedBatch: The latest updates and how many updates were conflated away.
+        """
+        with self._lock:
+            pending = self._pending
+            conflated = self._pendingConflated
+            self._pending = {}
+            self._pendingConflated = 0
+            self.conflated += conflated
+            self.drained += len(pending)
+        return ConflatedBatch(list(pending.values()), conflated)
+
+    def start(self, callback, interval):
+        """
+        Drain every `interval` seconds on a daemon thread and call `callback` with each update.
+
+        An exception raised by `callback` is printed and counted in `errors`, the other updates
+        are still delivered. Does nothing if the thread is already running.
+
+        Args:
+            callback (callable): Called with every drained update.
+            interval (float): Seconds between drains.
+
+        Raises:
+            UtradeInputException: If `interval` is not positive.
+        """
+        if interval <= 0:
+            raise UtradeInputException("Conflation interval must be positive, got {}".format(interval))
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback, interval), name='utrade-conflator',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, callback, interval):
+        """Timer thread loop, delivering what is still pending once stopped."""
+        while not self._stopped.wait(interval):
+            self._deliver(callback)
+        self._deliver(callback)
+
+    def _deliver(self, callback):
+        if not self._pending:
+            return
+        for tick in self.drain().ticks:
+            try:
+                callback(tick)
+            except Exception as e:
+                self.errors += 1
+                print('Error in conflated tick callback', e)
+
+    def stop(self, timeout=None):
+        """
+        Stop the timer thread of `start` after delivering the pending updates.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait for the thread.
+        """
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def stats(self):
+        """
+        Conflation counters.
+
+        Returns:
+            dict: Updates received, conflated away and delivered so far, and updates pending.
+        """
+        with self._lock:
+            return {
+                'received': self.received,
+                'conflated': self.conflated + self._pendingConflated,
+                'drained': self.drained,
+                'pending': len(self._pending),
+            }
@@ -0,0 +1,332 @@
+"""
+Level 2 order books maintained in place from 1502 market depth events.
+
+A `DepthBook` keeps the ladder of one instrument in preallocated fixed length lists, one per
+side and value, indexed by level from the best price: ``book.prices[ASK][0]`` is the best ask and
+``book.sizes[BID][:book.depth[BID]]`` the quantity of every bid level. Full messages replace a
+whole side, partial messages overwrite only the levels they carry. The quantity and notional of
+a whole side, and the cumulative totals per level when fewer levels are asked for, are computed
+once after an update on the first query that needs them, so repeated weighted price and total
+quantity queries are O(1) lookups.
+
+The ladders are a handful of levels deep: copying a decoded side into a list slice reuses the
+record's float objects and costs a fraction of the per-call overhead of NumPy or of converting
+into typed arrays. Against rebuilding the ladder from every full message by hand the book is on
+par; its gain is on partial messages, see ``examples/runDepthBookBenchmark.py``.
+"""
+from itertools import accumulate
+from operator import mul
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.instrumentMaster import segment_code
+
+BID = 0
+ASK = 1
+
+_NAN = float('nan')
+
+
+class DepthBook:
+    """
+    The bid and ask ladder of one instrument.
+
+    Args:
+        exchangeSegment (int): The exchange segment code.
+        exchangeInstrumentID (int): The instrument ID.
+        levels (int, optional): Levels kept per side, deeper levels are ignored. Defaults to 20.
+
+    Attributes:
+        prices (list): ``[bidPrices, askPrices]``, lists of `levels` prices, NaN where a level is
+            empty.
+        sizes, orders (list): ``[bids, asks]``, lists of `levels` quantities and order counts, 0
+            where a level is empty.
+        depth (list): The number of filled levels of each side.
+        exchangeTimeStamp (int): The exchange time of the last update.
+        updates (int): The number of events applied.
+
+    Raises:
+        UtradeInputException: If `levels` is not positive.
+    """
+
+    def __init__(self, exchangeSegment, exchangeInstrumentID, levels=20):
+        if levels <= 0:
+            raise UtradeInputException("A depth book needs at least one level")
+        self.exchangeSegment = exchangeSegment
+        self.exchangeInstrumentID = exchangeInstrumentID
+        self.levels = levels
+        self.prices = [[_NAN] * levels, [_NAN] * levels]
+        self.sizes = [[0] * levels, [0] * levels]
+        self.orders = [[0] * levels, [0] * levels]
+        self.depth = [0, 0]
+        # Running (quantity, notional) totals from the best level outwards, None when stale
+        self._totals = [None, None]
+        # (quantity, notional) of every filled level, None when stale
+        self._sums = [None, None]
+        # Whether a side may hold empty (NaN priced) levels inside its depth
+        self._gaps = [False, False]
+        self.exchangeTimeStamp = None
+        self.updates = 0
+
+    def update(self, record):
+        """
+        Apply a decoded 1502 record.
+
+        A side the record does not carry is left unchanged. A side of a full message replaces
+        the whole ladder side; a side of a partial message overwrites the numbered levels, and a
+        level updated with zero quantity is emptied while the levels behind it are kept. Empty
+        levels at the end of a side are not counted in `depth`.
+
+        Args:
+            record (MarketDepth): The record from `utradeconnect.ticks`.
+        """
+        if record.bidPrices is not None:
+            self._apply(BID, record.bidLevels, record.bidPrices, record.bidSizes, record.bidOrders)
+        if record.askPrices is not None:
+            self._apply(ASK, record.askLevels, record.askPrices, record.askSizes, record.askOrders)
+        if record.exchangeTimeStamp is not None:
+            self.exchangeTimeStamp = record.exchangeTimeStamp
+        self.updates += 1
+
+    def _apply(self, side, levelNumbers, prices, sizes, orders):
+        levels = self.levels
+        sidePrices = self.prices[side]
+        sideSizes = self.sizes[side]
+        sideOrders = self.orders[side]
+        self._totals[side] = None
+        self._sums[side] = None
+        previous = self.depth[side]
+        if levelNumbers is None:
+            depth = len(prices)
+            if depth > levels:
+                depth = levels
+                prices, sizes, orders = prices[:levels], sizes[:levels], orders[:levels]
+            # Same length slices, the lists never grow or shrink
+            sidePrices[:depth] = prices
+            sideSizes[:depth] = sizes
+            sideOrders[:depth] = orders
+            # Full messages pad the ladder with zero quantity levels, they are not depth
+            if depth > previous:
+                previous = depth
+            while depth and not sideSizes[depth - 1]:
+                depth -= 1
+            self._gaps[side] = False
+        else:
+            depth = self.depth[side]
+            for level, price, size, count in zip(levelNumbers, prices, sizes, orders):
+                if level >= levels:
+                    continue
+                if not size:
+                    # Only the emptied level goes, the levels behind it keep their last update
+                    if level < depth:
+                        sidePrices[level] = _NAN
+                        sideSizes[level] = 0
+                        sideOrders[level] = 0
+                        self._gaps[side] = True
+                    continue
+                sidePrices[level] = price
+                sideSizes[level] = size
+                sideOrders[level] = count
+                if level >= depth:
+                    # Levels skipped over stay empty
+                    if level > depth:
+                        self._gaps[side] = True
+                    for gap in range(depth, level):
+                        sidePrices[gap] = _NAN
+                        sideSizes[gap] = 0
+                        sideOrders[gap] = 0
+                    depth = level + 1
+            while depth and not sideSizes[depth - 1]:
+                depth -= 1
+        if depth < previous:
+            empty = previous - depth
+            sidePrices[depth:previous] = [_NAN] * empty
+            sideSizes[depth:previous] = [0] * empty
+            sideOrders[depth:previous] = [0] * empty
+        self.depth[side] = depth
+
+    def _side_totals(self, side):
+        totals = self._totals[side]
+        if totals is None:
+            depth = self.depth[side]
+            sizes = self.sizes[side][:depth]
+            notionals = [price * size if size else 0.0 for price, size in zip(self.prices[side][:depth], sizes)]
+            totals = self._totals[side] = (list(accumulate(sizes)), list(accumulate(notionals)))
+        return totals
+
+    def _side_sums(self, side):
+        sums = self._sums[side]
+        if sums is None:
+            depth = self.depth[side]
+            sizes = self.sizes[side][:depth]
+            prices = self.prices[side][:depth]
+            if self._gaps[side]:
+                notional = sum([price * size for price, size in zip(prices, sizes) if size])
+            else:
+                notional = sum(map(mul, prices, sizes))
+            sums = self._sums[side] = (sum(sizes), notional)
+        return sums
+
+    def best_bid(self):
+        """
+        The best bid.
+
+        Returns:
+            tuple: ``(price, size)``, or None if there are no bids.
+        """
+        if not self.depth[BID]:
+            return None
+        return self.prices[BID][0], self.sizes[BID][0]
+
+    def best_ask(self):
+        """
+        The best ask.
+
+        Returns:
+            tuple: ``(price, size)``, or None if there are no asks.
+        """
+        if not self.depth[ASK]:
+            return None
+        return self.prices[ASK][0], self.sizes[ASK][0]
+
+    def spread(self):
+        """
+        The best ask minus the best bid.
+
+        Returns:
+            float: The spread, NaN if a side is empty.
+        """
+        return self.prices[ASK][0] - self.prices[BID][0]
+
+    def mid(self):
+        """
+        The middle of the best bid and ask.
+
+        Returns:
+            float: The mid price, NaN if a side is empty.
+        """
+        return (self.prices[ASK][0] + self.prices[BID][0]) / 2
+
+    def total_quantity(self, side, levels=None):
+        """
+        The quantity of the best `levels` levels of a side.
+
+        Args:
+            side (int): `BID` or `ASK`.
+            levels (int, optional): Levels to sum. Defaults to all filled levels.
+
+        Returns:
+            int: The total quantity.
+        """
+        depth = self.depth[side]
+        if levels is None or levels >= depth:
+            return self._side_sums(side)[0] if depth else 0
+        if levels <= 0:
+            return 0
+        return self._side_totals(side)[0][levels - 1]
+
+    def weighted_price(self, side, levels=None):
+        """
+        The quantity weighted average price of the best `levels` levels of a side.
+
+        Args:
+            side (int): `BID` or `ASK`.
+            levels (int, optional): Levels to include. Defaults to all filled levels.
+
+        Returns:
+            float: The weighted price, NaN if the levels hold no quantity.
+        """
+        depth = self.depth[side]
+        if levels is None or levels >= depth:
+            if not depth:
+                return _NAN
+            size, notional = self._side_sums(side)
+        elif levels <= 0:
+            return _NAN
+        else:
+            sizes, notionals = self._side_totals(side)
+            size, notional = sizes[levels - 1], notionals[levels - 1]
+        return notional / size if size else _NAN
+
+    def ladder(self, side):
+        """
+        The filled levels of a side.
+
+        Args:
+            side (int): `BID` or `ASK`.
+
+        Returns:
+            list: ``(price, size, orders)`` tuples from the best level, empty levels included
+            as ``(nan, 0, 0)``.
+        """
+        depth = self.depth[side]
+        return list(zip(self.prices[side][:depth], self.sizes[side][:depth], self.orders[side][:depth]))
+
+
+class DepthBooks:
+    """
+    The depth books of every instrument seen on a market data socket.
+
+    A book is created the first time an instrument's 1502 event arrives. `attach` wires the
+    books to a socket so every 1502 event updates them in place on the receive thread.
+
+    Args:
+        levels (int, optional): Levels kept per side, see `DepthBook`. Defaults to 20.
+    """
+
+    def __init__(self, levels=20):
+        self.levels = levels
+        self.books = {}
+
+    def __len__(self):
+        return len(self.books)
+
+    def __iter__(self):
+        return iter(self.books.values())
+
+    def get(self, exchangeSegment, exchangeInstrumentID):
+        """
+        The book of an instrument.
+
+        Args:
+            exchangeSegment (int or str): The exchange segment, e.g. 2 or 'NSEFO'.
+            exchangeInstrumentID (int): The instrument ID.
+
+        Returns:
+            DepthBook: The book, or None if no depth was received for the instrument.
+        """
+        return self.books.get((segment_code(exchangeSegment), int(exchangeInstrumentID)))
+
+    def update(self, record):
+        """
+        Apply a decoded 1502 record to its instrument's book.
+
+        Args:
+            record (MarketDepth): The record from `utradeconnect.ticks`.
+
+        Returns:
+            DepthBook: The updated book.
+        """
+        key = (record.exchangeSegment, record.exchangeInstrumentID)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = DepthBook(key[0], key[1], self.levels)
+        book.update(record)
+        return book
+
+    def attach(self, socket):
+        """
+        Keep the books updated from a market data socket subscribed to 1502.
+
+        Args:
+            socket (MDSocket_io): The market data socket.
+        """
+        socket.add_listener(1502, self.update)
+
+    def detach(self, socket):
+        """
+        Stop updating the books from a socket.
+
+        Args:
+            socket (MDSocket_io): The socket passed to `attach`.
+        """
+        socket.remove_listener(1502, self.update)
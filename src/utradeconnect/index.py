@@ -18,10 +18,14 @@ class UtradeConnect(UtradeMarketConnect, UtradeOrderConnect):
         root (str): The root URL for the connection to the Utrade API, defaults to production environment.
         debug (bool): A boolean flag indicating if debug mode is enabled, defaults to False.
         timeout (int): The timeout for the connection, defaults to 100.
-        pool (int): The connection pool size.
+        pool (int or dict): The number of keep-alive connections per host, or a pool configuration dict
+            (pool_connections, pool_maxsize, pool_block, max_retries, prewarm), see `APIRequest`.
         disable_ssl (bool): A boolean flag indicating if SSL is disabled, defaults to False.
         market_data_api_key (str): optional, The API key for authentication for the market data connection, defaults to apiKey.
         market_data_api_secret (str): optional, The secret key for authentication for the market data connection, defaults to secretKey.
+        rate_limits (dict or bool): optional, Client-side requests per second per route group (orders, portfolio,
+            market): True for the `apiConfig` defaults or a dict merged over them, see `APIRequest`. Defaults to
+            None, no client-side limiting.
     """
 
     def __init__(
@@ -36,6 +40,7 @@ class UtradeConnect(UtradeMarketConnect, UtradeOrderConnect):
             disable_ssl=False,
             market_data_api_key=None,
             market_data_api_secret=None,
+            rate_limits=None,
             ):
         config = {
             "source": source,
@@ -43,7 +48,8 @@ class UtradeConnect(UtradeMarketConnect, UtradeOrderConnect):
             "debug": debug,
             "timeout": timeout, 
             "pool": pool, 
-            "disable_ssl": disable_ssl
+            "disable_ssl": disable_ssl,
+            "rate_limits": rate_limits
             }
         # initialize the UtradeMarketConnect and UtradeOrderConnect classes
         if not market_data_api_key:
@@ -51,5 +57,6 @@ class UtradeConnect(UtradeMarketConnect, UtradeOrderConnect):
         if not market_data_api_secret:
             market_data_api_secret = secretKey
         UtradeMarketConnect.__init__(self, config, apiKey=market_data_api_key, secretKey=market_data_api_secret)
-        UtradeOrderConnect.__init__(self, config,apiKey=apiKey, secretKey=secretKey)
+        # Both halves share the session created above, and with it one connection pool
+        UtradeOrderConnect.__init__(self, config, apiKey=apiKey, secretKey=secretKey, apiRequest=self.apiRequest)
     
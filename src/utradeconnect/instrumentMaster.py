@@ -0,0 +1,596 @@
+"""
+Local, indexed copy of the exchange instrument master.
+
+`UtradeMarketConnect.get_master` returns the master as ``|`` separated text, one instrument per
+line. The column layout follows the segment and series:
+
+    equity (CM) lines:
+        ExchangeSegment|ExchangeInstrumentID|InstrumentType|Name|Description|Series|NameWithSeries|
+        InstrumentID|PriceBand.High|PriceBand.Low|FreezeQty|TickSize|LotSize|Multiplier|
+        DisplayName|ISIN|PriceNumerator|PriceDenominator
+    futures lines:
+        ...|Multiplier|UnderlyingInstrumentId|UnderlyingIndexName|ContractExpiration|DisplayName|...
+    option lines:
+        ...|Multiplier|UnderlyingInstrumentId|UnderlyingIndexName|ContractExpiration|StrikePrice|
+        OptionType|DisplayName|...
+
+`InstrumentMaster` parses it once into a columnar store, one `array.array` per numeric field and
+one list per text field, and builds hash indexes by (exchangeSegment, exchangeInstrumentID), by
+trading symbol and by (underlying, expiry, strike, option type), so lookups cost a dict probe and
+never another HTTP call.
+"""
+import sys
+from array import array
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import compress
+from numbers import Integral
+
+from utradeconnect.exception import UtradeDataException, UtradeInputException
+
+SEGMENTS = {
+    'NSECM': 1,
+    'NSEFO': 2,
+    'NSECD': 3,
+    'BSECM': 11,
+    'BSEFO': 12,
+    'MCXFO': 51,
+}
+SEGMENT_NAMES = {code: name for name, code in SEGMENTS.items()}
+
+OPTION_TYPES = {'CE': 3, 'PE': 4}
+OPTION_TYPE_NAMES = {code: name for name, code in OPTION_TYPES.items()}
+
+_MONTHS = {name: number for number, name in enumerate(
+    ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'), 1)}
+
+
+class Instrument(namedtuple('Instrument', [
+        'exchangeSegment', 'exchangeInstrumentID', 'instrumentType', 'name', 'symbol', 'series',
+        'displayName', 'isin', 'highPriceBand', 'lowPriceBand', 'freezeQuantity', 'tickSize', 'lotSize',
+        'multiplier', 'underlyingInstrumentID', 'underlyingIndexName', 'expiry', 'strikePrice',
+        'optionType', 'status'], defaults=(None,))):
+    """
+    One instrument of the master.
+
+    Attributes:
+        exchangeSegment (int): Exchange segment code, e.g. 1 for NSECM.
+        symbol (str): The trading symbol (the master Description), e.g. 'NIFTY23APR17500CE'.
+        expiry (datetime.date): Contract expiry, None for equities.
+        strikePrice (float): Strike price, 0.0 for equities and futures.
+        optionType (str): 'CE' or 'PE', None for equities and futures.
+        status (str): The last status received in a 1105 event, None if none was received.
+    """
+    __slots__ = ()
+
+
+# Column name -> array typecode, None for text columns
+COLUMNS = (
+    ('exchangeSegment', 'H'),
+    ('exchangeInstrumentID', 'q'),
+    ('instrumentType', 'H'),
+    ('name', None),
+    ('symbol', None),
+    ('series', None),
+    ('displayName', None),
+    ('isin', None),
+    ('highPriceBand', 'd'),
+    ('lowPriceBand', 'd'),
+    ('freezeQuantity', 'q'),
+    ('tickSize', 'd'),
+    ('lotSize', 'q'),
+    ('multiplier', 'd'),
+    ('underlyingInstrumentID', 'q'),
+    ('underlyingIndexName', None),
+    ('expiry', 'i'),
+    ('strikePrice', 'd'),
+    ('optionType', 'B'),
+)
+
+
+def segment_code(exchangeSegment):
+    """
+    Normalise an exchange segment given by name or code.
+
+    Args:
+        exchangeSegment (str or int): e.g. 'NSEFO', '2' or 2, any integer type such as
+            `numpy.int64` included.
+
+    Returns:
+        int: The segment code.
+
+    Raises:
+        UtradeInputException: If the segment is unknown.
+    """
+    if isinstance(exchangeSegment, Integral):
+        return int(exchangeSegment)
+    code = SEGMENTS.get(exchangeSegment.upper())
+    if code is not None:
+        return code
+    if exchangeSegment.isdigit():
+        return int(exchangeSegment)
+    raise UtradeInputException("Unknown exchange segment: {}".format(exchangeSegment))
+
+
+def expiry_key(expiry):
+    """
+    Normalise an expiry to its ``YYYYMMDD`` integer.
+
+    Args:
+        expiry (date, datetime, int or str): e.g. date(2023, 4, 27), 20230427, '2023-04-27',
+            '2023-04-27T14:30:00' or '27APR2023'.
+
+    Returns:
+        int: The expiry as ``YYYYMMDD``, 0 when `expiry` is empty.
+
+    Raises:
+        UtradeInputException: If the expiry cannot be parsed.
+    """
+    if not expiry:
+        return 0
+    if isinstance(expiry, Integral):
+        return int(expiry)
+    if isinstance(expiry, (date, datetime)):
+        return expiry.year * 10000 + expiry.month * 100 + expiry.day
+    try:
+        if expiry[4:5] == '-':
+            return int(expiry[:4]) * 10000 + int(expiry[5:7]) * 100 + int(expiry[8:10])
+        if len(expiry) == 9 and expiry[2:5].upper() in _MONTHS:
+            return int(expiry[5:9]) * 10000 + _MONTHS[expiry[2:5].upper()] * 100 + int(expiry[:2])
+        if len(expiry) == 8 and expiry.isdigit():
+            return int(expiry)
+    except ValueError:
+        pass
+    raise UtradeInputException("Unknown expiry format: {}".format(expiry))
+
+
+_EQUITY, _FUTURE, _OPTION = 'equity', 'future', 'option'
+
+
+def _ints(values):
+    """Parse an integer column, empty or decimal text allowed."""
+    try:
+        return list(map(int, values))
+    except ValueError:
+        return [int(float(value)) if value else 0 for value in values]
+
+
+def _floats(values):
+    """Parse a float column, empty text allowed."""
+    try:
+        return list(map(float, values))
+    except ValueError:
+        return [float(value) if value else 0.0 for value in values]
+
+
+def _option_type_code(optionType):
+    """Normalise 'CE'/'PE' or the master codes 3/4 to the stored code, 0 for none."""
+    if not optionType:
+        return 0
+    if isinstance(optionType, Integral):
+        return int(optionType)
+    if optionType.isdigit():
+        return int(optionType)
+    code = OPTION_TYPES.get(optionType.upper())
+    if code is None:
+        raise UtradeInputException("Unknown option type: {}".format(optionType))
+    return code
+
+
+class InstrumentMaster:
+    """
+    Columnar instrument master with hash indexes.
+
+    Build it from a `get_master` response with `from_response`, or through
+    `UtradeMarketConnect.get_instrument_master`. Each index is built on its first lookup, so a
+    master opened from the on-disk cache costs nothing until it is queried.
+
+    Intraday changes of price bands, freeze quantity, tick size, lot size and status arrive as
+    1105 Instrument Property Change events; `attach` applies them to the store in place as they
+    are received. A record built while an update is being applied may mix old and new values
+    of that one instrument.
+
+    Attributes:
+        columns (dict): Column name -> sequence, one entry per row: `array.array` (numeric) or
+            list (text) when parsed, memory-mapped views when opened from the cache.
+        status (dict): Row -> the last status received for it in a 1105 event.
+        updates (int): Number of 1105 events applied.
+    """
+
+    # InstrumentPropertyChange field -> type of the column it updates in place
+    propertyColumns = {
+        'highPriceBand': float,
+        'lowPriceBand': float,
+        'freezeQuantity': int,
+        'tickSize': float,
+        'lotSize': int,
+    }
+
+    def __init__(self, columns=None):
+        self.columns = columns if columns is not None else {
+            name: array(typecode) if typecode else [] for name, typecode in COLUMNS}
+        self.status = {}
+        self.updates = 0
+        # Liquidity scores of the search ranking, kept across rebuilds of the search index
+        self._liquidity = None
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        self._byId = None
+        self._bySymbol = None
+        self._byContract = None
+        self._byUnderlying = None
+        self._search = None
+
+    def __len__(self):
+        return len(self.columns['exchangeInstrumentID'])
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Parse a `get_master` response.
+
+        Args:
+            response (dict or str): The `get_master` response, or its ``result`` text.
+
+        Returns:
+            InstrumentMaster: The parsed master.
+
+        Raises:
+            UtradeDataException: If the response holds no master text.
+        """
+        result = response.get('result') if isinstance(response, dict) else response
+        if isinstance(result, list):
+            result = '\n'.join(result)
+        if not isinstance(result, str):
+            raise UtradeDataException("Master response has no instrument data")
+        master = cls()
+        master.extend(result.splitlines())
+        return master
+
+    def extend(self, lines):
+        """
+        Append master lines to the store and rebuild the indexes.
+
+        Lines are grouped by segment and field count, each group is split with a single
+        ``'|'.join(...).split('|')`` and its columns are read as strided slices of the result,
+        which is several times faster than splitting and appending line by line. Rows are
+        therefore stored grouped by segment and layout rather than in response order.
+
+        Args:
+            lines (iterable): ``|`` separated master lines, blank lines are skipped.
+
+        Raises:
+            UtradeDataException: If a line has too few fields.
+        """
+        groups = {}
+        for line in lines:
+            if line:
+                key = (line[:line.find('|')], line.count('|') + 1)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = []
+                group.append(line)
+        for (segment, width), group in groups.items():
+            if width < 15:
+                raise UtradeDataException("Malformed master line: {}".format(group[0]))
+            flat = '|'.join(group).split('|')
+            if segment.endswith('CM') or width < 18:
+                self._append(_EQUITY, flat, width)
+                continue
+            options = ['OPT' in series for series in flat[5::width]]
+            if all(options):
+                self._append(_OPTION, flat, width)
+            elif not any(options):
+                self._append(_FUTURE, flat, width)
+            else:
+                self._append(_OPTION, '|'.join(compress(group, options)).split('|'), width)
+                futures = [line for line, option in zip(group, options) if not option]
+                self._append(_FUTURE, '|'.join(futures).split('|'), width)
+        self._reset_indexes()
+
+    def _append(self, layout, flat, width):
+        """Append the split fields of lines sharing one layout and field count, column by column."""
+        count = len(flat) // width
+
+        def field(number):
+            return flat[number::width] if number < width else [''] * count
+
+        columns = self.columns
+        segments = {value: segment_code(value) for value in set(field(0))}
+        columns['exchangeSegment'].fromlist(list(map(segments.__getitem__, field(0))))
+        columns['exchangeInstrumentID'].fromlist(_ints(field(1)))
+        columns['instrumentType'].fromlist(_ints(field(2)))
+        columns['name'].extend(map(sys.intern, field(3)))
+        columns['symbol'].extend(field(4))
+        columns['series'].extend(map(sys.intern, field(5)))
+        columns['highPriceBand'].fromlist(_floats(field(8)))
+        columns['lowPriceBand'].fromlist(_floats(field(9)))
+        columns['freezeQuantity'].fromlist(_ints(field(10)))
+        columns['tickSize'].fromlist(_floats(field(11)))
+        columns['lotSize'].fromlist(_ints(field(12)))
+        columns['multiplier'].fromlist(_floats(field(13)))
+        if layout is _EQUITY:
+            columns['displayName'].extend(field(14))
+            columns['isin'].extend(field(15))
+            columns['underlyingInstrumentID'].fromlist([0] * count)
+            columns['underlyingIndexName'].extend([''] * count)
+            columns['expiry'].fromlist([0] * count)
+            columns['strikePrice'].fromlist([0.0] * count)
+            columns['optionType'].fromlist([0] * count)
+            return
+        expiries = field(16)
+        keys = {value: expiry_key(value) for value in set(expiries)}
+        columns['isin'].extend([''] * count)
+        columns['underlyingInstrumentID'].fromlist(_ints(field(14)))
+        columns['underlyingIndexName'].extend(map(sys.intern, field(15)))
+        columns['expiry'].fromlist(list(map(keys.__getitem__, expiries)))
+        if layout is _OPTION:
+            optionTypes = field(18)
+            codes = {value: _option_type_code(value) for value in set(optionTypes)}
+            columns['strikePrice'].fromlist(_floats(field(17)))
+            columns['optionType'].fromlist(list(map(codes.__getitem__, optionTypes)))
+            columns['displayName'].extend(field(19))
+        else:
+            columns['strikePrice'].fromlist([0.0] * count)
+            columns['optionType'].fromlist([0] * count)
+            columns['displayName'].extend(field(17))
+
+    def _id_index(self):
+        """(exchangeSegment, exchangeInstrumentID) -> row, built on first use."""
+        if self._byId is None:
+            columns = self.columns
+            self._byId = dict(zip(zip(columns['exchangeSegment'], columns['exchangeInstrumentID']), range(len(self))))
+        return self._byId
+
+    def _symbol_index(self):
+        """Upper-cased trading symbol and display name -> row, built on first use."""
+        if self._bySymbol is None:
+            columns = self.columns
+            rows = range(len(self))
+            bySymbol = dict(zip(map(str.upper, columns['displayName']), rows))
+            bySymbol.update(zip(map(str.upper, columns['symbol']), rows))
+            bySymbol.pop('', None)
+            self._bySymbol = bySymbol
+        return self._bySymbol
+
+    def _contract_index(self):
+        """(underlying, expiry, strikePrice, optionType code) -> row of derivatives, built on first use."""
+        if self._byContract is None:
+            columns = self.columns
+            self._byContract = {
+                key: row for key, row in zip(
+                    zip(columns['name'], columns['expiry'], columns['strikePrice'], columns['optionType']),
+                    range(len(self)))
+                if key[1]}
+        return self._byContract
+
+    def _underlying_index(self):
+        """Underlying name -> rows of its derivatives, built on first use."""
+        if self._byUnderlying is None:
+            byUnderlying = {}
+            for row, (name, expiry) in enumerate(zip(self.columns['name'], self.columns['expiry'])):
+                if expiry:
+                    byUnderlying.setdefault(name, []).append(row)
+            self._byUnderlying = byUnderlying
+        return self._byUnderlying
+
+    def derivative_rows(self, underlying):
+        """
+        The rows of every futures and options contract of an underlying.
+
+        Args:
+            underlying (str): The underlying name, e.g. 'NIFTY'.
+
+        Returns:
+            list: Row numbers, empty if the underlying has no derivatives.
+        """
+        return self._underlying_index().get(underlying, [])
+
+    def expiries(self, underlying, options=True):
+        """
+        The expiries of an underlying's contracts.
+
+        Args:
+            underlying (str): The underlying name, e.g. 'NIFTY'.
+            options (bool, optional): True for option expiries, False for futures expiries.
+
+        Returns:
+            list: Sorted `datetime.date` expiries.
+        """
+        expiry, optionType = self.columns['expiry'], self.columns['optionType']
+        keys = {expiry[row] for row in self.derivative_rows(underlying) if bool(optionType[row]) == options}
+        return [date(key // 10000, key // 100 % 100, key % 100) for key in sorted(keys)]
+
+    def option_chain(self, underlying, expiry, exchangeSegment=None):
+        """
+        Build the `OptionChain` of an underlying and expiry.
+
+        Args:
+            underlying (str): The underlying name, e.g. 'NIFTY'.
+            expiry (date, int or str): The expiry, see `expiry_key`.
+            exchangeSegment (int or str, optional): The derivatives segment when the underlying
+                trades on several, e.g. 'BSEFO'.
+
+        Returns:
+            OptionChain: The chain.
+        """
+        from utradeconnect.optionChain import OptionChain
+        return OptionChain(self, underlying, expiry, exchangeSegment)
+
+    def row(self, row):
+        """
+        Build the `Instrument` record of a row.
+
+        Args:
+            row (int): The row number.
+
+        Returns:
+            Instrument: The instrument.
+        """
+        values = [column[row] for column in self.columns.values()]
+        expiry = values[16]
+        values[16] = date(expiry // 10000, expiry // 100 % 100, expiry % 100) if expiry else None
+        values[18] = OPTION_TYPE_NAMES.get(values[18])
+        values.append(self.status.get(row))
+        return tuple.__new__(Instrument, values)
+
+    def get(self, exchangeSegment, exchangeInstrumentID):
+        """
+        Look up an instrument by exchange segment and instrument ID.
+
+        Args:
+            exchangeSegment (int or str): The segment code or name, e.g. 2 or 'NSEFO'.
+            exchangeInstrumentID (int): The exchange instrument ID.
+
+        Returns:
+            Instrument: The instrument, or None if it is not in the master.
+        """
+        if type(exchangeSegment) is not int:
+            exchangeSegment = segment_code(exchangeSegment)
+        row = self._id_index().get((exchangeSegment, int(exchangeInstrumentID)))
+        return self.row(row) if row is not None else None
+
+    def row_of(self, exchangeSegment, exchangeInstrumentID):
+        """
+        The row number of an instrument, for reading single columns without building a record.
+
+        Returns:
+            int: The row, or None if the instrument is not in the master.
+        """
+        if type(exchangeSegment) is not int:
+            exchangeSegment = segment_code(exchangeSegment)
+        return self._id_index().get((exchangeSegment, int(exchangeInstrumentID)))
+
+    def by_symbol(self, symbol):
+        """
+        Look up an instrument by trading symbol or display name, case insensitive.
+
+        Args:
+            symbol (str): e.g. 'NIFTY23APR17500CE' or 'NIFTY 27APR2023 CE 17500'.
+
+        Returns:
+            Instrument: The instrument, or None if no instrument has this symbol.
+        """
+        row = self._symbol_index().get(symbol.upper())
+        return self.row(row) if row is not None else None
+
+    def option(self, underlying, expiry, strikePrice, optionType):
+        """
+        Look up an option contract.
+
+        Args:
+            underlying (str): The underlying name, e.g. 'NIFTY'.
+            expiry (date, int or str): The expiry, see `expiry_key`.
+            strikePrice (float): The strike price.
+            optionType (str): 'CE' or 'PE'.
+
+        Returns:
+            Instrument: The contract, or None if it is not in the master.
+        """
+        row = self._contract_index().get((underlying, expiry_key(expiry), float(strikePrice), _option_type_code(optionType)))
+        return self.row(row) if row is not None else None
+
+    def future(self, underlying, expiry):
+        """
+        Look up a futures contract.
+
+        Args:
+            underlying (str): The underlying name, e.g. 'NIFTY'.
+            expiry (date, int or str): The expiry, see `expiry_key`.
+
+        Returns:
+            Instrument: The contract, or None if it is not in the master.
+        """
+        row = self._contract_index().get((underlying, expiry_key(expiry), 0.0, 0))
+        return self.row(row) if row is not None else None
+
+    def search(self, query, limit=20, exchangeSegment=None, liquidity=None):
+        """
+        Search the master locally, the offline counterpart of `search_by_scriptname`.
+
+        The `SymbolSearch` index is built on the first search.
+
+        Args:
+            query (str): The search text, e.g. 'reliance', 'nifty 27apr 17500 ce'.
+            limit (int, optional): Maximum number of results. Defaults to 20.
+            exchangeSegment (int or str, optional): Only return instruments of this segment.
+            liquidity (dict, optional): (exchangeSegment, exchangeInstrumentID) -> a liquidity
+                score such as traded volume or open interest, higher ranks first. The scores
+                replace the previous ones and stay in effect for later searches, see
+                `search_index`. Defaults to None, keep the current scores.
+
+        Returns:
+            dict: The same shape as the `search_by_scriptname` response.
+        """
+        return self.search_index(liquidity).search(query, limit, exchangeSegment)
+
+    def search_index(self, liquidity=None):
+        """
+        The `SymbolSearch` index behind `search`, built on first use.
+
+        Args:
+            liquidity (dict, optional): New liquidity scores to rank by, see `search`. Defaults
+                to None, keep the current scores.
+
+        Returns:
+            SymbolSearch: The index.
+        """
+        if liquidity is not None:
+            self._liquidity = liquidity
+        if self._search is None:
+            from utradeconnect.symbolSearch import SymbolSearch
+            self._search = SymbolSearch(self, self._liquidity)
+        elif liquidity is not None:
+            self._search.update_liquidity(liquidity)
+        return self._search
+
+    def apply(self, change):
+        """
+        Apply a 1105 Instrument Property Change to the store in place.
+
+        Only the properties present in the event are changed. Memory-mapped cache columns are
+        updated in this process's private copy and the cache file is left untouched.
+
+        Args:
+            change (InstrumentPropertyChange): The decoded 1105 event.
+
+        Returns:
+            bool: False if the instrument is not in the master.
+        """
+        row = self._id_index().get((segment_code(change.exchangeSegment), int(change.exchangeInstrumentID)))
+        if row is None:
+            return False
+        columns = self.columns
+        for name, cast in self.propertyColumns.items():
+            value = getattr(change, name)
+            if value is not None:
+                columns[name][row] = cast(value)
+        if change.status is not None:
+            self.status[row] = change.status
+        self.updates += 1
+        return True
+
+    def attach(self, socket):
+        """
+        Keep the master current from a market data socket's 1105 events.
+
+        The instruments of interest must be subscribed to event code 1105 with `send_subscription`.
+
+        Args:
+            socket (MDSocket_io): The market data socket.
+        """
+        socket.add_listener(1105, self.apply)
+
+    def detach(self, socket):
+        """
+        Stop applying a socket's 1105 events.
+
+        Args:
+            socket (MDSocket_io): The socket passed to `attach`.
+        """
+        socket.remove_listener(1105, self.apply)
+
+    def __iter__(self):
+        """Iterate every instrument."""
+        return map(self.row, range(len(self)))
@@ -1,15 +1,24 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from utradeconnect.base import UtradeCommon
+from utradeconnect.base import Request, UtradeCommon, api_call
+from utradeconnect.bulkQuote import QUOTE_CHUNK_SIZE, check_publish_format, chunk_instruments, merge_quotes
 from utradeconnect.exception import UtradeGeneralException, UtradeTokenException
+from utradeconnect.instrumentMaster import InstrumentMaster
+from utradeconnect.masterCache import InstrumentMasterCache
+from utradeconnect.ohlcHistory import OHLC_WINDOW_BARS, OhlcHistory, parse_ohlc
 
 
-class UtradeMarketConnect(UtradeCommon):
+class UtradeMarketAPI:
+    """
+    Market data API methods, shared by `UtradeMarketConnect` and `AsyncUtradeMarketConnect`.
 
-    def __init__(self, config, apiKey, secretKey) -> None:
-        # initialize the UtradeCommon class
-        super().__init__(config=config, apiKey=apiKey, secretKey=secretKey)
+    Every method is an `api_call`: it builds its parameters, yields its request and handles the
+    response, while the client class it is mixed into sends the request over its transport.
+    """
 
+    @api_call
     def marketdata_login(self):
         """
         Logs in to the market data service using the provided API key, secret key, and source.
@@ -29,7 +38,7 @@ class UtradeMarketConnect(UtradeCommon):
             }
 
             # Send a POST request to the "market.login" endpoint
-            response = self.apiRequest._post("market.login", params)
+            response = yield Request("market.login", "POST", params)
             
             # Print the response for debugging purposes
 
@@ -44,6 +53,8 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeTokenException("Error while logging in to market data: " + str(e))
     
+
+    @api_call
     def get_config(self):
         """
         Retrieves the market configuration.
@@ -59,7 +70,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {}
 
             # Send a GET request to retrieve market configuration
-            response = self.apiRequest._get('market.config', params)
+            response = yield Request('market.config', "GET", params)
 
             # Return the response obtained
             return response
@@ -67,6 +78,8 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving market configuration: " + str(e))
     
+
+    @api_call
     def get_quote(self, instruments, eventCode, publishFormat):
         """
         Retrieves quotes for the specified instruments.
@@ -87,7 +100,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'instruments': instruments, 'eventCode': eventCode, 'publishFormat': publishFormat}
             
             # Send a POST request to retrieve quotes
-            response = self.apiRequest._post('market.instruments.quotes', json.dumps(params))
+            response = yield Request('market.instruments.quotes', "POST", json.dumps(params))
             
             # Return the response obtained
             return response
@@ -95,6 +108,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving quotes: " + str(e))
 
+    @api_call
     def send_subscription(self, instruments, eventCode):
         """
         Sends a subscription request for the given instruments and event code.
@@ -114,7 +128,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'instruments': instruments, 'eventCode': eventCode}
             
             # Send a POST request to subscribe to instruments
-            response = self.apiRequest._post('market.instruments.subscription', json.dumps(params))
+            response = yield Request('market.instruments.subscription', "POST", json.dumps(params))
             
             # Return the response obtained
             return response
@@ -122,6 +136,8 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while subscribing: " + str(e))
     
+
+    @api_call
     def send_unsubscription(self, instruments, eventCode):
         """
         Sends an unsubscription request for the specified instruments and event code.
@@ -141,7 +157,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'instruments': instruments, 'eventCode': eventCode}
             
             # Send a PUT request to unsubscribe from instruments
-            response = self.apiRequest._put('market.instruments.unsubscription', json.dumps(params))
+            response = yield Request('market.instruments.unsubscription', "PUT", json.dumps(params))
             
             # Return the response obtained
             return response
@@ -149,6 +165,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while unsubscribing: " + str(e))
 
+    @api_call
     def get_master(self, exchangeSegmentList):
         """
         Retrieves the master data for the given exchange segment list.
@@ -168,7 +185,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {"exchangeSegmentList": exchangeSegmentList}
             
             # Send a POST request to get master data
-            response = self.apiRequest._post('market.instruments.master', json.dumps(params))
+            response = yield Request('market.instruments.master', "POST", json.dumps(params))
             
             # Return the response obtained
             return response
@@ -176,7 +193,8 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving master data: " + str(e))
 
-    def get_ohlc(self, exchangeSegment, exchangeInstrumentID, startTime, endTime, compressionValue):
+    @api_call
+    def get_ohlc(self, exchangeSegment, exchangeInstrumentID, startTime, endTime, compressionValue, as_arrays=False):
         """
         Retrieves OHLC (Open, High, Low, Close) data for a given instrument within a specified time range.
 
@@ -186,9 +204,12 @@ class UtradeMarketConnect(UtradeCommon):
         startTime (str): The start time of the data range in the format 'YYYY-MM-DD HH:MM:SS'.
         endTime (str): The end time of the data range in the format 'YYYY-MM-DD HH:MM:SS'.
         compressionValue (int): The compression value for the OHLC data.
+        as_arrays (bool, optional): Return the bars as NumPy columns parsed with
+            `utradeconnect.ohlcHistory.parse_ohlc` instead of the raw response. Defaults to False.
 
         Returns:
-        dict: The OHLC data for the specified instrument and time range.
+        dict: The OHLC data for the specified instrument and time range, or with `as_arrays` the
+            timestamp, open, high, low, close, volume and openInterest arrays.
 
         Raises:
         UtradeGeneralException: If an error occurs while retrieving OHLC data.
@@ -205,15 +226,19 @@ class UtradeMarketConnect(UtradeCommon):
             }
             
             # Send a GET request to retrieve OHLC data
-            response = self.apiRequest._get('market.instruments.ohlc', params)
+            response = yield Request('market.instruments.ohlc', "GET", params)
             
-            # Return the response obtained
+            # Return the response obtained, as columns if asked for
+            if as_arrays:
+                return parse_ohlc(response)
             return response
         except (Exception, UtradeTokenException) as e:
             raise UtradeGeneralException("Error while retrieving OHLC data: " + str(e))
             # Handle exceptions and return a description of the error
             return e
     
+
+    @api_call
     def get_series(self, exchangeSegment):
         """
         Retrieves series information for a given exchange segment.
@@ -232,7 +257,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'exchangeSegment': exchangeSegment}
             
             # Send a GET request to get series information
-            response = self.apiRequest._get('market.instruments.instrument.series', params)
+            response = yield Request('market.instruments.instrument.series', "GET", params)
             
             # Return the response obtained
             return response
@@ -240,6 +265,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving series information: " + str(e))
 
+    @api_call
     def get_equity_symbol(self, exchangeSegment, series, symbol):
         """
         Get equity symbol for a given exchange segment, series, and symbol.
@@ -260,7 +286,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'exchangeSegment': exchangeSegment, 'series': series, 'symbol': symbol}
             
             # Send a GET request to get equity symbols
-            response = self.apiRequest._get('market.instruments.instrument.equitysymbol', params)
+            response = yield Request('market.instruments.instrument.equitysymbol', "GET", params)
             
             # Return the response obtained
             return response
@@ -268,6 +294,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving equity symbols: " + str(e))
 
+    @api_call
     def get_expiry_date(self, exchangeSegment, series, symbol):
         """
         Get the expiry date information for a given exchange segment, series, and symbol.
@@ -288,7 +315,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'exchangeSegment': exchangeSegment, 'series': series, 'symbol': symbol}
             
             # Send a GET request to get expiry date information
-            response = self.apiRequest._get('market.instruments.instrument.expirydate', params)
+            response = yield Request('market.instruments.instrument.expirydate', "GET", params)
             
             # Return the response obtained
             return response
@@ -296,6 +323,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving expiry date information: " + str(e))
 
+    @api_call
     def get_future_symbol(self, exchangeSegment, series, symbol, expiryDate):
         """
         Get future symbol based on the provided parameters.
@@ -317,7 +345,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'exchangeSegment': exchangeSegment, 'series': series, 'symbol': symbol, 'expiryDate': expiryDate}
             
             # Send a GET request to get future symbols
-            response = self.apiRequest._get('market.instruments.instrument.futuresymbol', params)
+            response = yield Request('market.instruments.instrument.futuresymbol', "GET", params)
             
             # Return the response obtained
             return response
@@ -325,6 +353,8 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving future symbols: " + str(e))
     
+
+    @api_call
     def get_option_symbol(self, exchangeSegment, series, symbol, expiryDate, optionType, strikePrice):
         """
         Get option symbol based on the provided parameters.
@@ -349,7 +379,7 @@ class UtradeMarketConnect(UtradeCommon):
                     'optionType': optionType, 'strikePrice': strikePrice}
             
             # Send a GET request to get option symbols
-            response = self.apiRequest._get('market.instruments.instrument.optionsymbol', params)
+            response = yield Request('market.instruments.instrument.optionsymbol', "GET", params)
             
             # Return the response obtained
             return response
@@ -357,6 +387,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving option symbols: " + str(e))
 
+    @api_call
     def get_option_type(self, exchangeSegment, series, symbol, expiryDate):
         """
         Retrieves the option types for a given instrument.
@@ -378,7 +409,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'exchangeSegment': exchangeSegment, 'series': series, 'symbol': symbol, 'expiryDate': expiryDate}
             
             # Send a GET request to get option types
-            response = self.apiRequest._get('market.instruments.instrument.optiontype', params)
+            response = yield Request('market.instruments.instrument.optiontype', "GET", params)
             
             # Return the response obtained
             return response
@@ -386,6 +417,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while retrieving option types: " + str(e))
 
+    @api_call
     def get_index_list(self, exchangeSegment):
         """
         Get the list of indices for a given exchange segment.
@@ -404,7 +436,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'exchangeSegment': exchangeSegment}
             
             # Send a GET request to get the list of indices
-            response = self.apiRequest._get('market.instruments.indexlist', params)
+            response = yield Request('market.instruments.indexlist', "GET", params)
             
             # Return the response obtained
             return response
@@ -412,6 +444,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while getting the list of indices: " + str(e))
 
+    @api_call
     def search_by_instrumentid(self, instruments):
         """
         Search for instruments by their ID.
@@ -430,7 +463,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'source': self.source, 'instruments': instruments}
             
             # Send a POST request to search by instrument ID
-            response = self.apiRequest._post('market.search.instrumentsbyid', json.dumps(params))
+            response = yield Request('market.search.instrumentsbyid', "POST", json.dumps(params))
             
             # Return the response obtained
             return response
@@ -438,6 +471,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while searching by instrument ID: " + str(e))
 
+    @api_call
     def search_by_scriptname(self, searchString):
         """
         Search for instruments by script name.
@@ -456,7 +490,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {'searchString': searchString}
             
             # Send a GET request to search by script name
-            response = self.apiRequest._get('market.search.instrumentsbystring', params)
+            response = yield Request('market.search.instrumentsbystring', "GET", params)
             
             # Return the response obtained
             return response
@@ -464,6 +498,7 @@ class UtradeMarketConnect(UtradeCommon):
             # Handle exceptions and return a description of the error
             raise UtradeGeneralException("Error while searching by script name: " + str(e))
 
+    @api_call
     def marketdata_logout(self):
         """
         Logs out from the market data.
@@ -479,7 +514,7 @@ class UtradeMarketConnect(UtradeCommon):
             params = {}
 
             # Send a DELETE request to log out from market data
-            response = self.apiRequest._delete('market.logout', params)
+            response = yield Request('market.logout', "DELETE", params)
 
             # Return the response obtained
             return response
@@ -491,4 +526,126 @@ class UtradeMarketConnect(UtradeCommon):
     
 
 
+class UtradeMarketConnect(UtradeMarketAPI, UtradeCommon):
+
+    def __init__(self, config, apiKey, secretKey, apiRequest=None) -> None:
+        # initialize the UtradeCommon class
+        super().__init__(config=config, apiKey=apiKey, secretKey=secretKey, apiRequest=apiRequest)
+
+    def get_bulk_quote(self, instruments, eventCode, publishFormat="JSON", chunk_size=QUOTE_CHUNK_SIZE,
+                       max_workers=None, raise_errors=True):
+        """
+        Retrieves quotes for any number of instruments in concurrent, server sized chunks.
+
+        The instruments are split into chunks of `chunk_size`, each chunk is requested with
+        `get_quote` on a thread pool sharing the session's connection pool, and the quotes are
+        merged back in input order.
+
+        Args:
+            instruments (list): List of instrument dicts with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): Event code for the quote request, e.g. 1501.
+            publishFormat (str, optional): Format in which the quotes should be published, only "JSON" is
+                supported. Defaults to "JSON".
+            chunk_size (int, optional): Instruments per request. Defaults to `QUOTE_CHUNK_SIZE`.
+            max_workers (int, optional): Maximum requests in flight. Defaults to the connection pool size.
+            raise_errors (bool, optional): Raise if any chunk fails instead of returning the quotes
+                of the chunks that succeeded. Defaults to True.
+
+        Returns:
+            dict: ``result.listQuotes[i]`` is the quote of ``instruments[i]`` (None if missing),
+            and ``chunks`` lists the size, latency in seconds and error of every request.
+
+        Raises:
+            UtradeInputException: If `publishFormat` is not JSON, see `bulkQuote.check_publish_format`.
+            UtradeGeneralException: If a chunk fails and `raise_errors` is set.
+        """
+        check_publish_format(publishFormat)
+        chunks = chunk_instruments(instruments, chunk_size)
+        if not chunks:
+            return merge_quotes(instruments, [])
+
+        def fetch(chunk):
+            start = time.perf_counter()
+            try:
+                response = self.get_quote(chunk, eventCode, publishFormat)
+            except Exception as e:
+                return chunk, None, time.perf_counter() - start, e
+            return chunk, response, time.perf_counter() - start, None
+
+        workers = min(len(chunks), max_workers or self.apiRequest.pool["pool_maxsize"])
+        if workers == 1:
+            results = [fetch(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(fetch, chunks))
+        return merge_quotes(instruments, results, raise_errors)
+
+    def get_instrument_master(self, exchangeSegmentList, cache_dir=None, refresh=False, max_age=None):
+        """
+        Retrieves the master data and parses it into an indexed `InstrumentMaster`.
+
+        With `cache_dir` the master is cached on disk per segment list and trading date: the first
+        call of the day downloads and writes it, later calls from any process on the host
+        memory-map the file instead of downloading.
+
+        Args:
+            exchangeSegmentList (list): A list of exchange segments, e.g. ["NSECM", "NSEFO"].
+            cache_dir (str, optional): Directory of the on-disk master cache. Defaults to None, no caching.
+            refresh (bool, optional): Download and rewrite the cached master even if it is fresh.
+            max_age (float, optional): Seconds after which a cached master of today is also refreshed.
+
+        Returns:
+            InstrumentMaster: The master, answering lookups by instrument ID, symbol and contract.
+
+        Raises:
+            UtradeGeneralException: If an error occurs while retrieving or parsing master data.
+        """
+        try:
+            if cache_dir is None:
+                return InstrumentMaster.from_response(self.get_master(exchangeSegmentList))
+            return InstrumentMasterCache(cache_dir, max_age).get(exchangeSegmentList, self.get_master, refresh=refresh)
+        except UtradeGeneralException:
+            raise
+        except Exception as e:
+            # Handle exceptions and return a description of the error
+            raise UtradeGeneralException("Error while loading instrument master: " + str(e))
+
+    def get_ohlc_history(self, instruments, startTime, endTime, compressionValue, cache_dir=None,
+                         window_bars=OHLC_WINDOW_BARS, max_workers=None, retries=3, raise_errors=True,
+                         base_compression=None):
+        """
+        Retrieves OHLC bars of many instruments over long ranges, see `utradeconnect.ohlcHistory`.
+
+        The range is split into windows of `window_bars` bars, the windows of all instruments are
+        fetched with `get_ohlc` on a thread pool, and overlapping bars are de-duplicated. With
+        `cache_dir` the bars are kept on disk and only ranges not downloaded before are fetched.
+        With `base_compression` the finer bars are downloaded (and cached) once and resampled
+        locally, aligned to the 09:15 session start, so every coarser compression reuses them.
+
+        Args:
+            instruments (list): List of instrument dicts with exchangeSegment and exchangeInstrumentID.
+            startTime (str): The start time in the format 'YYYY-MM-DD HH:MM:SS', or a datetime.
+            endTime (str): The end time in the format 'YYYY-MM-DD HH:MM:SS', or a datetime.
+            compressionValue (int): The bar length in seconds, e.g. 60.
+            cache_dir (str, optional): Directory of the on-disk OHLC cache. Defaults to None, no caching.
+            window_bars (int, optional): Bars per request. Defaults to `OHLC_WINDOW_BARS`.
+            max_workers (int, optional): Maximum requests in flight. Defaults to the connection pool size.
+                The requests are paced by the client's `rate_limits` when enabled.
+            retries (int, optional): Attempts after a failed request. Defaults to 3.
+            raise_errors (bool, optional): Raise if a window still fails after its retries instead of
+                returning the bars that were downloaded. Defaults to True.
+            base_compression (int, optional): The compression to download and resample from, e.g.
+                60. Defaults to None, download `compressionValue` itself.
 
+        Returns:
+            dict: ``(exchangeSegment, exchangeInstrumentID)`` -> timestamp, open, high, low, close,
+            volume and openInterest arrays sorted by timestamp.
+
+        Raises:
+            UtradeInputException: If `compressionValue` is not a multiple of `base_compression`.
+            UtradeGeneralException: If a window fails and `raise_errors` is set.
+        """
+        history = OhlcHistory(self, cache_dir=cache_dir, window_bars=window_bars, max_workers=max_workers,
+                              retries=retries)
+        return history.load(instruments, startTime, endTime, compressionValue, raise_errors=raise_errors,
+                            base_compression=base_compression)
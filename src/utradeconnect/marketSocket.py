@@ -1,9 +1,58 @@
 import configparser
 import os
+import re
+import threading
+import time
 from datetime import datetime
 
 import socketio
 
+from utradeconnect.bulkQuote import chunk_instruments
+from utradeconnect.conflation import TickConflator, merge_partial
+from utradeconnect.exception import UtradeException, UtradeGeneralException, UtradeInputException, UtradeTokenException
+from utradeconnect.request import APIRequest
+from utradeconnect.ringBuffer import BufferedDispatcher
+from utradeconnect.subscriptionManager import SubscriptionManager
+from utradeconnect.ticks import decode_event
+
+# Connection errors that mean the token in the connection URL is no longer accepted
+_AUTH_ERROR = re.compile(r'\b40[13]\b|token|unauthori[sz]ed|expired|invalid user', re.IGNORECASE)
+
+
+class _TrackedClient(socketio.Client):
+    """
+    A Socket.IO client that reports connection life-cycle events to its `MDSocket_io`.
+
+    The report happens before the application handler runs, so handlers registered later
+    through `get_emitter().on('connect', ...)` cannot turn off subscription recovery.
+    """
+
+    def __init__(self, owner, **kwargs):
+        super().__init__(**kwargs)
+        self._owner = owner
+
+    def _trigger_event(self, event, namespace, *args):
+        if namespace == '/' and event in ('connect', 'disconnect', 'connect_error'):
+            self._owner._connection_event(event, *args)
+        return super()._trigger_event(event, namespace, *args)
+
+
+def _partial_merger(eventCode):
+    """
+    The merge function for pending ``(event or callback, message)`` pairs of a partial event.
+
+    Args:
+        eventCode (int): The event code, e.g. 1501.
+
+    Returns:
+        callable: ``merge(pending, newer)`` combining the messages with `merge_partial`.
+    """
+    def merge(pending, newer):
+        if pending[0] != newer[0]:
+            return newer
+        return newer[0], merge_partial(eventCode, pending[1], newer[1])
+    return merge
+
 
 class MDSocket_io(socketio.Client):
     """A Socket.IO client.
@@ -37,37 +86,107 @@ class MDSocket_io(socketio.Client):
                  packets. Custom json modules must have 'dumps' and 'loads'
                  functions that are compatible with the standard library
                  versions.
+    :param decode: 'True' to hand the event callbacks typed records from
+                   `utradeconnect.ticks` (`Touchline`, `MarketDepth`, `Candle`,
+                   `MarketStatus`, `OpenInterest`, `LTP`,
+                   `InstrumentPropertyChange`) instead of the raw message
+                   strings. The default is 'False'.
+    :param conflate: 'True' to keep only the latest pending tick per
+                     instrument and event code instead of invoking the
+                     callbacks from the receive thread. The consumer calls
+                     `drain` (or `dispatch_conflated`) whenever it is ready,
+                     or sets `conflate_interval`.
+                     Partial messages of an instrument are merged rather
+                     than replaced, so no changed field is lost. 1505,
+                     1507 and 1105 events are never conflated and are
+                     delivered immediately. The default is 'False'.
+    :param conflate_interval: With `conflate`, seconds between automatic
+                              drains: a timer thread started by `connect`
+                              passes every pending tick to its callback, so
+                              no tick waits longer than this. The default is
+                              None, the consumer drains.
+    :param buffer_size: When set, the receive thread only decodes each event
+                        and pushes it into a preallocated ring buffer of this
+                        many slots, and `consumers` threads drain it and run
+                        the callbacks. The default is 0, callbacks run on the
+                        receive thread.
+    :param overflow: What to do when the ring buffer is full: 'drop_oldest',
+                     'block' or 'conflate' (keep only the latest pending tick
+                     per instrument and event code, merging partial
+                     messages, except for `unconflated_events`). The
+                     default is 'drop_oldest'.
+    :param consumers: Number of consumer threads draining the ring buffer.
+                      The default is 1.
+    :param journal: A `TickJournalWriter` that records every received event
+                    with its receive timestamp before it is dispatched. The
+                    default is None.
+    :param client: The `UtradeConnect` the socket was logged in with. When
+                   given, the socket tracks its subscriptions in a
+                   `SubscriptionManager` (see `subscribe`) and recovers them
+                   after a reconnect: it logs in again if the token was
+                   rejected, resubscribes in batched calls, fetches a
+                   `get_bulk_quote` snapshot of the subscribed instruments
+                   and reports the outage to `on_gap`. The default is None.
+    :param subscriptions: A `SubscriptionManager` of `client` to share with
+                          other code instead of creating one. The default is
+                          None.
     """
 
+    # Candles, market status and property changes are each needed, never conflate them
+    unconflated_events = (1505, 1507, 1105)
+
+    # Event codes `get_quote` can snapshot after a reconnect
+    snapshot_events = (1501, 1502, 1510, 1512)
+
+    events = (
+        ('1501-json-full', 'on_message1501_json_full'),
+        ('1501-json-partial', 'on_message1501_json_partial'),
+        ('1502-json-full', 'on_message1502_json_full'),
+        ('1502-json-partial', 'on_message1502_json_partial'),
+        ('1505-json-full', 'on_message1505_json_full'),
+        ('1505-json-partial', 'on_message1505_json_partial'),
+        ('1507-json-full', 'on_message1507_json_full'),
+        ('1510-json-full', 'on_message1510_json_full'),
+        ('1510-json-partial', 'on_message1510_json_partial'),
+        ('1512-json-full', 'on_message1512_json_full'),
+        ('1512-json-partial', 'on_message1512_json_partial'),
+        ('1105-json-full', 'on_message1105_json_full'),
+        ('1105-json-partial', 'on_message1105_json_partial'),
+    )
+
     def __init__(self, token, userID, base_url=None, broadcast_mode = "FULL", reconnection=True, reconnection_attempts=0, reconnection_delay=1,
                  reconnection_delay_max=50000, randomization_factor=0.5, logger=False, binary=False, json=None,
-                 **kwargs):
-        self.sid = socketio.Client(logger=True, engineio_logger=True)
+                 decode=False, conflate=False, buffer_size=0, overflow='drop_oldest', consumers=1, journal=None,
+                 client=None, subscriptions=None, conflate_interval=None, **kwargs):
+        self.sid = _TrackedClient(self, reconnection=reconnection, reconnection_attempts=reconnection_attempts,
+                                   reconnection_delay=reconnection_delay, reconnection_delay_max=reconnection_delay_max,
+                                   randomization_factor=randomization_factor, logger=True, engineio_logger=True)
         self.eventlistener = self.sid
+        self.decode = decode
+        self.conflator = TickConflator() if conflate else None
+        self.conflate_interval = conflate_interval
+        self.dispatcher = BufferedDispatcher(buffer_size, overflow, consumers, 'utrade-md-consumer') if buffer_size else None
+        self.journal = journal
+        self._handlers = dict(self.events)
+        # Pending partial messages are merged into newer ones instead of being replaced
+        self._mergers = {event: _partial_merger(int(event[:4])) for event, _ in self.events if event.endswith('partial')}
+        self._listeners = {}
+        self.listener_errors = 0
+        self.journal_errors = 0
+        self.client = client
+        if subscriptions is None and client is not None:
+            subscriptions = SubscriptionManager(client)
+        self.subscriptions = subscriptions
+        self.disconnectedAt = None
+        self.gaps = []
+        self._relogged = False
 
         self.sid.on('connect', self.on_connect)
         self.sid.on('message', self.on_message)
 
         #  """Similarly implement partial json full and binary json full."""
-        self.sid.on('1501-json-full', self.on_message1501_json_full)
-        self.sid.on('1501-json-partial', self.on_message1501_json_partial)
-
-        self.sid.on('1502-json-full', self.on_message1502_json_full)
-        self.sid.on('1502-json-partial', self.on_message1502_json_partial)
-
-        self.sid.on('1505-json-full', self.on_message1505_json_full)
-        self.sid.on('1505-json-partial', self.on_message1505_json_partial)
-
-        self.sid.on('1507-json-full', self.on_message1507_json_full)
-
-        self.sid.on('1510-json-full', self.on_message1510_json_full)
-        self.sid.on('1510-json-partial', self.on_message1510_json_partial)
-
-        self.sid.on('1512-json-full', self.on_message1512_json_full)
-        self.sid.on('1512-json-partial', self.on_message1512_json_partial)
-
-        self.sid.on('1105-json-full', self.on_message1105_json_full)
-        self.sid.on('1105-json-partial', self.on_message1105_json_partial)
+        for event, _ in self.events:
+            self.sid.on(event, self._make_handler(event))
 
         self.sid.on('disconnect', self.on_disconnect)
 
@@ -81,13 +200,17 @@ class MDSocket_io(socketio.Client):
         self.userID = userID
         publishFormat = 'JSON'
         self.broadcastMode = broadcast_mode if broadcast_mode else configParser.get('root_url', 'broadcastMode')
+        self.publishFormat = publishFormat
         self.token = token
 
-        port = f'{self.port}/?token='
-
-        self.connection_url = port + token + '&userID=' + self.userID + '&publishFormat=' + publishFormat + '&broadcastMode=' + self.broadcastMode
+        self.connection_url = self._connection_url()
         self.socketio_path = '/api/V2/market/socket/socket.io'
 
+    def _connection_url(self):
+        """The socket URL carrying the current token and user ID."""
+        port = f'{self.port}/?token='
+        return port + self.token + '&userID=' + self.userID + '&publishFormat=' + self.publishFormat + '&broadcastMode=' + self.broadcastMode
+
 
     def connect(self, headers={}, transports='websocket', namespaces=None, verify=False):
         """
@@ -95,12 +218,340 @@ class MDSocket_io(socketio.Client):
         Connect to the socket.
         """
         url = self.connection_url
+        if self.dispatcher is not None:
+            self.dispatcher.start()
+        self.start_conflation()
         """Connected to the socket."""
         self.sid.connect(url, headers, transports, namespaces, self.socketio_path)
         self.sid.wait()
+        if self.conflator is not None:
+            self.conflator.stop()
         """Disconnected from the socket."""
         # self.sid.disconnect()
 
+    def subscribe(self, instruments, eventCode):
+        """
+        Subscribe instruments through the socket's `SubscriptionManager`, so they are
+        resubscribed automatically after a reconnect.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): The event code, e.g. 1501.
+
+        Returns:
+            list: The calls sent, see `SubscriptionManager.flush`.
+
+        Raises:
+            UtradeInputException: If the socket was created without a `client`.
+        """
+        return self._subscriptions().subscribe(instruments, eventCode)
+
+    def unsubscribe(self, instruments, eventCode):
+        """
+        Drop instruments subscribed with `subscribe`.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): The event code, e.g. 1501.
+
+        Returns:
+            list: The calls sent, see `SubscriptionManager.flush`.
+
+        Raises:
+            UtradeInputException: If the socket was created without a `client`.
+        """
+        return self._subscriptions().unsubscribe(instruments, eventCode)
+
+    def _subscriptions(self):
+        if self.subscriptions is None:
+            raise UtradeInputException("MDSocket_io needs a client to track subscriptions")
+        return self.subscriptions
+
+    def _connection_event(self, event, *args):
+        """
+        Track the connection state for subscription recovery.
+
+        Called on the socket threads for every 'connect', 'disconnect' and 'connect_error' event.
+        A rejected reconnect attempt that looks like an authentication failure logs in again, so
+        the next attempt of the reconnect loop uses the new token. The first 'connect' after a
+        'disconnect' starts `recover` on a background task, leaving the receive thread free to
+        deliver the ticks of the resubscribed instruments.
+        """
+        if event == 'disconnect':
+            if self.disconnectedAt is None:
+                self.disconnectedAt = time.time()
+                self._relogged = False
+        elif event == 'connect_error':
+            if self.disconnectedAt is not None and self.client is not None \
+                    and _AUTH_ERROR.search(str(args[0] if args else '')):
+                try:
+                    self.relogin()
+                except UtradeTokenException as e:
+                    print('Market data re-login failed', e)
+        elif self.disconnectedAt is not None:
+            disconnectedAt, self.disconnectedAt = self.disconnectedAt, None
+            self.sid.start_background_task(self.recover, disconnectedAt, time.time())
+
+    def relogin(self):
+        """
+        Log in to market data again and point the reconnect loop at the new token.
+
+        When the client's session carries the socket's market data token (a market data only
+        client), the client logs in again and keeps using the new token. When it carries another
+        token, e.g. the interactive token of a combined `UtradeConnect`, the login goes through a
+        separate request so the client's token is left alone and only the socket moves to the new
+        market data token.
+
+        Returns:
+            dict: The `marketdata_login` response.
+
+        Raises:
+            UtradeTokenException: If the login fails.
+        """
+        if self.client.apiRequest.token in (None, self.token):
+            response = self.client.marketdata_login()
+            token, userID = self.client.token, self.client.userID
+        else:
+            response = self._separate_login()
+            token, userID = response['result']['token'], response['result']['userID']
+        self._relogged = True
+        self.token = token
+        self.userID = userID
+        self.connection_url = self._connection_url()
+        # The reconnect loop of socketio reconnects to the URL of the previous connect call
+        self.sid.connection_url = self.connection_url
+        return response
+
+    def _separate_login(self):
+        """Log in to market data on a separate request session, leaving the client's token unchanged."""
+        client = self.client
+        request = APIRequest(base_url=client.apiRequest.root, disable_ssl=client.apiRequest.disable_ssl,
+                             timeout=client.apiRequest.timeout)
+        try:
+            response = request._post("market.login", {
+                "appKey": client.apiKey,
+                "secretKey": client.secretKey,
+                "source": client.source,
+            })
+        except Exception as e:
+            raise UtradeTokenException("Error while logging in to market data: " + str(e))
+        finally:
+            request.close()
+        if "token" not in (response.get('result') or {}):
+            raise UtradeTokenException("Error while logging in to market data: {}".format(response))
+        return response
+
+    def recover(self, disconnectedAt, reconnectedAt):
+        """
+        Restore the subscriptions after a reconnect and report the gap.
+
+        The server forgets the subscriptions of a dropped connection: every tracked subscription
+        is sent again in batched calls (logging in again first if the token was rejected), the
+        subscribed instruments are snapshotted with `get_bulk_quote` to fill the gap, and
+        `on_gap` is called with the outage. Errors are collected in the gap instead of raised,
+        since this runs on a background task.
+
+        Args:
+            disconnectedAt (float): When the connection dropped, epoch seconds.
+            reconnectedAt (float): When it was established again, epoch seconds.
+
+        Returns:
+            dict: The gap passed to `on_gap`.
+        """
+        gap = {
+            'disconnectedAt': disconnectedAt,
+            'reconnectedAt': reconnectedAt,
+            'duration': reconnectedAt - disconnectedAt,
+            'relogin': False,
+            'resubscribed': 0,
+            'snapshot': {},
+            'errors': [],
+        }
+        if self.subscriptions is not None:
+            try:
+                sent = self._resubscribe()
+                gap['resubscribed'] = sum(len(instruments) for _, _, instruments, _ in sent)
+            except UtradeGeneralException as e:
+                gap['errors'].append(str(e))
+            for eventCode in self.snapshot_events:
+                instruments = self.subscriptions.subscribed(eventCode)
+                if not instruments:
+                    continue
+                instruments = [{'exchangeSegment': instrument['exchangeSegment'],
+                                'exchangeInstrumentID': instrument['exchangeInstrumentID']}
+                               for instrument in instruments]
+                try:
+                    snapshot = self.client.get_bulk_quote(instruments, eventCode, raise_errors=False)
+                except UtradeGeneralException as e:
+                    gap['errors'].append(str(e))
+                    continue
+                gap['snapshot'][eventCode] = snapshot
+                gap['errors'].extend(chunk['error'] for chunk in snapshot['chunks'] if chunk['error'])
+        gap['relogin'] = self._relogged
+        self.gaps.append(gap)
+        self.on_gap(gap)
+        return gap
+
+    def _resubscribe(self):
+        """Resubscribe, logging in again once if the calls are rejected for the token."""
+        try:
+            return self.subscriptions.resubscribe()
+        except UtradeGeneralException as e:
+            if not _AUTH_ERROR.search(str(e)):
+                raise
+        try:
+            self.relogin()
+        except UtradeTokenException as e:
+            raise UtradeGeneralException(str(e))
+        return self.subscriptions.flush()
+
+    def _make_handler(self, event):
+        """Build the socket.io handler that routes every message of `event` through `dispatch_event`."""
+        def handler(data):
+            self.dispatch_event(event, data)
+        return handler
+
+    def dispatch_event(self, event, data, record=None):
+        """
+        Deliver a market data message to its callback.
+
+        The message is decoded into its `utradeconnect.ticks` record when `decode` is enabled and
+        passed to the matching `on_message<code>_json_<mode>` method, looked up at call time so
+        callbacks assigned after construction are honoured.
+
+        A failing journal does not stop delivery: the error is printed once and every event it
+        rejects is counted in `journal_errors`.
+
+        Args:
+            event (str): The socket event name, e.g. '1501-json-full'.
+            data (str): The raw message, None when only `record` is known.
+            record (optional): The already decoded record, e.g. from a packed journal. Without
+                `data` it is delivered as is, so callbacks receive records even when `decode` is off.
+        """
+        if self.journal is not None and data is not None:
+            try:
+                self.journal.record(event, data)
+            except UtradeException as e:
+                self.journal_errors += 1
+                if self.journal_errors == 1:
+                    print('Tick journal failed, events are no longer recorded', e)
+        # Records only, e.g. replayed from a packed journal, are delivered whatever `decode` says
+        decoded = self.decode or data is None
+        if self._listeners:
+            listeners = self._listeners.get(int(event[:4]))
+            if listeners:
+                if record is None:
+                    record = decode_event(event, data)
+                for listener in listeners:
+                    try:
+                        listener(record)
+                    except Exception as e:
+                        # A failing listener must not cost the other listeners or the callback the event
+                        self.listener_errors += 1
+                        print('Error in market data listener', e)
+        if self.conflator is not None:
+            if record is None:
+                record = decode_event(event, data)
+            if record.eventCode not in self.unconflated_events:
+                key = (record.exchangeSegment, record.exchangeInstrumentID, record.eventCode)
+                self.conflator.push(key, (event, record if decoded else data), self._mergers.get(event))
+                return
+            if decoded:
+                data = record
+        elif self.dispatcher is not None and self.dispatcher.buffer.overflow == 'conflate':
+            if record is None:
+                record = decode_event(event, data)
+            key = None
+            if record.eventCode not in self.unconflated_events:
+                key = (record.exchangeSegment, record.exchangeInstrumentID, record.eventCode)
+            self.dispatcher.submit(getattr(self, self._handlers[event]), record if decoded else data, key,
+                                   self._mergers.get(event))
+            return
+        elif decoded:
+            data = record if record is not None else decode_event(event, data)
+        if self.dispatcher is not None:
+            self.dispatcher.submit(getattr(self, self._handlers[event]), data)
+            return
+        getattr(self, self._handlers[event])(data)
+
+    def add_listener(self, eventCode, callback):
+        """
+        Call `callback` with the decoded record of every event of `eventCode`.
+
+        Listeners run on the receive thread before the event reaches its `on_message` callback,
+        whatever the `decode`, `conflate` and `buffer_size` settings, so they see every event and
+        must return quickly. They are meant for internal state kept in step with the stream, such
+        as the `InstrumentMaster` applying 1105 property changes. An exception raised by a
+        listener is printed and counted in `listener_errors`; the event still reaches the other
+        listeners and its callback.
+
+        Args:
+            eventCode (int): The event code, e.g. 1105.
+            callback (callable): Called with the `utradeconnect.ticks` record of each event.
+        """
+        self._listeners.setdefault(eventCode, []).append(callback)
+
+    def remove_listener(self, eventCode, callback):
+        """
+        Remove a listener added with `add_listener`.
+
+        Args:
+            eventCode (int): The event code it was added for.
+            callback (callable): The callback to remove.
+        """
+        listeners = self._listeners.get(eventCode, [])
+        if callback in listeners:
+            listeners.remove(callback)
+        if not listeners:
+            self._listeners.pop(eventCode, None)
+
+    def get_buffer_stats(self):
+        """
+        Ring buffer counters when `buffer_size` is set.
+
+        Returns:
+            dict: Depth, high-water mark, pushed, popped, dropped and conflated counts, or None.
+        """
+        return self.dispatcher.stats() if self.dispatcher is not None else None
+
+    def drain(self):
+        """
+        Take the latest pending tick of every instrument when conflation is enabled.
+
+        Returns:
+            ConflatedBatch: ``ticks`` holds ``(event, data)`` pairs, one per instrument and event
+            code that updated since the previous drain, and ``conflated`` the number of
+            superseded updates that were skipped.
+        """
+        return self.conflator.drain()
+
+    def start_conflation(self):
+        """
+        Start draining conflated ticks into their callbacks every `conflate_interval` seconds.
+
+        Called by `connect`; replaying a journal calls it too. Does nothing without `conflate`
+        and `conflate_interval`.
+        """
+        if self.conflator is not None and self.conflate_interval:
+            self.conflator.start(self._dispatch_tick, self.conflate_interval)
+
+    def _dispatch_tick(self, tick):
+        event, data = tick
+        getattr(self, self._handlers[event])(data)
+
+    def dispatch_conflated(self):
+        """
+        Drain the conflated ticks and invoke the event callbacks for each of them.
+
+        Returns:
+            int: The number of updates conflated away in this batch.
+        """
+        batch = self.conflator.drain()
+        handlers = self._handlers
+        for event, data in batch.ticks:
+            getattr(self, handlers[event])(data)
+        return batch.conflated
+
     def on_connect(self):
         """Connect from the socket.
 
@@ -111,70 +562,85 @@ class MDSocket_io(socketio.Client):
 
     def on_message(self, data):
         """On receiving message"""
-        print('I received a message!' + data)
+        print('I received a message!', data)
 
     def on_message1502_json_full(self, data):
         """On receiving message code 1502 full for Market depth message Event"""
-        print('I received a 1502 Market depth message!' + data)
+        print('I received a 1502 Market depth message!', data)
 
     def on_message1507_json_full(self, data):
             """On receiving message code 1507 full for MarketStatus message Event"""
-            print('I received a 1507 MarketStatus message!' + data)
+            print('I received a 1507 MarketStatus message!', data)
             
     def on_message1512_json_full(self, data):
             """On receiving message code 1512 full for LTP message Event"""
-            print('I received a 1512 LTP message!' + data)     
+            print('I received a 1512 LTP message!', data)     
 
     def on_message1505_json_full(self, data):
         """On receiving message code 1505 full for Candle data message Event"""
-        print('I received a 1505 Candle data message!' + data)
+        print('I received a 1505 Candle data message!', data)
 
     def on_message1510_json_full(self, data):
         """On receiving message code 1510 full for Open interest message Event"""
-        print('I received a 1510 Open interest message!' + data)
+        print('I received a 1510 Open interest message!', data)
 
     def on_message1501_json_full(self, data):
         """On receiving message code 1501 full for Level1,Touchline message Event"""
-        print('I received a 1501 Level1,Touchline message!' + data)
+        print('I received a 1501 Level1,Touchline message!', data)
 
     def on_message1502_json_partial(self, data):
         """On receiving message code 1502 partial for Market depth message Event"""
-        print('I received a 1502 partial message!' + data)
+        print('I received a 1502 partial message!', data)
     
     def on_message1512_json_partial(self, data):
         """On receiving message code 1512 partial for LTP message Event"""
-        print('I received a 1512 LTP message!' + data)
+        print('I received a 1512 LTP message!', data)
 
     def on_message1505_json_partial(self, data):
         """On receiving message code 1505 partial for Candle data message Event"""
-        print('I received a 1505 Candle data message!' + data)
+        print('I received a 1505 Candle data message!', data)
 
     def on_message1510_json_partial(self, data):
         """On receiving message code 1510 partial for Open interest message Event"""
-        print('I received a 1510 Open interest message!' + data)
+        print('I received a 1510 Open interest message!', data)
 
     def on_message1501_json_partial(self, data):
         """On receiving message code 1501 partial for Touchline message Event"""
         now = datetime.now()
         today = now.strftime("%H:%M:%S")
-        print(today, 'in main 1501 partial Level1,Touchline message!' + data + ' \n')
+        print(today, 'in main 1501 partial Level1,Touchline message!', data, '\n')
 
     def on_message1105_json_full(self, data):
-        """On receiving message code 1501 full for Touchline message Event"""
-        print('I received a 1501 Level1,Touchline message!' + data)
+        """On receiving message code 1105 full for Instrument Property Change Event"""
+        print('I received a 1105 Instrument Property Change Event!', data)
 
     def on_message1105_json_partial(self, data):
         """On receiving message code 1105 partial for Instrument Property Change Event"""
         now = datetime.now()
         today = now.strftime("%H:%M:%S")
-        print(today, 'in main 1105 partial, Instrument Property Change Event!' + data + ' \n')
+        print(today, 'in main 1105 partial, Instrument Property Change Event!', data, '\n')
 
-        print('I received a 1105 Instrument Property Change Event!' + data)
+        print('I received a 1105 Instrument Property Change Event!', data)
 
-    def on_disconnect(self, data):
+    def on_disconnect(self, data=None):
         """Disconnected from the socket"""
         print('Market Data Socket disconnected!')
 
+    def on_gap(self, gap):
+        """
+        Called after a reconnect once the subscriptions were restored.
+
+        This method can be overridden to reconcile state with the snapshot of the missed period.
+
+        Args:
+            gap (dict): ``disconnectedAt`` and ``reconnectedAt`` (epoch seconds), ``duration``
+                (seconds), ``relogin`` (whether the token was renewed), ``resubscribed`` (number
+                of instrument subscriptions sent again), ``snapshot`` (event code ->
+                `get_bulk_quote` response of the subscribed instruments) and ``errors``.
+        """
+        print('Market Data Socket gap of {:.1f}s, resubscribed {} instruments'.format(
+            gap['duration'], gap['resubscribed']))
+
     def on_error(self, data):
         """Error from the socket"""
         print('Market Data Error', data)
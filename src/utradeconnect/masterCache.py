@@ -0,0 +1,306 @@
+"""
+On-disk cache of the instrument master, shared by every process on a host.
+
+The first process of the trading day downloads the master, parses it into an `InstrumentMaster`
+and writes its columns into a single file; every later process memory-maps that file and uses
+the columns in place, so start-up costs a few milliseconds and the pages are shared through the
+OS page cache instead of each process holding its own copy.
+
+File layout:
+
+    8 bytes   magic ``UIM1\\x00\\x00\\x00\\x00``
+    uint32    header length, little endian
+    bytes     JSON header: format version, exchange segments, trading date, creation time, row
+              count and the offset and size of every column section
+    sections  8-byte aligned, in the writer's byte order (recorded in the header); numeric columns
+              as packed arrays, text columns as a uint32 offsets array (rows + 1 entries) followed
+              by the UTF-8 bytes of all values
+
+The file is mapped with ``ACCESS_COPY``: pages stay shared until a process modifies a column in
+place, which then only changes that process's private copy and never the file.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import date
+
+from utradeconnect.exception import UtradeDataException
+from utradeconnect.instrumentMaster import COLUMNS, InstrumentMaster, segment_code
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b'UIM1\x00\x00\x00\x00'
+VERSION = 1
+_LENGTH = struct.Struct('<I')
+
+
+class StringColumn:
+    """
+    A read-only text column over a memory-mapped offsets array and UTF-8 blob.
+
+    Values are decoded on access, so opening the cache does not touch the text pages.
+    """
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        offsets = self._offsets
+        return str(self._data[offsets[row]:offsets[row + 1]], 'utf8')
+
+    def __iter__(self):
+        data = bytes(self._data)
+        offsets = self._offsets
+        return (str(data[start:end], 'utf8') for start, end in zip(offsets, offsets[1:]))
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def write_master(master, path, **meta):
+    """
+    Write an `InstrumentMaster` to a cache file.
+
+    The file is written next to `path` and renamed into place, so readers never see a partial file.
+
+    Args:
+        master (InstrumentMaster): The master to write.
+        path (str): The cache file path.
+        **meta: Extra JSON serialisable header values, e.g. segments and tradingDate.
+    """
+    sections = []
+    for name, typecode in COLUMNS:
+        column = master.columns[name]
+        if typecode:
+            sections.append((name, typecode, [array(typecode, column).tobytes()]))
+        else:
+            encoded = [value.encode('utf8') for value in column]
+            offsets = array('I', [0])
+            total = 0
+            for value in encoded:
+                total += len(value)
+                offsets.append(total)
+            sections.append((name, None, [offsets.tobytes(), b''.join(encoded)]))
+
+    header = dict(meta, version=VERSION, createdAt=time.time(), rows=len(master),
+                  byteorder=sys.byteorder, columns=[])
+    # The section offsets are part of the header, lay them out until the header size settles
+    start = 0
+    while True:
+        encodedHeader = json.dumps(header).encode('utf8')
+        needed = _align(len(MAGIC) + _LENGTH.size + len(encodedHeader))
+        if needed <= start:
+            break
+        start = needed + 64
+        offset = start
+        header['columns'] = []
+        for name, typecode, parts in sections:
+            placed = []
+            for part in parts:
+                placed.append([offset, len(part)])
+                offset = _align(offset + len(part))
+            header['columns'].append({'name': name, 'typecode': typecode, 'sections': placed})
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(MAGIC)
+            file.write(_LENGTH.pack(len(encodedHeader)))
+            file.write(encodedHeader)
+            for (name, typecode, parts), column in zip(sections, header['columns']):
+                for part, (offset, size) in zip(parts, column['sections']):
+                    file.write(b'\x00' * (offset - file.tell()))
+                    file.write(part)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def read_header(path):
+    """
+    Read the header of a cache file without mapping its columns.
+
+    Args:
+        path (str): The cache file path.
+
+    Returns:
+        dict: The header, see `write_master`.
+
+    Raises:
+        UtradeDataException: If the file is not an instrument master cache.
+    """
+    with open(path, 'rb') as file:
+        prefix = file.read(len(MAGIC) + _LENGTH.size)
+        if prefix[:len(MAGIC)] != MAGIC or len(prefix) < len(MAGIC) + _LENGTH.size:
+            raise UtradeDataException("Not an instrument master cache: {}".format(path))
+        length, = _LENGTH.unpack_from(prefix, len(MAGIC))
+        try:
+            return json.loads(file.read(length))
+        except ValueError:
+            raise UtradeDataException("Corrupt instrument master cache: {}".format(path))
+
+
+def read_master(path):
+    """
+    Memory-map a cache file as an `InstrumentMaster`.
+
+    Args:
+        path (str): The cache file path.
+
+    Returns:
+        tuple: ``(InstrumentMaster, header)``.
+
+    Raises:
+        UtradeDataException: If the file is not a compatible instrument master cache.
+    """
+    header = read_header(path)
+    if header.get('version') != VERSION or header.get('byteorder') != sys.byteorder:
+        raise UtradeDataException("Incompatible instrument master cache: {}".format(path))
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    view = memoryview(mapped)
+    columns = {}
+    for column in header['columns']:
+        sections = [view[offset:offset + size] for offset, size in column['sections']]
+        if column['typecode']:
+            columns[column['name']] = sections[0].cast(column['typecode'])
+        else:
+            columns[column['name']] = StringColumn(sections[0].cast('I'), sections[1])
+    return InstrumentMaster(columns), header
+
+
+class InstrumentMasterCache:
+    """
+    A directory of instrument master cache files, one per exchange segment list and trading date.
+
+    `get` returns the cached master when a fresh file exists and otherwise downloads, writes and
+    maps a new one. An exclusive ``flock`` on a lock file makes sure that when many processes
+    start together only one of them downloads while the others wait and then map its file.
+
+    Args:
+        directory (str): The cache directory, created if missing.
+        max_age (float, optional): Seconds after which a file of the current trading date is also
+            considered stale, e.g. to pick up intraday listings. Defaults to None, only the
+            trading date matters.
+    """
+
+    def __init__(self, directory, max_age=None):
+        self.directory = directory
+        self.max_age = max_age
+
+    def path(self, exchangeSegmentList, tradingDate=None):
+        """
+        The cache file of a segment list and trading date.
+
+        Args:
+            exchangeSegmentList (list): The exchange segments, in any order.
+            tradingDate (date, optional): Defaults to today.
+
+        Returns:
+            str: The file path.
+        """
+        segments = '_'.join(sorted(str(segment).upper() for segment in exchangeSegmentList))
+        tradingDate = tradingDate or date.today()
+        return os.path.join(self.directory, 'master-{}-{}.uim'.format(segments, tradingDate.strftime('%Y%m%d')))
+
+    def is_fresh(self, path):
+        """
+        Whether a cache file exists, was written by a compatible writer and is younger than `max_age`.
+
+        A file of another format version or byte order counts as stale, so it is rewritten
+        instead of failing in `read_master`.
+
+        Args:
+            path (str): The cache file path.
+
+        Returns:
+            bool: True if the file can be used.
+        """
+        try:
+            header = read_header(path)
+        except (OSError, UtradeDataException):
+            return False
+        if header.get('version') != VERSION or header.get('byteorder') != sys.byteorder:
+            return False
+        return self.max_age is None or time.time() - header.get('createdAt', 0) < self.max_age
+
+    def get(self, exchangeSegmentList, fetch, tradingDate=None, refresh=False):
+        """
+        Return the master of a segment list, from the cache when it is fresh.
+
+        Args:
+            exchangeSegmentList (list): The exchange segments, e.g. ["NSECM", "NSEFO"].
+            fetch (callable): Called with `exchangeSegmentList` to download the master when the
+                cache is stale, e.g. `UtradeMarketConnect.get_master`.
+            tradingDate (date, optional): The trading date the master is valid for. Defaults to today.
+            refresh (bool, optional): Download and rewrite the cache even if it is fresh.
+
+        Returns:
+            InstrumentMaster: The memory-mapped master.
+        """
+        path = self.path(exchangeSegmentList, tradingDate)
+        if not refresh and self.is_fresh(path):
+            return read_master(path)[0]
+        requestedAt = time.time()
+        with self._lock(path):
+            # Another process may have written the file while this one waited for the lock
+            if refresh:
+                stale = not self.is_fresh(path) or read_header(path).get('createdAt', 0) < requestedAt
+            else:
+                stale = not self.is_fresh(path)
+            if stale:
+                self._write(exchangeSegmentList, fetch(exchangeSegmentList), path, tradingDate)
+        return read_master(path)[0]
+
+    def store(self, exchangeSegmentList, response, tradingDate=None):
+        """
+        Write a downloaded master into the cache and map it, for callers that fetch it themselves.
+
+        Args:
+            exchangeSegmentList (list): The exchange segments of the master.
+            response (dict): The `get_master` response.
+            tradingDate (date, optional): The trading date the master is valid for. Defaults to today.
+
+        Returns:
+            InstrumentMaster: The memory-mapped master.
+        """
+        path = self.path(exchangeSegmentList, tradingDate)
+        with self._lock(path):
+            self._write(exchangeSegmentList, response, path, tradingDate)
+        return read_master(path)[0]
+
+    def _write(self, exchangeSegmentList, response, path, tradingDate):
+        master = InstrumentMaster.from_response(response)
+        write_master(master, path, tradingDate=(tradingDate or date.today()).isoformat(),
+                     segments=sorted(segment_code(segment) for segment in exchangeSegmentList))
+
+    @contextmanager
+    def _lock(self, path):
+        """Hold an exclusive lock on the cache file of `path` across processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + '.lock', 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,538 @@
+"""
+Bulk historical OHLC downloads with a local columnar cache.
+
+`OhlcHistory` backfills bars for many instruments at once: every requested range is split into
+windows the server accepts, the windows of all instruments are fetched concurrently with retries,
+paced by the client's rate limiter when it is enabled (see `APIRequest`), overlapping bars are de-duplicated, and the result of each
+instrument is persisted by `OhlcCache` as NumPy columns together with the time ranges already
+fetched, so later requests only download what is missing. Coarser compressions can be derived
+locally from the cached finest bars with `resample_bars`, so several timeframes of an instrument
+cost one download.
+
+`get_ohlc` returns the bars in ``result.dataReponse`` as one string, bars separated by ``,`` and
+fields by ``|``: ``timestamp|open|high|low|close|volume|openInterest|``. Timestamps count seconds
+of exchange local time since 1970-01-01, so request times are naive exchange local datetimes
+and map to bar timestamps with `epoch_seconds`.
+"""
+import calendar
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from utradeconnect.exception import UtradeGeneralException, UtradeInputException
+from utradeconnect.instrumentMaster import segment_code
+
+# The OHLC columns, in the order of the response fields
+OHLC_COLUMNS = (
+    ('timestamp', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.int64),
+    ('openInterest', np.int64),
+)
+
+# Bars per get_ohlc request the downloader aims for, windows are sized from it
+OHLC_WINDOW_BARS = 20000
+
+# Start of the exchange session, seconds after midnight (09:15 IST), resampled bars align to it
+SESSION_START = 9 * 3600 + 15 * 60
+
+# Offset of exchange local time (IST) from UTC, in seconds
+EXCHANGE_UTC_OFFSET = 5 * 3600 + 30 * 60
+
+_DAY = 86400
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def epoch_seconds(value):
+    """
+    Seconds since 1970-01-01 of a naive exchange local time, the scale of OHLC bar timestamps.
+
+    Args:
+        value (datetime, str or int): A datetime, a 'YYYY-MM-DD HH:MM:SS' string or seconds.
+
+    Returns:
+        int: The seconds.
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.strptime(value, _TIME_FORMAT)
+    return calendar.timegm(value.timetuple())
+
+
+def exchange_now():
+    """The current exchange local time as `epoch_seconds`, whatever the host's time zone."""
+    return int(time.time()) + EXCHANGE_UTC_OFFSET
+
+
+def format_time(seconds):
+    """The 'YYYY-MM-DD HH:MM:SS' request form of `epoch_seconds`."""
+    return time.strftime(_TIME_FORMAT, time.gmtime(seconds))
+
+
+def empty_bars():
+    """
+    Bars with no rows.
+
+    Returns:
+        dict: One empty array per `OHLC_COLUMNS` entry.
+    """
+    return {name: np.empty(0, dtype=dtype) for name, dtype in OHLC_COLUMNS}
+
+
+def parse_ohlc(response):
+    """
+    Parse a `get_ohlc` response into contiguous columns.
+
+    The whole ``dataReponse`` string is turned into one field separated string and converted by
+    NumPy's C parser in a single call, so no Python object is created per bar or field. Responses
+    the vectorized path cannot read (empty or non numeric fields, ragged bars) are parsed bar by
+    bar instead.
+
+    Args:
+        response (dict): The `get_ohlc` response.
+
+    Returns:
+        dict: timestamp, open, high, low, close, volume and openInterest arrays, in response order.
+    """
+    data = (response.get('result') or {}).get('dataReponse') or ''
+    # Bars end with '|' before the ',' separating them, fold both into one field separator
+    text = data.replace('|,', ',').strip('|,').replace(',', '|')
+    if not text:
+        return empty_bars()
+    width = len(OHLC_COLUMNS)
+    fields = text.count('|') + 1
+    if fields % width == 0:
+        # Timestamps, volumes and open interest stay exact in float64 below 2 ** 53
+        try:
+            values = np.fromstring(text, dtype=np.float64, sep='|')
+        except ValueError:
+            # Newer NumPy raises on unreadable fields, older ones warn and stop short
+            values = None
+        if values is not None and values.size == fields:
+            values = values.reshape(-1, width)
+            return {name: np.ascontiguousarray(values[:, position], dtype=dtype)
+                    for position, (name, dtype) in enumerate(OHLC_COLUMNS)}
+    return _parse_ohlc_bars(data)
+
+
+def _parse_ohlc_bars(data):
+    """Bar by bar fallback of `parse_ohlc`, missing or empty fields read as 0."""
+    rows = [bar.split('|') for bar in data.split(',') if bar]
+    if not rows:
+        return empty_bars()
+    columns = {}
+    for position, (name, dtype) in enumerate(OHLC_COLUMNS):
+        cast = int if dtype is np.int64 else float
+        columns[name] = np.array([cast(float(row[position])) if len(row) > position and row[position] else 0
+                                  for row in rows], dtype=dtype)
+    return columns
+
+
+def merge_bars(parts):
+    """
+    Concatenate bar columns, sorted by timestamp with duplicate timestamps removed.
+
+    Of several bars with the same timestamp the one of the latest part wins, so re-fetched bars
+    replace cached ones.
+
+    Args:
+        parts (list): Bar column dicts.
+
+    Returns:
+        dict: The merged columns.
+    """
+    parts = [part for part in parts if len(part['timestamp'])]
+    if not parts:
+        return empty_bars()
+    merged = {name: np.concatenate([part[name] for part in parts]) for name, _ in OHLC_COLUMNS}
+    # Reverse so np.unique, which keeps the first occurrence, keeps the latest part's bar
+    timestamps = merged['timestamp'][::-1]
+    _, first = np.unique(timestamps, return_index=True)
+    keep = len(timestamps) - 1 - first
+    return {name: column[keep] for name, column in merged.items()}
+
+
+def select_bars(bars, start, end):
+    """The bars with ``start <= timestamp <= end``."""
+    timestamps = bars['timestamp']
+    lower = np.searchsorted(timestamps, start, side='left')
+    upper = np.searchsorted(timestamps, end, side='right')
+    return {name: column[lower:upper] for name, column in bars.items()}
+
+
+def align_time(seconds, interval, session_start=SESSION_START):
+    """
+    The start of the `interval` bar holding a time, counting bars from the session start of its day.
+
+    With the default session start 5 minute bars start at 09:15, 09:20, ... and hourly bars at
+    09:15, 10:15, ..., 15:15.
+
+    Args:
+        seconds (int or numpy.ndarray): `epoch_seconds` times.
+        interval (int): Bar length in seconds.
+        session_start (int, optional): Session start in seconds after midnight. Defaults to `SESSION_START`.
+
+    Returns:
+        int or numpy.ndarray: The bar start times.
+    """
+    opening = seconds - seconds % _DAY + session_start
+    return opening + (seconds - opening) // interval * interval
+
+
+def resample_bars(bars, compressionValue, session_start=SESSION_START):
+    """
+    Combine bars into coarser bars aligned to the session start, see `align_time`.
+
+    Consecutive bars falling into the same coarser bar are reduced with one NumPy call per column:
+    the first open, highest high, lowest low, last close, summed volume and last open interest.
+    Coarser bars without any input bar are left out, like the server does.
+
+    Args:
+        bars (dict): Bar columns sorted by timestamp, e.g. from `parse_ohlc`.
+        compressionValue (int): The coarser bar length in seconds, a multiple of the input's.
+        session_start (int, optional): Session start in seconds after midnight. Defaults to `SESSION_START`.
+
+    Returns:
+        dict: The resampled columns.
+    """
+    timestamps = bars['timestamp']
+    if not len(timestamps):
+        return empty_bars()
+    buckets = align_time(timestamps, int(compressionValue), session_start)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    lasts = np.r_[starts[1:], len(timestamps)] - 1
+    return {
+        'timestamp': buckets[starts],
+        'open': bars['open'][starts],
+        'high': np.maximum.reduceat(bars['high'], starts),
+        'low': np.minimum.reduceat(bars['low'], starts),
+        'close': bars['close'][lasts],
+        'volume': np.add.reduceat(bars['volume'], starts),
+        'openInterest': bars['openInterest'][lasts],
+    }
+
+
+def merge_ranges(ranges):
+    """Union of ``(start, end)`` ranges, sorted and with touching ranges joined."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(item) for item in merged]
+
+
+def missing_ranges(covered, start, end):
+    """
+    The parts of ``[start, end]`` not inside the `covered` ranges.
+
+    Args:
+        covered (list): Sorted, merged ``(start, end)`` ranges.
+        start (int): Range start.
+        end (int): Range end.
+
+    Returns:
+        list: ``(start, end)`` gaps.
+    """
+    gaps = []
+    cursor = start
+    for coveredStart, coveredEnd in covered:
+        if coveredEnd < cursor:
+            continue
+        if coveredStart > end:
+            break
+        if coveredStart > cursor:
+            gaps.append((cursor, min(coveredStart, end)))
+        cursor = max(cursor, coveredEnd)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def split_range(start, end, window):
+    """
+    Split ``[start, end]`` into consecutive windows of at most `window` seconds.
+
+    Windows share their boundary second, the bar there is de-duplicated by `merge_bars`.
+
+    Returns:
+        list: ``(start, end)`` windows.
+    """
+    windows = []
+    while True:
+        windowEnd = min(start + window, end)
+        windows.append((start, windowEnd))
+        if windowEnd >= end:
+            return windows
+        start = windowEnd
+
+
+class OhlcCache:
+    """
+    Per instrument and compression OHLC columns on disk.
+
+    Every file is a ``.npz`` archive of the `OHLC_COLUMNS` arrays sorted by timestamp plus a
+    ``coverage`` array of the ``(start, end)`` ranges already downloaded, so ranges without bars
+    (holidays, illiquid instruments) are not downloaded again. Files are written next to their
+    final name and renamed into place.
+
+    Args:
+        directory (str): The cache directory, created if missing.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, exchangeSegment, exchangeInstrumentID, compressionValue):
+        """The cache file of an instrument and compression."""
+        return os.path.join(self.directory, 'ohlc-{}-{}-{}.npz'.format(
+            segment_code(exchangeSegment), int(exchangeInstrumentID), int(compressionValue)))
+
+    def load(self, exchangeSegment, exchangeInstrumentID, compressionValue):
+        """
+        Read the cached bars of an instrument.
+
+        Returns:
+            tuple: ``(bars, coverage)``, empty bars and no coverage when nothing is cached.
+        """
+        path = self.path(exchangeSegment, exchangeInstrumentID, compressionValue)
+        try:
+            with np.load(path) as archive:
+                bars = {name: archive[name] for name, _ in OHLC_COLUMNS}
+                coverage = [tuple(item) for item in archive['coverage'].tolist()]
+        except (OSError, KeyError, ValueError):
+            return empty_bars(), []
+        return bars, coverage
+
+    def store(self, exchangeSegment, exchangeInstrumentID, compressionValue, bars, coverage):
+        """
+        Write the bars and coverage of an instrument, replacing the cached file.
+
+        Args:
+            bars (dict): The merged bar columns.
+            coverage (list): The merged ``(start, end)`` ranges the bars cover.
+        """
+        path = self.path(exchangeSegment, exchangeInstrumentID, compressionValue)
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(file, coverage=np.array(coverage, dtype=np.int64).reshape(-1, 2), **bars)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+
+class OhlcHistory:
+    """
+    Historical OHLC bars of many instruments, downloaded in parallel and cached locally.
+
+    Args:
+        connect (UtradeConnect): The logged in market data client.
+        cache_dir (str, optional): Directory of the `OhlcCache`. Defaults to None, no caching.
+        window_bars (int, optional): Bars per request, long ranges are split into windows of
+            ``window_bars * compressionValue`` seconds. Defaults to `OHLC_WINDOW_BARS`.
+        max_workers (int, optional): Requests in flight. Defaults to the connection pool size.
+            Requests are paced by the client's ``rate_limits`` ("market" group, low priority).
+        retries (int, optional): Attempts after a failed request, with exponential backoff.
+            Defaults to 3.
+        backoff (float, optional): Seconds before the first retry, doubled at each retry.
+            Defaults to 0.5.
+        session_start (int, optional): Session start in seconds after midnight that resampled
+            bars align to. Defaults to `SESSION_START`.
+    """
+
+    def __init__(self, connect, cache_dir=None, window_bars=OHLC_WINDOW_BARS, max_workers=None, retries=3, backoff=0.5, session_start=SESSION_START):
+        self.connect = connect
+        self.cache = OhlcCache(cache_dir) if cache_dir else None
+        self.window_bars = window_bars
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.session_start = session_start
+        self.requests = 0
+        self.retried = 0
+        self.errors = []
+        # Guards the counters updated from the download threads
+        self._lock = threading.Lock()
+
+    def _fetch(self, instrument, start, end, compressionValue):
+        """Download one window, retrying failures."""
+        attempt = 0
+        while True:
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.connect.get_ohlc(instrument['exchangeSegment'], instrument['exchangeInstrumentID'],
+                                                 format_time(start), format_time(end), compressionValue)
+                if response.get('type') == 'error':
+                    raise UtradeGeneralException(response.get('description') or str(response))
+                return parse_ohlc(response)
+            except UtradeGeneralException:
+                if attempt >= self.retries:
+                    raise
+            attempt += 1
+            with self._lock:
+                self.retried += 1
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def load(self, instruments, startTime, endTime, compressionValue, raise_errors=True, base_compression=None):
+        """
+        Bars of every instrument between two times.
+
+        Cached ranges are read from disk, only the missing ones are downloaded. Ranges reaching
+        into the current bar are not marked as cached, so the latest bars are fetched again next time.
+
+        With `base_compression` the bars are loaded (and cached) in that finer compression and
+        resampled locally, see `load_compressions`.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+            startTime (datetime or str): Range start, exchange local time, 'YYYY-MM-DD HH:MM:SS'.
+            endTime (datetime or str): Range end, inclusive.
+            compressionValue (int): Bar length in seconds, e.g. 60.
+            raise_errors (bool, optional): Raise if a window fails after its retries instead of
+                returning the bars that were downloaded. Defaults to True.
+            base_compression (int, optional): Compression to download and resample from.
+                Defaults to None, download `compressionValue` itself.
+
+        Returns:
+            dict: ``(exchangeSegment, exchangeInstrumentID)`` -> bar columns (see `parse_ohlc`)
+            sorted by timestamp. Failed windows are listed in `errors`.
+
+        Raises:
+            UtradeInputException: If the range is empty or `compressionValue` is not a multiple
+                of `base_compression`.
+            UtradeGeneralException: If a window fails and `raise_errors` is set.
+        """
+        if base_compression is not None and int(base_compression) != int(compressionValue):
+            return self.load_compressions(instruments, startTime, endTime, [compressionValue], raise_errors,
+                                          base_compression)[int(compressionValue)]
+        start = epoch_seconds(startTime)
+        end = epoch_seconds(endTime)
+        if end < start:
+            raise UtradeInputException("OHLC range ends before it starts")
+        compressionValue = int(compressionValue)
+        window = self.window_bars * compressionValue
+        # The bar still forming and everything after it cannot be cached yet
+        settled = exchange_now() - compressionValue
+
+        cached = {}
+        jobs = []
+        for instrument in instruments:
+            key = (segment_code(instrument['exchangeSegment']), int(instrument['exchangeInstrumentID']))
+            if key in cached:
+                continue
+            if self.cache is not None:
+                bars, coverage = self.cache.load(key[0], key[1], compressionValue)
+            else:
+                bars, coverage = empty_bars(), []
+            cached[key] = (bars, coverage)
+            for gapStart, gapEnd in missing_ranges(coverage, start, end):
+                for windowStart, windowEnd in split_range(gapStart, gapEnd, window):
+                    jobs.append((key, instrument, windowStart, windowEnd))
+
+        def fetch(job):
+            key, instrument, windowStart, windowEnd = job
+            try:
+                return job, self._fetch(instrument, windowStart, windowEnd, compressionValue), None
+            except UtradeGeneralException as e:
+                return job, None, e
+
+        workers = min(len(jobs), self.max_workers or self.connect.apiRequest.pool["pool_maxsize"]) if jobs else 0
+        if workers <= 1:
+            results = [fetch(job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(fetch, jobs))
+
+        fetched = {}
+        self.errors = []
+        for (key, _, windowStart, windowEnd), bars, error in results:
+            if error is not None:
+                self.errors.append({'instrument': key, 'start': format_time(windowStart),
+                                    'end': format_time(windowEnd), 'error': str(error)})
+                continue
+            fetched.setdefault(key, []).append((windowStart, windowEnd, bars))
+
+        history = {}
+        for key, (bars, coverage) in cached.items():
+            windows = fetched.get(key, [])
+            if windows:
+                bars = merge_bars([bars] + [windowBars for _, _, windowBars in windows])
+                coverage = merge_ranges(coverage + [(windowStart, min(windowEnd, settled))
+                                                    for windowStart, windowEnd, _ in windows if windowStart < settled])
+                if self.cache is not None:
+                    self.cache.store(key[0], key[1], compressionValue, bars, coverage)
+            history[key] = select_bars(bars, start, end)
+
+        if self.errors and raise_errors:
+            raise UtradeGeneralException("Error while retrieving OHLC history: {} of {} requests failed, first error: {}".format(
+                len(self.errors), len(jobs), self.errors[0]['error']))
+        return history
+
+    def load_compressions(self, instruments, startTime, endTime, compressionValues, raise_errors=True,
+                          base_compression=None):
+        """
+        Bars of every instrument in several compressions from one download.
+
+        The bars are loaded in `base_compression` (cached like `load`), over the range widened
+        to whole bars of every compression, and each compression is derived with `resample_bars`
+        aligned to the session start. Multi-timeframe strategies so make one request per instrument
+        and window instead of one per compression.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+            startTime (datetime or str): Range start, exchange local time, 'YYYY-MM-DD HH:MM:SS'.
+            endTime (datetime or str): Range end, inclusive.
+            compressionValues (list): Bar lengths in seconds, e.g. ``[60, 300, 900, 3600]``.
+            raise_errors (bool, optional): See `load`. Defaults to True.
+            base_compression (int, optional): Compression to download. Defaults to the smallest
+                of `compressionValues`.
+
+        Returns:
+            dict: compressionValue -> the `load` result of that compression. The bars start with
+            the one holding `startTime`, so a coarse first bar may begin before it.
+
+        Raises:
+            UtradeInputException: If the range is empty or a compression is not a multiple of
+                `base_compression`.
+            UtradeGeneralException: If a window fails and `raise_errors` is set.
+        """
+        compressionValues = sorted({int(value) for value in compressionValues})
+        if not compressionValues:
+            return {}
+        base = int(base_compression) if base_compression is not None else compressionValues[0]
+        if base <= 0 or any(value % base for value in compressionValues):
+            raise UtradeInputException("OHLC compressions {} are not multiples of {}".format(compressionValues, base))
+        start = epoch_seconds(startTime)
+        end = epoch_seconds(endTime)
+        if end < start:
+            raise UtradeInputException("OHLC range ends before it starts")
+        # Widen the download to the first and last bar of every compression, so none is partial
+        ranges = {value: (align_time(start, value, self.session_start),
+                          align_time(end, value, self.session_start) + value - base)
+                  for value in compressionValues}
+        history = self.load(instruments, min(first for first, _ in ranges.values()),
+                            max(last for _, last in ranges.values()), base, raise_errors)
+        compressions = {}
+        for value, (first, _) in ranges.items():
+            compressions[value] = {key: select_bars(bars if value == base else resample_bars(bars, value, self.session_start),
+                                                    first, end)
+                                   for key, bars in history.items()}
+        return compressions
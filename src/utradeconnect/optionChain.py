@@ -0,0 +1,188 @@
+"""
+Option chains assembled from the local instrument master and kept live from market data ticks.
+
+A chain holds one row per strike and two sides, calls (column 0) and puts (column 1), in NumPy
+arrays of shape ``(strikes, 2)``, so ``chain.lastTradedPrice[:, CALL]`` is the call LTP of every
+strike and ``chain.openInterest[chain.strike_index(17500)]`` the call and put OI at 17500.
+"""
+import numpy as np
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.instrumentMaster import OPTION_TYPES, expiry_key, segment_code
+
+CALL = 0
+PUT = 1
+
+
+class OptionChain:
+    """
+    The calls and puts of one underlying and expiry.
+
+    The chain is selected and laid out with vectorised NumPy operations over the master
+    columns, without any request. `attach` wires it to a market data socket so 1501 Touchline,
+    1510 Open Interest and 1512 LTP events update its arrays in place on the receive thread.
+
+    Args:
+        master (InstrumentMaster): The instrument master.
+        underlying (str): The underlying name, e.g. 'NIFTY'.
+        expiry (date, int or str): The expiry, see `expiry_key`.
+        exchangeSegment (int or str, optional): The derivatives segment when the underlying
+            trades on several. Defaults to the segment of its first contract.
+
+    Attributes:
+        strikes (numpy.ndarray): Sorted strike prices, shape ``(strikes,)``.
+        exchangeInstrumentID (numpy.ndarray): Contract IDs, -1 where a strike has no contract on
+            that side, shape ``(strikes, 2)``.
+        lotSize, lastTradedPrice, lastTradedQuantity, totalTradedQuantity, bidPrice, askPrice,
+        openInterest, lastUpdateTime (numpy.ndarray): Per contract values, shape ``(strikes, 2)``.
+            Prices start as NaN and quantities as 0 until the first tick.
+
+    Raises:
+        UtradeInputException: If the master has no options of this underlying and expiry.
+    """
+
+    def __init__(self, master, underlying, expiry, exchangeSegment=None):
+        self.master = master
+        self.underlying = underlying
+        self.expiry = expiry_key(expiry)
+        columns = master.columns
+        rows = np.array(master.derivative_rows(underlying), dtype=np.int64)
+        expiries = np.asarray(columns['expiry'])[rows] if len(rows) else np.empty(0, np.int32)
+        optionTypes = np.asarray(columns['optionType'])[rows] if len(rows) else np.empty(0, np.uint8)
+        rows = rows[(expiries == self.expiry) & (optionTypes != 0)]
+        segments = np.asarray(columns['exchangeSegment'])[rows]
+        if len(rows):
+            segment = segment_code(exchangeSegment) if exchangeSegment is not None else int(segments[0])
+            rows = rows[segments == segment]
+        if not len(rows):
+            raise UtradeInputException("No {} options expiring {} in the instrument master".format(underlying, expiry))
+        self.exchangeSegment = segment
+
+        strikes = np.asarray(columns['strikePrice'])[rows]
+        sides = np.where(np.asarray(columns['optionType'])[rows] == OPTION_TYPES['PE'], PUT, CALL)
+        self.strikes, positions = np.unique(strikes, return_inverse=True)
+        shape = (len(self.strikes), 2)
+        self.exchangeInstrumentID = np.full(shape, -1, dtype=np.int64)
+        self.exchangeInstrumentID[positions, sides] = np.asarray(columns['exchangeInstrumentID'])[rows]
+        self.lotSize = np.zeros(shape, dtype=np.int64)
+        self.lotSize[positions, sides] = np.asarray(columns['lotSize'])[rows]
+        self.lastTradedPrice = np.full(shape, np.nan)
+        self.lastTradedQuantity = np.zeros(shape, dtype=np.int64)
+        self.totalTradedQuantity = np.zeros(shape, dtype=np.int64)
+        self.bidPrice = np.full(shape, np.nan)
+        self.askPrice = np.full(shape, np.nan)
+        self.openInterest = np.zeros(shape, dtype=np.int64)
+        self.lastUpdateTime = np.zeros(shape, dtype=np.int64)
+        self._positions = {
+            (segment, int(instrumentId)): (int(position), int(side))
+            for instrumentId, position, side in zip(self.exchangeInstrumentID[positions, sides], positions, sides)}
+        self._updaters = {1501: self._touchline, 1510: self._open_interest, 1512: self._ltp}
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def strike_index(self, strike):
+        """
+        The row of a strike.
+
+        Args:
+            strike (float): The strike price.
+
+        Returns:
+            int: The row, or None if the chain has no such strike.
+        """
+        index = int(np.searchsorted(self.strikes, strike))
+        if index < len(self.strikes) and self.strikes[index] == strike:
+            return index
+        return None
+
+    def atm_index(self, price):
+        """
+        The row of the strike closest to `price`.
+
+        Args:
+            price (float): The underlying price.
+
+        Returns:
+            int: The at-the-money row.
+        """
+        return int(np.abs(self.strikes - price).argmin())
+
+    def instruments(self):
+        """
+        The contracts of the chain in the form `send_subscription` and `get_quote` expect.
+
+        Returns:
+            list: ``{'exchangeSegment': ..., 'exchangeInstrumentID': ...}`` dicts.
+        """
+        return [{'exchangeSegment': segment, 'exchangeInstrumentID': instrumentId}
+                for segment, instrumentId in self._positions]
+
+    def update(self, record):
+        """
+        Apply a decoded 1501, 1510 or 1512 record to the chain.
+
+        Args:
+            record: A `Touchline`, `OpenInterest` or `LTP` record from `utradeconnect.ticks`.
+
+        Returns:
+            bool: False if the record is not for a contract of the chain.
+        """
+        position = self._positions.get((record.exchangeSegment, record.exchangeInstrumentID))
+        if position is None:
+            return False
+        updater = self._updaters.get(record.eventCode)
+        if updater is None:
+            return False
+        updater(position, record)
+        self.updates += 1
+        return True
+
+    def _touchline(self, position, record):
+        if record.lastTradedPrice is not None:
+            self.lastTradedPrice[position] = record.lastTradedPrice
+        if record.lastTradedQuantity is not None:
+            self.lastTradedQuantity[position] = record.lastTradedQuantity
+        if record.totalTradedQuantity is not None:
+            self.totalTradedQuantity[position] = record.totalTradedQuantity
+        if record.bidPrice is not None:
+            self.bidPrice[position] = record.bidPrice
+        if record.askPrice is not None:
+            self.askPrice[position] = record.askPrice
+        if record.lastUpdateTime is not None:
+            self.lastUpdateTime[position] = record.lastUpdateTime
+
+    def _open_interest(self, position, record):
+        if record.openInterest is not None:
+            self.openInterest[position] = record.openInterest
+
+    def _ltp(self, position, record):
+        if record.lastTradedPrice is not None:
+            self.lastTradedPrice[position] = record.lastTradedPrice
+        if record.lastTradedQuantity is not None:
+            self.lastTradedQuantity[position] = record.lastTradedQuantity
+        if record.lastUpdateTime is not None:
+            self.lastUpdateTime[position] = record.lastUpdateTime
+
+    def attach(self, socket):
+        """
+        Keep the chain live from a market data socket.
+
+        The contracts (see `instruments`) must be subscribed to 1501, 1510 and/or 1512.
+
+        Args:
+            socket (MDSocket_io): The market data socket.
+        """
+        for eventCode in self._updaters:
+            socket.add_listener(eventCode, self.update)
+
+    def detach(self, socket):
+        """
+        Stop updating the chain from a socket.
+
+        Args:
+            socket (MDSocket_io): The socket passed to `attach`.
+        """
+        for eventCode in self._updaters:
+            socket.remove_listener(eventCode, self.update)
@@ -3,12 +3,24 @@ import os
 
 import socketio
 
+from utradeconnect.ringBuffer import BufferedDispatcher
+
 
 class OrderSocket_io(socketio.Client):
 
+    events = (
+        ('joined', 'on_joined'),
+        ('error', 'on_error'),
+        ('order', 'on_order'),
+        ('trade', 'on_trade'),
+        ('position', 'on_position'),
+        ('tradeConversion', 'on_tradeconversion'),
+        ('logout', 'on_messagelogout'),
+    )
+
     def __init__(self, token, userID, base_url=None, broadcast_mode = "FULL", reconnection=True, reconnection_attempts=0, reconnection_delay=1,
                  reconnection_delay_max=50000, randomization_factor=0.5, logger=False, binary=False, json=None,
-                 **kwargs):
+                 buffer_size=0, overflow='block', consumers=1, **kwargs):
         """
         Initializes the OrderSocket object.
 
@@ -23,6 +35,13 @@ class OrderSocket_io(socketio.Client):
             logger (bool, optional): Whether to enable logging. Defaults to False.
             binary (bool, optional): Whether to use binary mode. Defaults to False.
             json (object, optional): The JSON object. Defaults to None.
+            buffer_size (int, optional): When set, the receive thread only pushes each event into a preallocated
+                ring buffer of this many slots and `consumers` threads run the callbacks. Defaults to 0, callbacks
+                run on the receive thread.
+            overflow (str, optional): What to do when the ring buffer is full, 'block' or 'drop_oldest'.
+                Defaults to 'block' so that no order update is lost.
+            consumers (int, optional): Number of consumer threads draining the ring buffer. Defaults to 1, which
+                keeps order updates in sequence.
             **kwargs: Additional keyword arguments.
 
         """
@@ -30,13 +49,10 @@ class OrderSocket_io(socketio.Client):
         self.eventlistener = self.sid
         self.sid.on('connect', self.on_connect)
         self.sid.on('message', self.on_message)
-        self.sid.on('joined', self.on_joined)
-        self.sid.on('error', self.on_error)
-        self.sid.on('order', self.on_order)
-        self.sid.on('trade', self.on_trade)
-        self.sid.on('position', self.on_position)
-        self.sid.on('tradeConversion', self.on_tradeconversion)
-        self.sid.on('logout', self.on_messagelogout)
+        self.dispatcher = BufferedDispatcher(buffer_size, overflow, consumers, 'utrade-order-consumer') if buffer_size else None
+        self._handlers = dict(self.events)
+        for event, _ in self.events:
+            self.sid.on(event, self._make_handler(event))
         self.sid.on('disconnect', self.on_disconnect)
 
         self.userID = userID
@@ -66,6 +82,8 @@ class OrderSocket_io(socketio.Client):
             verify (bool): Whether to verify the SSL certificate. Default is False.
         """
         url = self.connection_url
+        if self.dispatcher is not None:
+            self.dispatcher.start()
 
         """Connected to the socket."""
         self.sid.connect(url, headers, transports, namespaces, socketio_path)
@@ -73,6 +91,35 @@ class OrderSocket_io(socketio.Client):
         print('COnnect ************')
         """Disconnect from the socket."""
 
+    def _make_handler(self, event):
+        """Build the socket.io handler that routes every message of `event` through `dispatch_event`."""
+        def handler(data):
+            self.dispatch_event(event, data)
+        return handler
+
+    def dispatch_event(self, event, data):
+        """
+        Deliver an interactive event to its callback, directly or through the ring buffer.
+
+        Args:
+            event (str): The socket event name, e.g. 'order'.
+            data (str): The raw message.
+        """
+        callback = getattr(self, self._handlers[event])
+        if self.dispatcher is not None:
+            self.dispatcher.submit(callback, data)
+        else:
+            callback(data)
+
+    def get_buffer_stats(self):
+        """
+        Ring buffer counters when `buffer_size` is set.
+
+        Returns:
+            dict: Depth, high-water mark, pushed, popped and dropped counts, or None.
+        """
+        return self.dispatcher.stats() if self.dispatcher is not None else None
+
     def on_connect(self):
         """Connect from the socket"""
         """
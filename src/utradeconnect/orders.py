@@ -1,20 +1,18 @@
 import json
 
-from utradeconnect.base import UtradeCommon
+from utradeconnect.base import Request, UtradeCommon, api_call
 from utradeconnect.exception import UtradeGeneralException, UtradeOrderException, UtradeTokenException
 
 
-class UtradeOrderConnect(UtradeCommon):
-    def __init__(self, config, apiKey, secretKey):
-        """
-        Initialize the Orders class.
+class UtradeOrderAPI:
+    """
+    Interactive (order and portfolio) API methods, shared by `UtradeOrderConnect` and `AsyncUtradeOrderConnect`.
 
-        Args:
-            config (dict): The configuration dictionary.
-        """
-        # initialize the UtradeCommon class
-        super().__init__(config=config, apiKey=apiKey, secretKey=secretKey)
+    Every method is an `api_call`: it builds its parameters, yields its request and handles the
+    response, while the client class it is mixed into sends the request over its transport.
+    """
 
+    @api_call
     def interactive_login(self, accessToken=None):
         """
         Initiates an interactive login and retrieves a user token.
@@ -39,7 +37,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["accessToken"]= accessToken
 
             # Make a POST request to the "user.login" endpoint
-            response = self.apiRequest._post("user.login", params)
+            response = yield Request("user.login", "POST", params)
 
             # Check if a "token" is present in the API response
             if "token" in response["result"]:
@@ -55,6 +53,7 @@ class UtradeOrderConnect(UtradeCommon):
             raise UtradeTokenException("Interactive login failed", 400)
         
 
+    @api_call
     def get_order_book(self, clientID=None):
         """
         Retrieves the order book, which provides the status of orders placed by a user.
@@ -77,7 +76,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "order.status" endpoint
-            response = self.apiRequest._get("order.status", params)
+            response = yield Request("order.status", "GET", params)
 
             # Return the API response
             return response
@@ -85,6 +84,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get order book failed", 500)
 
+    @api_call
     def place_order(
         self,
         exchangeSegment,
@@ -144,7 +144,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a POST request to the "order.place" endpoint with the order parameters
-            response = self.apiRequest._post("order.place", json.dumps(params))
+            response = yield Request("order.place", "POST", json.dumps(params))
 
             # Return the API response
             return response
@@ -152,6 +152,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Place order failed", 500)
 
+    @api_call
     def modify_order(
         self,
         appOrderID,
@@ -208,7 +209,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a PUT request to the "order.modify" endpoint with the order modification parameters
-            response = self.apiRequest._put("order.modify", json.dumps(params))
+            response = yield Request("order.modify", "PUT", json.dumps(params))
 
             # Return the API response
             return response
@@ -216,6 +217,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Modify order failed", 500)
 
+    @api_call
     def get_order_history(self, appOrderID, clientID=None):
         """
         Retrieve the order history for a specific order, showing its state changes over time.
@@ -239,7 +241,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "order.history" endpoint with the specified parameters
-            response = self.apiRequest._get("order.history", params)
+            response = yield Request("order.history", "GET", params)
 
             # Return the API response
             return response
@@ -248,6 +250,7 @@ class UtradeOrderConnect(UtradeCommon):
             raise UtradeOrderException("Get order history failed", 500)
         
 
+    @api_call
     def cancel_order(self, appOrderID, orderUniqueIdentifier, clientID=None):
         """
         Cancel an open order.
@@ -275,7 +278,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a DELETE request to the "order.cancel" endpoint with the specified parameters
-            response = self.apiRequest._delete("order.cancel", params)
+            response = yield Request("order.cancel", "DELETE", params)
 
             # Return the API response
             return response
@@ -283,6 +286,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Cancel order failed", 500)
 
+    @api_call
     def place_bracketorder(
         self,
         exchangeSegment,
@@ -339,7 +343,7 @@ class UtradeOrderConnect(UtradeCommon):
             }
 
             # Make a POST request to the "bracketorder.place" endpoint with the order parameters
-            response = self.apiRequest._post("bracketorder.place", json.dumps(params))
+            response = yield Request("bracketorder.place", "POST", json.dumps(params))
 
             # Return the API response
             return response
@@ -347,6 +351,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Place bracket order failed", 500)
 
+    @api_call
     def modify_bracketorder(
         self, appOrderID, orderQuantity, limitPrice, stopLossPrice, clientID=None
     ):
@@ -377,7 +382,7 @@ class UtradeOrderConnect(UtradeCommon):
             }
 
             # Make a PUT request to the "bracketorder.modify" endpoint with the order parameters
-            response = self.apiRequest._put("bracketorder.modify", json.dumps(params))
+            response = yield Request("bracketorder.modify", "PUT", json.dumps(params))
 
             # Return the API response
             return response
@@ -385,6 +390,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Modify bracket order failed", 500)
 
+    @api_call
     def bracketorder_cancel(self, appOrderID, clientID=None):
         """
         Cancel a bracket order by providing the correct appOrderID matching with the chosen open bracket order.
@@ -409,7 +415,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a DELETE request to the "bracketorder.cancel" endpoint with the specified parameters
-            response = self.apiRequest._delete("bracketorder.cancel", params)
+            response = yield Request("bracketorder.cancel", "DELETE", params)
 
             # Return the API response
             return response
@@ -417,6 +423,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Cancel bracket order failed", 500)
 
+    @api_call
     def get_profile(self, clientID=None):
         """
         Retrieves the user's profile information using their session token.
@@ -439,7 +446,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "user.profile" endpoint with the specified parameters
-            response = self.apiRequest._get("user.profile", params)
+            response = yield Request("user.profile", "GET", params)
 
             # Return the API response
             return response
@@ -447,6 +454,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get profile failed", 500)
 
+    @api_call
     def get_balance(self, clientID=None):
         """Get balance information related to limits on equities, derivatives, upfront margin, available exposure,
         and other RMS-related balances available to the user.
@@ -463,7 +471,7 @@ class UtradeOrderConnect(UtradeCommon):
                     params["clientID"] = clientID
 
                 # Make a GET request to the "user.balance" endpoint with the specified parameters
-                response = self.apiRequest._get("user.balance", params)
+                response = yield Request("user.balance", "GET", params)
 
                 # Return the API response
                 return response
@@ -475,6 +483,7 @@ class UtradeOrderConnect(UtradeCommon):
                 "Balance: Balance API available for retail API users only, dealers can watch the same on dealer terminal"
             )
 
+    @api_call
     def get_trade(self, clientID=None):
         """Retrieve the trade book, which contains a list of all trades executed on a particular day that were placed by the user.
 
@@ -498,7 +507,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "trades" endpoint with the specified parameters
-            response = self.apiRequest._get("trades", params)
+            response = yield Request("trades", "GET", params)
 
             # Return the API response
             return response
@@ -506,6 +515,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get trade failed", 500)
 
+    @api_call
     def get_holding(self, clientID=None):
         """Retrieve long-term holdings with the broker using the Holdings API.
 
@@ -520,7 +530,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "portfolio.holdings" endpoint with the specified parameters
-            response = self.apiRequest._get("portfolio.holdings", params)
+            response = yield Request("portfolio.holdings", "GET", params)
 
             # Return the API response
             return response
@@ -528,6 +538,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get holding failed", 500)
 
+    @api_call
     def get_position_daywise(self, clientID=None):
         """
         Retrieve positions by day, which is a snapshot of the buying and selling activity for a particular day.
@@ -549,7 +560,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "portfolio.positions" endpoint with the specified parameters
-            response = self.apiRequest._get("portfolio.positions", params)
+            response = yield Request("portfolio.positions", "GET", params)
 
             # Return the API response
             return response
@@ -557,6 +568,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get position daywise failed", 500)
 
+    @api_call
     def get_position_netwise(self, clientID=None):
         # The positions API positions by net. Net is the actual, current net position portfolio
         try:
@@ -568,7 +580,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "portfolio.positions" endpoint with the specified parameters
-            response = self.apiRequest._get("portfolio.positions", params)
+            response = yield Request("portfolio.positions", "GET", params)
 
             # Return the API response
             return response
@@ -576,6 +588,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get position netwise failed", 500)
 
+    @api_call
     def get_dealerposition_netwise(self, clientID=None):
         """Retrieve dealer positions by net, which represents the current net position portfolio.
 
@@ -590,7 +603,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "portfolio.dealerpositions" endpoint with the specified parameters
-            response = self.apiRequest._get("portfolio.dealerpositions", params)
+            response = yield Request("portfolio.dealerpositions", "GET", params)
 
             # Return the API response
             return response
@@ -598,6 +611,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get dealer position netwise failed", 500)
 
+    @api_call
     def get_dealerposition_daywise(self, clientID=None):
         """Retrieve dealer positions by day, which is a snapshot of the buying and selling activity for a particular day.
 
@@ -612,7 +626,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "portfolio.dealerpositions" endpoint with the specified parameters
-            response = self.apiRequest._get("portfolio.dealerpositions", params)
+            response = yield Request("portfolio.dealerpositions", "GET", params)
 
             # Return the API response
             return response
@@ -620,6 +634,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get dealer position daywise failed", 500)
 
+    @api_call
     def get_dealer_orderbook(self, clientID=None):
         """Request the order book, which provides the states of all the orders placed by a user, including dealer orders."""
         try:
@@ -631,7 +646,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "order.dealer.status" endpoint with the specified parameters
-            response = self.apiRequest._get("order.dealer.status", params)
+            response = yield Request("order.dealer.status", "GET", params)
 
             # Return the API response
             return response
@@ -639,6 +654,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get dealer order book failed", 500)
 
+    @api_call
     def get_dealer_tradebook(self, clientID=None):
         """Retrieve the dealer trade book, which contains a list of all trades executed on a particular day that were placed by the user.
 
@@ -653,7 +669,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a GET request to the "dealer.trades" endpoint with the specified parameters
-            response = self.apiRequest._get("dealer.trades", params)
+            response = yield Request("dealer.trades", "GET", params)
 
             # Return the API response
             return response
@@ -661,6 +677,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Get dealer trade book failed", 500)
 
+    @api_call
     def convert_position(
         self,
         exchangeSegment,
@@ -705,9 +722,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a PUT request to the "portfolio.positions.convert" endpoint with the conversion parameters
-            response = self.apiRequest._put(
-                "portfolio.positions.convert", json.dumps(params)
-            )
+            response = yield Request("portfolio.positions.convert", "PUT", json.dumps(params))
 
             # Return the API response
             return response
@@ -715,6 +730,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeGeneralException("Convert position failed", 500)
         
+    @api_call
     def place_cover_order(self, exchangeSegment, exchangeInstrumentID, orderSide, orderType, orderQuantity, disclosedQuantity,
                       limitPrice, stopPrice, orderUniqueIdentifier, clientID=None):
         """
@@ -754,7 +770,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params['clientID'] = clientID
 
             # Send the request to place the Cover Order
-            response = self.apiRequest._post('order.place.cover', json.dumps(params))
+            response = yield Request('order.place.cover', "POST", json.dumps(params))
             
             # Return the response
             return response
@@ -763,6 +779,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle any exceptions and return an appropriate response
             raise UtradeOrderException("Place cover order failed", 500)
         
+    @api_call
     def modify_cover_order(self, clientID, appOrderID, orderQuantity, limitPrice, stopPrice):
         """
         Modify a Cover Order by updating its parameters. A Cover Order is an advanced intraday order that includes
@@ -794,7 +811,7 @@ class UtradeOrderConnect(UtradeCommon):
             }
 
             # Send the request to modify the Cover Order
-            response = self.apiRequest._put('order.modify.cover', json.dumps(params))
+            response = yield Request('order.modify.cover', "PUT", json.dumps(params))
             
             # Return the response
             return response
@@ -803,6 +820,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle any exceptions and return an appropriate response
             raise UtradeOrderException("Modify cover order failed", 500)
         
+    @api_call
     def exit_cover_order(self, appOrderID, clientID=None):
         """
         Exit Cover Order API is a functionality to enable users to easily exit an open stop-loss order by converting it
@@ -828,7 +846,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params['clientID'] = clientID
 
             # Send a PUT request to the 'order.exit.cover' API endpoint with the parameters.
-            response = self.apiRequest._delete('order.exit.cover', json.dumps(params))
+            response = yield Request('order.exit.cover', "DELETE", json.dumps(params))
 
             return response
 
@@ -836,6 +854,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle any exceptions that may occur during the API call.
             raise UtradeOrderException("Exit cover order failed", 500)
 
+    @api_call
     def cancelall_order(self, exchangeSegment, exchangeInstrumentID):
         """Cancel all open orders of the user by providing the exchange segment and exchange instrument ID.
 
@@ -864,7 +883,7 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = self.userID
 
             # Make a POST request to the "order.cancelall" endpoint with the specified parameters
-            response = self.apiRequest._post("order.cancelall", json.dumps(params))
+            response = yield Request("order.cancelall", "POST", json.dumps(params))
 
             # Return the API response
             return response
@@ -872,6 +891,7 @@ class UtradeOrderConnect(UtradeCommon):
             # Handle exceptions gracefully and return an error description
             raise UtradeOrderException("Cancel all order failed", 500)
 
+    @api_call
     def interactive_logout(self, clientID=None):
         """
         Invalidate the session token and destroy the API session, requiring the user to go through the login flow again.
@@ -896,10 +916,23 @@ class UtradeOrderConnect(UtradeCommon):
                 params["clientID"] = clientID
 
             # Make a DELETE request to the "user.logout" endpoint with the specified parameters
-            response = self.apiRequest._delete("user.logout", params)
+            response = yield Request("user.logout", "DELETE", params)
 
             # Return the API response
             return response
         except (Exception, UtradeTokenException) as e:
             # Handle exceptions gracefully and return an error description
             raise UtradeTokenException("Interactive logout failed", 500)
+
+
+class UtradeOrderConnect(UtradeOrderAPI, UtradeCommon):
+    def __init__(self, config, apiKey, secretKey, apiRequest=None):
+        """
+        Initialize the Orders class.
+
+        Args:
+            config (dict): The configuration dictionary.
+            apiRequest (optional): A transport to share instead of creating one.
+        """
+        # initialize the UtradeCommon class
+        super().__init__(config=config, apiKey=apiKey, secretKey=secretKey, apiRequest=apiRequest)
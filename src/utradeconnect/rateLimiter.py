@@ -0,0 +1,319 @@
+"""
+Client-side token buckets that pace REST requests below the broker's per group limits.
+
+Client-side limiting is off unless enabled with ``rate_limits`` (see `APIRequest`). When it is
+on, `APIRequest` asks a `RequestScheduler` for a token before sending each request. Every route
+group of `apiConfig.route_groups` (orders, portfolio, market) has its own `TokenBucket`
+refilled at the group's requests per second up to its burst size. When a bucket is empty the
+calling thread waits in the bucket's queue instead of sending a request the broker would answer
+with HTTP 429, and queued requests are served by priority, then arrival: an order placement
+queued behind order book polling is sent first.
+
+A 429 that slips through (another process on the same account, server side limits lower than
+configured) empties the bucket and holds it for the server's ``Retry-After`` before the request
+is queued again, see `RequestScheduler.throttled`.
+
+`AsyncAPIRequest` paces its requests the same way with `AsyncRequestScheduler`, whose buckets
+queue coroutines on the event loop instead of threads.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from utradeconnect.exception import UtradeInputException
+
+
+class TokenBucket:
+    """
+    A token bucket with a priority queue of waiting requests.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int, optional): Bucket size, the requests that may be sent at once after an idle
+            period. Defaults to `rate` rounded up, at least 1.
+
+    Raises:
+        UtradeInputException: If `rate` or `burst` is not positive.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise UtradeInputException("Rate limit must be positive, got {}".format(rate))
+        burst = burst if burst is not None else max(1, math.ceil(rate))
+        if burst <= 0:
+            raise UtradeInputException("Rate limit burst must be positive, got {}".format(burst))
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        # No tokens are handed out before this time, set by a 429
+        self.blockedUntil = 0.0
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._order = itertools.count()
+        self.requests = 0
+        self.queued = 0
+        self.throttled = 0
+        self.waitTotal = 0.0
+        self.waitMax = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority):
+        """
+        Take a token, waiting for one behind every queued request of higher or equal priority.
+
+        Args:
+            priority (int): The request priority, lower values are served first.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        start = time.monotonic()
+        queued = False
+        with self._condition:
+            entry = (priority, next(self._order))
+            heapq.heappush(self._waiters, entry)
+            while True:
+                now = time.monotonic()
+                if self._waiters[0] is entry:
+                    self._refill(now)
+                    if self.tokens >= 1 and now >= self.blockedUntil:
+                        self.tokens -= 1
+                        heapq.heappop(self._waiters)
+                        # The next request in line may already find a token
+                        self._condition.notify_all()
+                        break
+                    timeout = max((1 - self.tokens) / self.rate, self.blockedUntil - now)
+                else:
+                    # Woken when the head of the queue leaves or a request of higher priority arrives
+                    timeout = None
+                queued = True
+                self._condition.wait(timeout)
+            waited = now - start if queued else 0.0
+            self.requests += 1
+            if queued:
+                self.queued += 1
+                self.waitTotal += waited
+                if waited > self.waitMax:
+                    self.waitMax = waited
+            return waited
+
+    def block(self, seconds):
+        """
+        Empty the bucket and hand out no token for `seconds`, after the server answered 429.
+
+        Args:
+            seconds (float): The pause, usually the response's Retry-After.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = 0.0
+            self.blockedUntil = max(self.blockedUntil, now + seconds)
+            self.throttled += 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Queueing metrics of the bucket.
+
+        Returns:
+            dict: rate, burst, requests, queued (requests that had to wait), waiting (requests
+            in the queue now), throttled (429 responses), wait_total, wait_max and wait_avg in
+            seconds over the queued requests.
+        """
+        with self._condition:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "requests": self.requests,
+                "queued": self.queued,
+                "waiting": len(self._waiters),
+                "throttled": self.throttled,
+                "wait_total": self.waitTotal,
+                "wait_max": self.waitMax,
+                "wait_avg": self.waitTotal / self.queued if self.queued else 0.0,
+            }
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    A `TokenBucket` whose waiting requests are coroutines of one event loop.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int, optional): Bucket size. Defaults to `rate` rounded up, at least 1.
+    """
+
+    def __init__(self, rate, burst=None):
+        super().__init__(rate, burst)
+        # Bound to the running loop, created on first use
+        self._wakeup = None
+
+    async def acquire(self, priority):
+        """
+        Take a token, waiting for one behind every queued request of higher or equal priority.
+
+        Args:
+            priority (int): The request priority, lower values are served first.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        if self._wakeup is None:
+            self._wakeup = asyncio.Condition()
+        start = time.monotonic()
+        queued = False
+        async with self._wakeup:
+            entry = (priority, next(self._order))
+            heapq.heappush(self._waiters, entry)
+            while True:
+                now = time.monotonic()
+                if self._waiters[0] is entry:
+                    self._refill(now)
+                    if self.tokens >= 1 and now >= self.blockedUntil:
+                        self.tokens -= 1
+                        heapq.heappop(self._waiters)
+                        # The next request in line may already find a token
+                        self._wakeup.notify_all()
+                        break
+                    timeout = max((1 - self.tokens) / self.rate, self.blockedUntil - now)
+                else:
+                    # Woken when the head of the queue leaves or a request of higher priority arrives
+                    timeout = None
+                queued = True
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            waited = now - start if queued else 0.0
+        with self._condition:
+            self.requests += 1
+            if queued:
+                self.queued += 1
+                self.waitTotal += waited
+                if waited > self.waitMax:
+                    self.waitMax = waited
+        return waited
+
+
+class RequestScheduler:
+    """
+    The token buckets of every rate limited route group.
+
+    Args:
+        limits (dict): Group name -> ``{"rate": requests per second, "burst": bucket size}``,
+            or a number for the rate alone. Groups without an entry are not limited.
+    """
+
+    bucket = TokenBucket
+
+    def __init__(self, limits):
+        self.buckets = {}
+        for group, limit in limits.items():
+            if limit is None:
+                continue
+            if not isinstance(limit, dict):
+                limit = {"rate": limit}
+            self.buckets[group] = self.bucket(limit["rate"], limit.get("burst"))
+
+    def acquire(self, group, priority):
+        """
+        Wait until a request of `group` may be sent.
+
+        Args:
+            group (str): The route group, see `apiConfig.get_route_group`.
+            priority (int): The request priority, lower values are served first.
+
+        Returns:
+            float: The seconds spent waiting, 0 for groups without a limit.
+        """
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            return 0.0
+        return bucket.acquire(priority)
+
+    def throttled(self, group, retry_after=None):
+        """
+        Hold a group back after the server answered 429.
+
+        Args:
+            group (str): The route group of the throttled request.
+            retry_after (float, optional): The server's Retry-After in seconds. Defaults to the
+                time the bucket takes to refill one token, or 1 second for unlimited groups.
+
+        Returns:
+            float: The pause applied in seconds.
+        """
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            pause = retry_after if retry_after is not None else 1.0
+            time.sleep(pause)
+            return pause
+        pause = retry_after if retry_after is not None else 1.0 / bucket.rate
+        bucket.block(pause)
+        return pause
+
+    def stats(self):
+        """
+        Queueing metrics per group, see `TokenBucket.stats`.
+
+        Returns:
+            dict: Group name -> bucket metrics.
+        """
+        return {group: bucket.stats() for group, bucket in self.buckets.items()}
+
+
+class AsyncRequestScheduler(RequestScheduler):
+    """
+    The `RequestScheduler` of `AsyncAPIRequest`, waiting on the event loop instead of blocking it.
+
+    Args:
+        limits (dict): Group name -> ``{"rate": requests per second, "burst": bucket size}``,
+            or a number for the rate alone. Groups without an entry are not limited.
+    """
+
+    bucket = AsyncTokenBucket
+
+    async def acquire(self, group, priority):
+        """
+        Wait until a request of `group` may be sent.
+
+        Args:
+            group (str): The route group, see `apiConfig.get_route_group`.
+            priority (int): The request priority, lower values are served first.
+
+        Returns:
+            float: The seconds spent waiting, 0 for groups without a limit.
+        """
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            return 0.0
+        return await bucket.acquire(priority)
+
+    async def throttled(self, group, retry_after=None):
+        """
+        Hold a group back after the server answered 429.
+
+        Args:
+            group (str): The route group of the throttled request.
+            retry_after (float, optional): The server's Retry-After in seconds. Defaults to the
+                time the bucket takes to refill one token, or 1 second for unlimited groups.
+
+        Returns:
+            float: The pause applied in seconds.
+        """
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            pause = retry_after if retry_after is not None else 1.0
+            await asyncio.sleep(pause)
+            return pause
+        pause = retry_after if retry_after is not None else 1.0 / bucket.rate
+        bucket.block(pause)
+        return pause
@@ -0,0 +1,136 @@
+import marshal
+import os
+import threading
+import time
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.tickJournal import PACKED, PARTIAL, TickJournalReader, journal_files
+from utradeconnect.ticks import record_from_fields
+
+
+class JournalReplay:
+    """
+    Feeds a recorded tick journal back through a market data socket's callbacks, without a network.
+
+    Every recorded message is handed to ``socket.dispatch_event`` exactly as it was received, so
+    the same `on_message<code>_json_<mode>` callbacks, decoding, conflation and ring buffer
+    settings apply as on the live socket and strategy code needs no changes. Entries of a packed
+    journal (see `TickJournalWriter`) have no raw message, their decoded records are dispatched
+    and reach the callbacks as records whatever the socket's `decode` setting. Events are
+    replayed in file order, which makes every run deterministic.
+
+    The socket only needs to be constructed, never connected::
+
+        socketInstance = MDSocket_io('', '', base_url='replay', decode=True)
+        JournalReplay(socketInstance, 'journal').run()
+
+    Args:
+        socket (MDSocket_io): The socket whose callbacks receive the events.
+        source (str or list): A journal file, a directory of daily journal files, or a list of
+            journal files replayed in the given order.
+        prefix (str, optional): File name prefix when `source` is a directory. Defaults to 'ticks'.
+
+    Raises:
+        UtradeInputException: If `source` holds no journal files.
+    """
+
+    def __init__(self, socket, source, prefix='ticks'):
+        self.socket = socket
+        if isinstance(source, (list, tuple)):
+            self.paths = list(source)
+        elif os.path.isdir(source):
+            self.paths = journal_files(source, prefix)
+        else:
+            self.paths = [source]
+        if not self.paths:
+            raise UtradeInputException("No tick journal files found in {}".format(source))
+        self._stopped = threading.Event()
+
+    def run(self, speed=None, start=None, end=None, events=None):
+        """
+        Replay the journal.
+
+        Args:
+            speed (float, optional): None or 0 to dispatch as fast as possible, 1.0 to keep the
+                recorded gaps between events, 2.0 to replay twice as fast and so on.
+            start (int, optional): Skip events received before this timestamp in nanoseconds.
+            end (int, optional): Stop at the first event received at or after this timestamp in nanoseconds.
+            events (iterable, optional): Only replay these event codes, e.g. ``(1501, 1502)``.
+
+        Returns:
+            dict: The number of events dispatched, the elapsed seconds and events per second.
+
+        Raises:
+            UtradeInputException: If `speed` is negative.
+        """
+        if speed is not None and speed < 0:
+            raise UtradeInputException("Replay speed must not be negative")
+        self._stopped.clear()
+        dispatcher = getattr(self.socket, 'dispatcher', None)
+        if dispatcher is not None:
+            dispatcher.start()
+        start_conflation = getattr(self.socket, 'start_conflation', None)
+        if start_conflation is not None:
+            start_conflation()
+        dispatch = self.socket.dispatch_event
+        codes = frozenset(events) if events is not None else None
+        names = {}
+        firstReceived = None
+        wallStart = time.perf_counter()
+        dispatched = 0
+        for path in self.paths:
+            with TickJournalReader(path) as reader:
+                buffer = reader.buffer
+                for eventCode, flags, receivedAt, offset, length in reader.iter_raw():
+                    if start is not None and receivedAt < start:
+                        continue
+                    if end is not None and receivedAt >= end:
+                        return self._result(dispatched, wallStart)
+                    if codes is not None and eventCode not in codes:
+                        continue
+                    if self._stopped.is_set():
+                        return self._result(dispatched, wallStart)
+                    if speed:
+                        if firstReceived is None:
+                            firstReceived = receivedAt
+                            wallStart = time.perf_counter()
+                        delay = wallStart + (receivedAt - firstReceived) / 1e9 / speed - time.perf_counter()
+                        if delay > 0 and self._stopped.wait(delay):
+                            return self._result(dispatched, wallStart)
+                    event = names.get((eventCode, flags))
+                    if event is None:
+                        event = names[(eventCode, flags)] = '{}-json-{}'.format(eventCode, 'partial' if flags & PARTIAL else 'full')
+                    if flags & PACKED:
+                        dispatch(event, None, record_from_fields(eventCode, marshal.loads(buffer[offset:offset + length])))
+                    else:
+                        dispatch(event, buffer[offset:offset + length].decode('utf8'))
+                    dispatched += 1
+        return self._result(dispatched, wallStart)
+
+    def start(self, speed=1.0, **kwargs):
+        """
+        Replay on a daemon thread, the offline counterpart of connecting the live socket.
+
+        Args:
+            speed (float, optional): See `run`. Defaults to 1.0, real time.
+            **kwargs: The other `run` arguments.
+
+        Returns:
+            threading.Thread: The replay thread.
+        """
+        thread = threading.Thread(target=self.run, args=(speed,), kwargs=kwargs, name='utrade-replay', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop a running replay after the event being dispatched."""
+        self._stopped.set()
+
+    @staticmethod
+    def _result(dispatched, wallStart):
+        seconds = time.perf_counter() - wallStart
+        return {
+            'events': dispatched,
+            'seconds': seconds,
+            'eventsPerSecond': dispatched / seconds if seconds else 0.0,
+        }
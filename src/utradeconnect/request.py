@@ -1,9 +1,14 @@
 import configparser
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 import requests
-from utradeconnect.exception import UtradeDataException, UtradeTokenException
-from utradeconnect.apiConfig import get_all_routes
+from requests.adapters import HTTPAdapter
+from utradeconnect.exception import UtradeDataException, UtradeNetworkException, UtradeTokenException
+from utradeconnect.apiConfig import get_all_routes, get_rate_limits, get_route_group
+from utradeconnect.rateLimiter import RequestScheduler
 
 
 class ConfigReader:
@@ -51,90 +56,310 @@ class ConfigReader:
         return self.config.get('root_url', 'broadcastMode')
 
 
+def parse_response(content, content_type, status_code, debug=False):
+    """
+    Decode a response of the API, shared by `APIRequest` and `AsyncAPIRequest`.
+
+    Args:
+        content (bytes): The response body.
+        content_type (str): The response's Content-Type.
+        status_code (int): The HTTP status.
+        debug (bool, optional): Print the decoded response. Defaults to False.
+
+    Returns:
+        dict: The response data.
+
+    Raises:
+        UtradeDataException: If the response cannot be parsed as JSON or has an unknown content type.
+        UtradeTokenException: If the response contains an error and the status code is 400.
+    """
+    # Validate the content type.
+    if "json" in content_type:
+        try:
+            data = json.loads(content.decode("utf8"))
+        except ValueError:
+            raise UtradeDataException("Couldn't parse the JSON response received from the server: {content}".format(
+                content=content))
+        if debug:
+            print(data)
+        # Handle API errors
+        if data.get("error"):
+            if status_code == 400:
+                raise UtradeTokenException(data)
+
+        return data
+    else:
+        raise UtradeDataException("Unknown Content-Type ({content_type}) with response: ({content})".format(
+            content_type=content_type,
+            content=content))
+
+
 class APIRequest:
     """
     Represents an API request.
 
+    Every request goes through a persistent `requests.Session` whose connection pool keeps
+    TCP/TLS connections alive between calls, so consecutive orders and quotes reuse an already
+    established connection instead of paying a fresh handshake each time.
+
     Args:
         base_url (str, optional): The base URL for the API. Defaults to None.
         token (str, optional): The authorization token. Defaults to None.
         disable_ssl (bool, optional): Whether to disable SSL verification. Defaults to False.
         debug (bool, optional): Whether to enable debug mode. Defaults to False.
         timeout (int, optional): The timeout for the request. Defaults to 100.
+        pool (int or dict, optional): Connection pool configuration. An int sets the number of
+            keep-alive connections kept per host. A dict may contain any of:
+                - pool_connections (int): Number of per-host pools to cache. Defaults to 10.
+                - pool_maxsize (int): Maximum number of connections kept per host. Defaults to 10.
+                - pool_block (bool): Whether to block when the per-host pool is exhausted instead
+                  of opening a throwaway connection. Defaults to False.
+                - max_retries (int): Number of connection level retries. Defaults to 0.
+                - prewarm (int): Number of connections to open right after login. Defaults to 0.
+        rate_limits (dict or bool, optional): Client-side token buckets per route group, see
+            `utradeconnect.rateLimiter`. True enables the `apiConfig.rate_limits` buckets, a dict
+            of group -> {"rate", "burst"} (or a rate) is merged over them. Defaults to None, no
+            client-side limiting; HTTP 429 responses are still retried after their Retry-After.
+        throttle_retries (int, optional): Times a request answered with HTTP 429 is queued and
+            sent again before failing. Defaults to 3.
     """
 
-    def __init__(self, base_url=None, token=None, disable_ssl=False, debug=False, timeout=100):
+    default_pool = {
+        "pool_connections": 10,
+        "pool_maxsize": 10,
+        "pool_block": False,
+        "max_retries": 0,
+        "prewarm": 0,
+    }
+
+    def __init__(self, base_url=None, token=None, disable_ssl=False, debug=False, timeout=100, pool=None,
+                 rate_limits=None, throttle_retries=3):
         # Initialize the APIRequest with the configuration from the file
         config_reader = ConfigReader()
         self.root = base_url if base_url is not None else config_reader.get_root_url()
         self.token = token
         self.disable_ssl = disable_ssl if disable_ssl is not None else config_reader.is_ssl_disabled()
         self.debug = debug
-        self.reqsession = requests
         self.timeout = timeout
+        self.pool = self._get_pool_config(pool)
+        self.reqsession = self._create_session()
         self._routes = get_all_routes()
+        self.scheduler = self._create_scheduler(rate_limits)
+        self.throttle_retries = throttle_retries
+        self._request_count = 0
+        self._stats_lock = threading.Lock()
         # disable requests SSL warning
         requests.packages.urllib3.disable_warnings()
 
-    def _get(self, route, params=None):
+    @classmethod
+    def _get_pool_config(cls, pool):
+        """
+        Normalize the `pool` argument into a full pool configuration.
+
+        Args:
+            pool (int or dict, optional): Pool size or pool configuration.
+
+        Returns:
+            dict: The pool configuration merged over `default_pool`.
+        """
+        config = dict(cls.default_pool)
+        if isinstance(pool, dict):
+            config.update(pool)
+        elif pool:
+            config["pool_maxsize"] = int(pool)
+        return config
+
+    @staticmethod
+    def _create_scheduler(rate_limits, scheduler=RequestScheduler):
+        """
+        Create the request scheduler from the `rate_limits` argument.
+
+        Args:
+            rate_limits (dict or bool, optional): True for the `apiConfig` limits, a dict merged over
+                them, or None/False for no limiting.
+            scheduler (type, optional): The scheduler class. Defaults to `RequestScheduler`.
+
+        Returns:
+            RequestScheduler: The scheduler, or None when limiting is disabled.
+        """
+        if not rate_limits:
+            return None
+        limits = dict(get_rate_limits())
+        if isinstance(rate_limits, dict):
+            limits.update(rate_limits)
+        return scheduler(limits)
+
+    def _create_session(self):
+        """
+        Create the keep-alive session used for every request.
+
+        Returns:
+            requests.Session: A session with pooled adapters mounted for http and https.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool["pool_connections"],
+            pool_maxsize=self.pool["pool_maxsize"],
+            max_retries=self.pool["max_retries"],
+            pool_block=self.pool["pool_block"],
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def warmup(self, connections=None):
+        """
+        Open keep-alive connections to the API host ahead of the first real request.
+
+        Lightweight HEAD requests are issued concurrently so that each one checks out its own
+        connection from the pool; the connections are then returned to the pool and reused by
+        subsequent calls. Failures are ignored since the goal is only to complete the handshakes.
+
+        Args:
+            connections (int, optional): Number of connections to open. Defaults to the
+                `prewarm` pool setting, or 1 if that is not set.
+
+        Returns:
+            dict: The pool statistics after warming up, see `get_pool_stats`.
+        """
+        connections = connections or self.pool["prewarm"] or 1
+        connections = min(connections, self.pool["pool_maxsize"])
+
+        def head(_):
+            try:
+                self.reqsession.head(self.root, verify=not self.disable_ssl, timeout=self.timeout)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(head, range(connections)))
+        return self.get_pool_stats()
+
+    def get_pool_stats(self):
+        """
+        Connection reuse metrics for the session.
+
+        Returns:
+            dict: The total number of API requests sent and, for every host, the number of
+            connections opened, requests sent over them, requests that reused an existing
+            connection and the connections currently idle in the pool. Counters the installed
+            urllib3 does not keep are None.
+        """
+        hosts = {}
+        adapters = {id(adapter): adapter for adapter in self.reqsession.adapters.values()}
+        for adapter in adapters.values():
+            # The pool bookkeeping is urllib3 internals, so a field that is missing in the
+            # installed version is reported as None rather than failing the whole call
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in list(pools.keys()):
+                conn_pool = pools.get(key)
+                if conn_pool is None:
+                    continue
+                opened = getattr(conn_pool, "num_connections", None)
+                requests = getattr(conn_pool, "num_requests", None)
+                queue = getattr(getattr(conn_pool, "pool", None), "queue", None)
+                # The pool queue is pre-filled with None placeholders, only count real connections
+                idle = sum(1 for conn in list(queue) if conn is not None) if queue is not None else None
+                name = "{}://{}:{}".format(getattr(conn_pool, "scheme", None), getattr(conn_pool, "host", None),
+                                           getattr(conn_pool, "port", None))
+                hosts[name] = {
+                    "connections_opened": opened,
+                    "requests": requests,
+                    "reused": max(requests - opened, 0) if opened is not None and requests is not None else None,
+                    "idle": idle,
+                }
+        return {"requests": self._request_count, "hosts": hosts}
+
+    def get_rate_limit_stats(self):
+        """
+        Queueing metrics of the client-side rate limiter.
+
+        Returns:
+            dict: Route group -> requests, queued, waiting, throttled, wait_total, wait_max and
+            wait_avg, see `utradeconnect.rateLimiter.TokenBucket.stats`. Empty when limiting is disabled.
+        """
+        if self.scheduler is None:
+            return {}
+        return self.scheduler.stats()
+
+    def close(self):
+        """
+        Close the session and every pooled connection.
+        """
+        self.reqsession.close()
+
+    def _get(self, route, params=None, priority=None):
         """
         Alias for sending a GET request.
 
         Args:
             route (str): The route to send the GET request to.
             params (dict, optional): The parameters to include in the GET request.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
 
         Returns:
             The response from the GET request.
         """
-        return self._request(route, "GET", params)
+        return self._request(route, "GET", params, priority)
 
-    def _post(self, route, params=None):
+    def _post(self, route, params=None, priority=None):
         """
         Alias for sending a POST request.
 
         Args:
             route (str): The route to send the request to.
             params (dict, optional): The parameters to include in the request. Defaults to None.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
 
         Returns:
             The response from the POST request.
         """
-        return self._request(route, "POST", params)
+        return self._request(route, "POST", params, priority)
 
-    def _put(self, route, params=None):
+    def _put(self, route, params=None, priority=None):
         """
         Alias for sending a PUT request.
 
         Args:
             route (str): The route for the PUT request.
             params (dict, optional): The parameters to be sent with the request. Defaults to None.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
 
         Returns:
             The response from the PUT request.
         """
-        return self._request(route, "PUT", params)
+        return self._request(route, "PUT", params, priority)
 
-    def _delete(self, route, params=None):
+    def _delete(self, route, params=None, priority=None):
         """
         Alias for sending a DELETE request.
 
         Args:
             route (str): The route for the DELETE request.
             params (dict, optional): The parameters to be included in the request.
+            priority (int, optional): The scheduler priority. Defaults to the route's, see `apiConfig.route_groups`.
 
         Returns:
             The response from the DELETE request.
         """
-        return self._request(route, "DELETE", params)
+        return self._request(route, "DELETE", params, priority)
 
-    def _request(self, route, method, parameters=None):
+    def _request(self, route, method, parameters=None, priority=None):
         """Make an HTTP request.
 
+        With client-side rate limiting enabled the request first takes a token from its route
+        group's bucket, queueing behind requests of higher priority while the group is at its
+        limit. A 429 response holds the group back (or, without limiting, the calling thread) for
+        the server's Retry-After and the request is sent again.
+
         Args:
             route (str): The route for the request.
             method (str): The HTTP method for the request.
             parameters (dict, optional): The parameters for the request. Defaults to None.
+            priority (int, optional): The scheduler priority, lower is served first. Defaults to
+                the route's, see `apiConfig.route_groups`.
 
         Returns:
             dict: The response data from the server.
@@ -142,6 +367,7 @@ class APIRequest:
         Raises:
             UtradeDataException: If the server response cannot be parsed as JSON or has an unknown content type.
             UtradeTokenException: If the server response contains an error and the status code is 400.
+            UtradeNetworkException: If the server still answers 429 after `throttle_retries` attempts.
         """
         params = parameters if parameters else {}
 
@@ -154,32 +380,54 @@ class APIRequest:
             # Set authorization header
             headers.update({'Content-Type': 'application/json', 'Authorization': self.token})
 
-        try:
-            r = self.reqsession.request(method,
-                                        url,
-                                        data=params if method in ["POST", "PUT"] else None,
-                                        params=params if method in ["GET", "DELETE"] else None,
-                                        headers=headers,
-                                        verify=not self.disable_ssl, timeout=self.timeout)
-
-        except Exception as e:
-            raise e
-
-        # Validate the content type.
-        if "json" in r.headers["content-type"]:
+        group, route_priority = get_route_group(route)
+        if priority is None:
+            priority = route_priority
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                self.scheduler.acquire(group, priority)
             try:
-                data = json.loads(r.content.decode("utf8"))
-            except ValueError:
-                raise UtradeDataException("Couldn't parse the JSON response received from the server: {content}".format(
-                    content=r.content))
-            print(data)
-            # Handle API errors
-            if data.get("error"):
-                if r.status_code == 400 :
-                    raise UtradeTokenException(data)
-
-            return data
-        else:
-            raise UtradeDataException("Unknown Content-Type ({content_type}) with response: ({content})".format(
-                content_type=r.headers["content-type"],
-                content=r.content))
+                r = self.reqsession.request(method,
+                                            url,
+                                            data=params if method in ["POST", "PUT"] else None,
+                                            params=params if method in ["GET", "DELETE"] else None,
+                                            headers=headers,
+                                            verify=not self.disable_ssl, timeout=self.timeout)
+
+            except Exception as e:
+                raise e
+
+            with self._stats_lock:
+                self._request_count += 1
+
+            if r.status_code != 429:
+                break
+            # Rate limited by the server, hold the group back and queue the request again
+            if attempt >= self.throttle_retries:
+                raise UtradeNetworkException("Rate limited by the server ({route}): {content}".format(
+                    route=route, content=r.content), code=429)
+            attempt += 1
+            retry_after = self._retry_after(r)
+            if self.scheduler is not None:
+                self.scheduler.throttled(group, retry_after)
+            else:
+                time.sleep(retry_after if retry_after is not None else 1.0)
+
+        return parse_response(r.content, r.headers["content-type"], r.status_code, self.debug)
+
+    @staticmethod
+    def _retry_after(response):
+        """
+        The Retry-After of a 429 response in seconds.
+
+        Args:
+            response (requests.Response): The response.
+
+        Returns:
+            float: The seconds to wait, or None if the header is missing or not a number of seconds.
+        """
+        try:
+            return max(float(response.headers.get("Retry-After")), 0.0)
+        except (TypeError, ValueError):
+            return None
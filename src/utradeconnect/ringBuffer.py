@@ -0,0 +1,254 @@
+import threading
+import time
+
+from utradeconnect.exception import UtradeInputException
+
+
+class RingBuffer:
+    """
+    A bounded, preallocated ring buffer between a socket receive thread and its consumers.
+
+    All slots are allocated up front and reused, so pushing an event never grows a container.
+    CPython cannot run the producer and consumers truly lock free, so every operation holds one
+    short critical section guarded by a condition variable that also lets consumers sleep while
+    the buffer is empty.
+
+    Overflow policies, applied when an item is pushed into a full buffer:
+        - ``drop_oldest``: overwrite the oldest unread item and count it in `dropped`.
+        - ``block``: wait until a consumer frees a slot.
+        - ``conflate``: an item whose key is already waiting replaces it in place (counted in
+          `conflated`) whether or not the buffer is full, or is combined with it by the `merge`
+          function given to `put`; a new key falls back to ``drop_oldest``.
+
+    Args:
+        capacity (int): Number of slots.
+        overflow (str, optional): The overflow policy. Defaults to 'drop_oldest'.
+
+    Raises:
+        UtradeInputException: If the capacity or overflow policy is invalid.
+    """
+
+    policies = ('drop_oldest', 'block', 'conflate')
+
+    def __init__(self, capacity, overflow='drop_oldest'):
+        if capacity <= 0:
+            raise UtradeInputException("Ring buffer capacity must be positive")
+        if overflow not in self.policies:
+            raise UtradeInputException("Unknown overflow policy {}, expected one of {}".format(overflow, self.policies))
+        self.capacity = capacity
+        self.overflow = overflow
+        self._items = [None] * capacity
+        self._keys = [None] * capacity
+        self._index = {}
+        self._head = 0
+        self._count = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._notEmpty = threading.Condition(self._lock)
+        self._notFull = threading.Condition(self._lock)
+        self.pushed = 0
+        self.popped = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.highWaterMark = 0
+
+    def __len__(self):
+        return self._count
+
+    def put(self, item, key=None, merge=None):
+        """
+        Push an item, applying the overflow policy when the buffer is full.
+
+        Args:
+            item: The item to push.
+            key (hashable, optional): The conflation key, e.g. (exchangeSegment, exchangeInstrumentID, eventCode).
+            merge (callable, optional): Called as ``merge(waiting, item)`` when an item with the
+                same key is waiting under the 'conflate' policy, the result replaces it. Defaults
+                to None, `item` replaces it.
+
+        Returns:
+            bool: False if the buffer is closed and the item was discarded.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            self.pushed += 1
+            if self.overflow == 'conflate' and key is not None:
+                slot = self._index.get(key)
+                if slot is not None:
+                    self._items[slot] = merge(self._items[slot], item) if merge is not None else item
+                    self.conflated += 1
+                    return True
+            if self._count == self.capacity:
+                if self.overflow == 'block':
+                    while self._count == self.capacity and not self._closed:
+                        self._notFull.wait()
+                    if self._closed:
+                        return False
+                else:
+                    self._discard_oldest()
+                    self.dropped += 1
+            slot = (self._head + self._count) % self.capacity
+            self._items[slot] = item
+            if key is not None and self.overflow == 'conflate':
+                self._keys[slot] = key
+                self._index[key] = slot
+            self._count += 1
+            if self._count > self.highWaterMark:
+                self.highWaterMark = self._count
+            self._notEmpty.notify()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Pop the oldest item, waiting for one if the buffer is empty.
+
+        Args:
+            timeout (float, optional): Seconds to wait, None to wait forever.
+
+        Returns:
+            The item, or None if the wait timed out or the buffer was closed while empty.
+        """
+        with self._lock:
+            if not self._count:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while not self._count and not self._closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    self._notEmpty.wait(remaining)
+                if not self._count:
+                    return None
+            item = self._discard_oldest()
+            self.popped += 1
+            self._notFull.notify()
+            return item
+
+    def _discard_oldest(self):
+        """Remove and return the oldest item, the lock must be held."""
+        head = self._head
+        item = self._items[head]
+        key = self._keys[head]
+        self._items[head] = None
+        if key is not None:
+            self._keys[head] = None
+            if self._index.get(key) == head:
+                del self._index[key]
+        self._head = (head + 1) % self.capacity
+        self._count -= 1
+        return item
+
+    def close(self):
+        """Wake every waiting producer and consumer, further pushes are discarded."""
+        with self._lock:
+            self._closed = True
+            self._notEmpty.notify_all()
+            self._notFull.notify_all()
+
+    def reopen(self):
+        """Accept items again after `close`, keeping the counters."""
+        with self._lock:
+            self._closed = False
+
+    @property
+    def closed(self):
+        """Whether the buffer was closed."""
+        return self._closed
+
+    def stats(self):
+        """
+        Buffer counters.
+
+        Returns:
+            dict: Items pushed, popped, dropped and conflated, current depth and high-water mark.
+        """
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'overflow': self.overflow,
+                'depth': self._count,
+                'highWaterMark': self.highWaterMark,
+                'pushed': self.pushed,
+                'popped': self.popped,
+                'dropped': self.dropped,
+                'conflated': self.conflated,
+            }
+
+
+class BufferedDispatcher:
+    """
+    Runs socket callbacks on consumer threads fed from a `RingBuffer`.
+
+    The socket receive thread only calls `submit`, which pushes the callback and its data into
+    the ring buffer; `consumers` daemon threads pop and invoke them, so slow strategy code never
+    stalls the websocket read. With more than one consumer, callbacks for different events may
+    run concurrently and out of order.
+
+    Args:
+        capacity (int): Ring buffer capacity.
+        overflow (str, optional): Ring buffer overflow policy. Defaults to 'drop_oldest'.
+        consumers (int, optional): Number of consumer threads. Defaults to 1.
+        name (str, optional): Consumer thread name prefix. Defaults to 'utrade-consumer'.
+    """
+
+    def __init__(self, capacity, overflow='drop_oldest', consumers=1, name='utrade-consumer'):
+        self.buffer = RingBuffer(capacity, overflow)
+        self.consumers = consumers
+        self.name = name
+        self.errors = 0
+        self._threads = []
+
+    def start(self):
+        """Start the consumer threads if they are not running yet, reopening the buffer after `stop`."""
+        if self._threads:
+            return
+        self.buffer.reopen()
+        for number in range(self.consumers):
+            thread = threading.Thread(target=self._consume, name='{}-{}'.format(self.name, number), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Close the buffer and wait for the consumer threads to finish, `start` runs them again."""
+        self.buffer.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, callback, data, key=None, merge=None):
+        """
+        Queue a callback invocation, called from the receive thread.
+
+        Args:
+            callback (callable): The callback to invoke on a consumer thread.
+            data: The callback argument.
+            key (hashable, optional): The conflation key for the 'conflate' overflow policy.
+            merge (callable, optional): Combines a waiting ``(callback, data)`` item with the new
+                one under the 'conflate' policy, see `RingBuffer.put`.
+        """
+        self.buffer.put((callback, data), key, merge)
+
+    def _consume(self):
+        """Consumer thread loop."""
+        buffer = self.buffer
+        while True:
+            item = buffer.get()
+            if item is None:
+                return
+            callback, data = item
+            try:
+                callback(data)
+            except Exception as e:
+                self.errors += 1
+                print('Error in socket callback', e)
+
+    def stats(self):
+        """
+        Dispatcher counters.
+
+        Returns:
+            dict: The ring buffer counters plus the number of callbacks that raised.
+        """
+        stats = self.buffer.stats()
+        stats['errors'] = self.errors
+        return stats
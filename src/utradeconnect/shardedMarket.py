@@ -0,0 +1,551 @@
+"""
+Market data sharded across several socket connections, each in its own worker process.
+
+One `MDSocket_io` decodes every tick on a single receive thread and the GIL keeps that work on
+one core. `ShardedMarketData` partitions the instruments across N worker processes; every
+worker logs in, opens its own market data socket, subscribes its share of the instruments,
+decodes the ticks and publishes them to the parent through a `SharedRing` in shared memory.
+The parent reads all rings and hands the records to the application through one callback or
+iterator, as if they came from a single socket.
+
+Records cross the process boundary as `marshal` encoded ``(eventCode, fields)`` tuples and are
+rebuilt into the same `utradeconnect.ticks` records a `decode=True` socket delivers.
+"""
+import contextlib
+import marshal
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from utradeconnect.exception import UtradeGeneralException, UtradeInputException
+from utradeconnect.tickTable import ORDERED_STORES, attach_shared_memory
+from utradeconnect.ticks import record_fields, record_from_fields
+
+# Event code of the gap reports published after a worker reconnected, see `MDSocket_io.on_gap`
+GAP = 0
+# Event code of the failure report a worker publishes before it exits
+ERROR = -1
+
+_LENGTH = struct.Struct('<I')
+_WRAP = 0xFFFFFFFF
+# Counters, each side's on its own cache line: head, pushed and dropped are written by the
+# producer, tail by the consumer and closed by either
+_HEAD, _PUSHED, _DROPPED, _TAIL, _CLOSED = 0, 1, 2, 8, 16
+_HEADER = 192
+
+
+class SharedRing:
+    """
+    A single producer, single consumer byte ring in shared memory.
+
+    Messages are written as a uint32 length followed by the payload. The producer only writes
+    `head` and the consumer only writes `tail`, both monotonically increasing byte counts, so the
+    two sides need no lock on x86: the producer publishes a message by advancing `head` after
+    copying it, and the consumer frees space by advancing `tail` after reading. A message that
+    does not fit before the end of the buffer is preceded by a wrap marker and written at the
+    start. Messages may take at most half the capacity (`max_message`), so a message always fits
+    once the consumer has caught up, wherever the head stands.
+
+    Publishing by counter relies on the CPU keeping stores in program order, which x86 (TSO)
+    guarantees and Python offers no fence for elsewhere. Pass a `multiprocessing.Lock` shared by
+    both sides on other CPUs, e.g. arm64; the producer then copies and publishes and the consumer
+    reads under it, and the lock's acquire and release order the memory accesses.
+    `ShardedMarketData` does this unless `utradeconnect.tickTable.ORDERED_STORES` is set.
+
+    Overflow policies, applied when the producer finds the ring full:
+        - ``drop``: discard the new message and count it in `dropped`.
+        - ``block``: wait until the consumer frees space or the ring is closed.
+
+    Args:
+        capacity (int): Data bytes, excluding the header.
+        name (str, optional): The shared memory block to attach to. Defaults to None, create one.
+        overflow (str, optional): The overflow policy. Defaults to 'drop'.
+        lock (multiprocessing.Lock, optional): Serialises both sides on CPUs without ordered
+            stores. Defaults to None, lock free.
+
+    Raises:
+        UtradeInputException: If the capacity or overflow policy is invalid.
+    """
+
+    policies = ('drop', 'block')
+
+    def __init__(self, capacity, name=None, overflow='drop', lock=None):
+        if capacity < 64:
+            raise UtradeInputException("Shared ring capacity must be at least 64 bytes")
+        if overflow not in self.policies:
+            raise UtradeInputException("Unknown overflow policy {}, expected one of {}".format(overflow, self.policies))
+        self.capacity = capacity
+        self.overflow = overflow
+        self.lock = lock
+        self._guard = lock if lock is not None else contextlib.nullcontext()
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=_HEADER + capacity)
+        else:
+            # The creating process unlinks the block, an attached worker must not at its exit
+            self.memory = attach_shared_memory(name)
+        self.name = self.memory.name
+        self._counters = self.memory.buf[:_HEADER].cast('Q')
+        self._data = self.memory.buf[_HEADER:_HEADER + capacity]
+        if self.owner:
+            for index in range(len(self._counters)):
+                self._counters[index] = 0
+
+    def __len__(self):
+        """Bytes waiting to be read."""
+        return self._counters[_HEAD] - self._counters[_TAIL]
+
+    @property
+    def max_message(self):
+        """The largest payload `put` accepts, in bytes."""
+        return self.capacity // 2 - _LENGTH.size
+
+    @property
+    def closed(self):
+        """Whether either side closed the ring."""
+        return bool(self._counters[_CLOSED])
+
+    def put(self, payload):
+        """
+        Publish a message.
+
+        Args:
+            payload (bytes): The message.
+
+        Returns:
+            bool: False if the message was dropped because the ring is full or closed, or the
+            message is larger than half the ring.
+        """
+        counters = self._counters
+        size = len(payload)
+        needed = _LENGTH.size + size
+        capacity = self.capacity
+        # A larger message could need more than the whole ring with the wrap skip in front of it
+        if needed > capacity // 2 or counters[_CLOSED]:
+            counters[_DROPPED] += 1
+            return False
+        head = counters[_HEAD]
+        position = head % capacity
+        toEnd = capacity - position
+        skip = toEnd if toEnd < needed else 0
+        while True:
+            with self._guard:
+                if head + skip + needed - counters[_TAIL] <= capacity:
+                    data = self._data
+                    if skip:
+                        if toEnd >= _LENGTH.size:
+                            _LENGTH.pack_into(data, position, _WRAP)
+                        position = 0
+                    _LENGTH.pack_into(data, position, size)
+                    data[position + _LENGTH.size:position + needed] = payload
+                    counters[_PUSHED] += 1
+                    counters[_HEAD] = head + skip + needed
+                    return True
+            if self.overflow == 'drop' or counters[_CLOSED]:
+                counters[_DROPPED] += 1
+                return False
+            time.sleep(0.0001)
+
+    def get_many(self, limit=1024):
+        """
+        Take the published messages, oldest first.
+
+        Args:
+            limit (int, optional): Maximum number of messages. Defaults to 1024.
+
+        Returns:
+            list: The messages as bytes, empty if none is waiting.
+        """
+        counters = self._counters
+        if counters[_TAIL] == counters[_HEAD]:
+            return []
+        with self._guard:
+            head = counters[_HEAD]
+            tail = counters[_TAIL]
+            data = self._data
+            capacity = self.capacity
+            messages = []
+            while tail < head and len(messages) < limit:
+                position = tail % capacity
+                toEnd = capacity - position
+                if toEnd < _LENGTH.size:
+                    tail += toEnd
+                    continue
+                size, = _LENGTH.unpack_from(data, position)
+                if size == _WRAP:
+                    tail += toEnd
+                    continue
+                start = position + _LENGTH.size
+                messages.append(bytes(data[start:start + size]))
+                tail += _LENGTH.size + size
+            counters[_TAIL] = tail
+        return messages
+
+    def stats(self):
+        """
+        Ring counters.
+
+        Returns:
+            dict: Pending bytes, capacity, pushed and dropped message counts.
+        """
+        counters = self._counters
+        return {'depth': counters[_HEAD] - counters[_TAIL], 'capacity': self.capacity,
+                'pushed': counters[_PUSHED], 'dropped': counters[_DROPPED]}
+
+    def __del__(self):
+        # The counter and data views must be released before SharedMemory can unmap the block
+        if getattr(self, '_counters', None) is not None:
+            self._counters.release()
+            self._data.release()
+            self._counters = self._data = None
+
+    def close(self):
+        """Stop accepting messages, wake a blocked producer and release this process's mapping."""
+        if self._counters is None:
+            return
+        self._counters[_CLOSED] = 1
+        self._counters.release()
+        self._data.release()
+        self._counters = self._data = None
+        self.memory.close()
+
+    def unlink(self):
+        """Free the shared memory block, called by the creating process once both sides closed."""
+        self.memory.unlink()
+
+
+def encode_record(record):
+    """
+    Encode a `utradeconnect.ticks` record for a `SharedRing`.
+
+    Args:
+        record: The decoded record, e.g. a `Touchline`.
+
+    Returns:
+        bytes: The marshal encoded ``(eventCode, fields)`` tuple.
+    """
+    return marshal.dumps((record.eventCode, record_fields(record)))
+
+
+def decode_record(payload):
+    """
+    Rebuild a record encoded with `encode_record`.
+
+    Args:
+        payload (bytes): The encoded message.
+
+    Returns:
+        tuple: ``(eventCode, record)``. Gap reports come back as ``(GAP, gap)``, see
+        `MDSocket_io.on_gap`, and worker failures as ``(ERROR, message)``.
+    """
+    eventCode, fields = marshal.loads(payload)
+    if eventCode <= GAP:
+        return eventCode, fields
+    return eventCode, record_from_fields(eventCode, fields)
+
+
+def encode_gap(gap, limit):
+    """
+    Encode a gap report for a `SharedRing`, without its snapshot if the report would not fit.
+
+    A reconnect after a long outage can snapshot more instruments than one ring message holds.
+    The report is then sent with an empty snapshot and the reason in its errors, so the
+    application still learns which instruments to refresh.
+
+    Args:
+        gap (dict): The report passed to `MDSocket_io.on_gap`.
+        limit (int): The largest message the ring accepts, see `SharedRing.max_message`.
+
+    Returns:
+        bytes: The marshal encoded ``(GAP, gap)`` tuple.
+    """
+    payload = marshal.dumps((GAP, gap))
+    if len(payload) <= limit:
+        return payload
+    trimmed = dict(gap, snapshot={}, errors=list(gap.get('errors', ())) + [
+        'Snapshot of {} bytes exceeds the shard ring message limit of {} bytes, '
+        'refresh the instruments with get_bulk_quote'.format(len(payload), limit)])
+    return marshal.dumps((GAP, trimmed))
+
+
+def partition(instruments, shards):
+    """
+    Split instruments across shards by instrument ID, so an instrument always lands on the same shard.
+
+    Args:
+        instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+        shards (int): The number of shards.
+
+    Returns:
+        list: One instrument list per shard.
+    """
+    parts = [[] for _ in range(shards)]
+    for instrument in instruments:
+        parts[int(instrument['exchangeInstrumentID']) % shards].append(instrument)
+    return parts
+
+
+def _run_shard(ringName, capacity, overflow, lock, clientFactory, subscriptions, socketOptions, stop):
+    """Worker process: one logged in market data socket publishing its decoded ticks to a ring."""
+    ring = SharedRing(capacity, name=ringName, overflow=overflow, lock=lock)
+    failed = threading.Event()
+
+    def fail(e):
+        # The parent raises the report from `ShardedMarketData.poll`
+        ring.put(marshal.dumps((ERROR, '{}: {}'.format(type(e).__name__, e)[:capacity // 16])))
+        failed.set()
+
+    try:
+        socket = _open_shard(ring, clientFactory, subscriptions, socketOptions, fail)
+    except Exception as e:
+        fail(e)
+    else:
+        while not stop.wait(0.1) and not failed.is_set():
+            pass
+        if socket.sid.connected:
+            socket.sid.disconnect()
+    ring.close()
+
+
+def _open_shard(ring, clientFactory, subscriptions, socketOptions, fail):
+    """Log in, connect the shard's socket on a thread and subscribe its instruments once connected."""
+    # Imported here so the parent does not need socketio loaded to read the rings
+    from utradeconnect.marketSocket import MDSocket_io
+
+    client = clientFactory()
+    client.marketdata_login()
+    socket = MDSocket_io(client.token, client.userID, client=client, decode=True, **socketOptions)
+    put = ring.put
+
+    def publish(record):
+        put(encode_record(record))
+
+    for _, handler in socket.events:
+        setattr(socket, handler, publish)
+    socket.on_gap = lambda gap: put(encode_gap(gap, ring.max_message))
+    subscribed = []
+
+    def on_connect():
+        # Reconnects are resubscribed by the socket itself
+        if not subscribed:
+            subscribed.append(True)
+            try:
+                with socket.subscriptions.batch():
+                    for eventCode, instruments in subscriptions.items():
+                        socket.subscribe(instruments, eventCode)
+            except Exception as e:
+                fail(e)
+
+    def connect():
+        try:
+            socket.connect()
+        except Exception as e:
+            fail(e)
+
+    socket.sid.on('connect', on_connect)
+    threading.Thread(target=connect, name='utrade-md-shard', daemon=True).start()
+    return socket
+
+
+class ShardedMarketData:
+    """
+    Market data for many instruments decoded in parallel by several worker processes.
+
+    The instruments of every event code are partitioned across `shards` worker processes by
+    instrument ID (see `partition`). Each worker creates its client with `client_factory`, logs
+    in to market data, connects its own `MDSocket_io` with ``decode=True`` and subscribes its
+    instruments, so each connection carries only its share of the feed. Workers inherit the
+    reconnect recovery of `MDSocket_io` and forward its gap reports to `on_gap`.
+
+    The application reads the merged stream in one of three ways:
+        - ``for record in sharded:`` blocks for records until `stop` is called,
+        - `poll` returns whatever is waiting without blocking,
+        - ``start(callback)`` runs a consumer thread calling ``callback(record)``.
+
+    Ordering is kept per instrument (one instrument is always on the same shard) but not across
+    shards.
+
+    A worker that fails to log in, connect or subscribe reports the error before it exits, and a
+    worker that dies without a report is noticed once its ring is empty; both raise
+    `UtradeGeneralException` from iteration and `poll`, or are passed to `on_error` by the
+    consumer thread of ``start(callback)``.
+
+    Args:
+        client_factory (callable): Builds a `UtradeConnect` in the worker process, e.g.
+            ``functools.partial(UtradeConnect, config, apiKey, secretKey)``. It must be picklable.
+        subscriptions (dict): eventCode -> list of instrument dicts.
+        shards (int, optional): Worker processes. Defaults to 2.
+        ring_size (int, optional): Bytes of shared memory per shard. Defaults to 16 MiB.
+        overflow (str, optional): What a worker does when its ring is full, 'drop' or 'block'.
+            Defaults to 'drop'.
+        base_url (str, optional): The market data socket root URL. Defaults to config.ini.
+        broadcast_mode (str, optional): 'FULL' or 'PARTIAL'. Defaults to 'FULL'.
+        start_method (str, optional): The multiprocessing start method. Defaults to 'spawn',
+            which does not copy the parent's threads and sockets into the workers.
+
+    Raises:
+        UtradeInputException: If `shards` is not positive.
+    """
+
+    def __init__(self, client_factory, subscriptions, shards=2, ring_size=1 << 24, overflow='drop',
+                 base_url=None, broadcast_mode='FULL', start_method='spawn'):
+        if shards <= 0:
+            raise UtradeInputException("The number of shards must be positive")
+        self.client_factory = client_factory
+        self.shards = shards
+        self.ring_size = ring_size
+        self.overflow = overflow
+        self.socketOptions = {'base_url': base_url, 'broadcast_mode': broadcast_mode}
+        self.shardSubscriptions = [{} for _ in range(shards)]
+        for eventCode, instruments in subscriptions.items():
+            for shard, part in enumerate(partition(instruments, shards)):
+                if part:
+                    self.shardSubscriptions[shard][eventCode] = part
+        self._context = multiprocessing.get_context(start_method)
+        self._stop = self._context.Event()
+        self._stopped = threading.Event()
+        self.rings = []
+        self.processes = []
+        self._consumer = None
+        self._next = 0
+        self.error = None
+
+    def start(self, callback=None):
+        """
+        Start the worker processes.
+
+        Args:
+            callback (callable, optional): When given, a consumer thread calls it with every
+                record. Defaults to None, read with iteration or `poll`.
+
+        Returns:
+            ShardedMarketData: self.
+        """
+        for shard, subscriptions in enumerate(self.shardSubscriptions):
+            lock = None if ORDERED_STORES else self._context.Lock()
+            ring = SharedRing(self.ring_size, overflow=self.overflow, lock=lock)
+            process = self._context.Process(
+                target=_run_shard, name='utrade-md-shard-{}'.format(shard), daemon=True,
+                args=(ring.name, self.ring_size, self.overflow, lock, self.client_factory, subscriptions,
+                      self.socketOptions, self._stop))
+            self.rings.append(ring)
+            self.processes.append(process)
+            process.start()
+        if callback is not None:
+            self._consumer = threading.Thread(target=self._consume, args=(callback,),
+                                              name='utrade-md-shard-consumer', daemon=True)
+            self._consumer.start()
+        return self
+
+    def _consume(self, callback):
+        try:
+            for record in self:
+                callback(record)
+        except UtradeGeneralException as e:
+            self.error = e
+            self.on_error(e)
+
+    def poll(self, limit=1024):
+        """
+        Take the records waiting in the rings without blocking.
+
+        The rings are read round robin, starting one shard further at every call, so a busy
+        shard cannot starve the others. Gap reports are passed to `on_gap` instead of returned.
+
+        Args:
+            limit (int, optional): Maximum messages taken from each shard. Defaults to 1024.
+
+        Returns:
+            list: The records, in order per shard.
+
+        Raises:
+            UtradeGeneralException: If a worker reported a failure.
+        """
+        records = []
+        rings = self.rings
+        count = len(rings)
+        self._next = (self._next + 1) % count if count else 0
+        for offset in range(count):
+            shard = (self._next + offset) % count
+            for payload in rings[shard].get_many(limit):
+                eventCode, record = decode_record(payload)
+                if eventCode == GAP:
+                    self.on_gap(shard, record)
+                elif eventCode == ERROR:
+                    raise UtradeGeneralException("Market data shard {} failed: {}".format(shard, record))
+                else:
+                    records.append(record)
+        return records
+
+    def __iter__(self):
+        idle = 0
+        while not self._stopped.is_set():
+            # Checked before polling, so the last messages of a worker that died are read first
+            dead = [shard for shard, process in enumerate(self.processes) if not process.is_alive()]
+            records = self.poll()
+            if not records:
+                if dead and not self._stopped.is_set():
+                    raise UtradeGeneralException("Market data shard {} exited with code {}".format(
+                        dead[0], self.processes[dead[0]].exitcode))
+                # Back off from spinning to 1ms sleeps while the market is quiet
+                idle = min(idle + 1, 10)
+                time.sleep(0.0001 * idle)
+                continue
+            idle = 0
+            yield from records
+
+    def on_gap(self, shard, gap):
+        """
+        Called when a worker's socket reconnected and restored its subscriptions.
+
+        This method can be overridden to reconcile state with the snapshot of the missed period.
+
+        Args:
+            shard (int): The shard that reconnected.
+            gap (dict): The gap report, see `MDSocket_io.on_gap`.
+        """
+        print('Market data shard {} gap of {:.1f}s'.format(shard, gap['duration']))
+
+    def on_error(self, error):
+        """
+        Called by the consumer thread of ``start(callback)`` when a worker failed, before the thread exits.
+
+        This method can be overridden to restart the feed or alert.
+
+        Args:
+            error (UtradeGeneralException): The failure, also kept in `error`.
+        """
+        print('Market data stopped: {}'.format(error))
+
+    def stats(self):
+        """
+        Per shard ring counters and worker state.
+
+        Returns:
+            list: One dict per shard with depth, capacity, pushed, dropped and alive.
+        """
+        return [dict(ring.stats(), alive=process.is_alive()) for ring, process in zip(self.rings, self.processes)]
+
+    def stop(self, timeout=5):
+        """
+        Stop the workers and the consumer thread and free the shared memory.
+
+        Args:
+            timeout (float, optional): Seconds to wait for each worker before terminating it.
+        """
+        self._stop.set()
+        self._stopped.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self._consumer is not None and self._consumer is not threading.current_thread():
+            self._consumer.join(timeout)
+        for ring in self.rings:
+            ring.close()
+            ring.unlink()
+        self.rings = []
+        self.processes = []
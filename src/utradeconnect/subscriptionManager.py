@@ -0,0 +1,225 @@
+import threading
+from contextlib import contextmanager
+
+from utradeconnect.instrumentMaster import segment_code
+
+# Instruments per subscription or unsubscription call
+SUBSCRIPTION_CHUNK_SIZE = 50
+
+
+class SubscriptionManager:
+    """
+    Shares market data subscriptions between the strategies of one process.
+
+    Every (exchangeSegment, exchangeInstrumentID, eventCode) is reference counted: the first
+    `subscribe` of a pair subscribes it on the server and only the last matching `unsubscribe`
+    unsubscribes it, so strategies with overlapping instruments never cancel each other's feeds.
+    Changes are queued and sent by `flush` as the minimal set of calls: pairs subscribed and
+    unsubscribed again before a flush cancel out, calls are grouped by event code and split
+    into chunks of at most `max_instruments`, and unsubscriptions go first to free server
+    capacity. By default every `subscribe`/`unsubscribe` flushes immediately; inside
+    ``with manager.batch():`` the changes are flushed once when the block exits.
+
+    Args:
+        connect (UtradeConnect): The client whose `send_subscription` and `send_unsubscription`
+            are called.
+        max_instruments (int, optional): Server cap on instruments per call. Defaults to
+            `SUBSCRIPTION_CHUNK_SIZE`.
+        auto_flush (bool, optional): Flush after every change outside a batch. Defaults to True.
+    """
+
+    def __init__(self, connect, max_instruments=SUBSCRIPTION_CHUNK_SIZE, auto_flush=True):
+        self.connect = connect
+        self.max_instruments = max_instruments
+        self.auto_flush = auto_flush
+        self._lock = threading.RLock()
+        self._flushLock = threading.Lock()
+        self._counts = {}
+        self._active = set()
+        self._pendingSubscribe = set()
+        self._pendingUnsubscribe = set()
+        self._batchDepth = 0
+        self.calls = 0
+
+    @staticmethod
+    def _keys(instruments, eventCode):
+        return [(segment_code(instrument['exchangeSegment']), int(instrument['exchangeInstrumentID']), int(eventCode))
+                for instrument in instruments]
+
+    def subscribe(self, instruments, eventCode):
+        """
+        Add a reference to every instrument for `eventCode`.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): The event code, e.g. 1501.
+
+        Returns:
+            list: The responses of the calls sent if the change was flushed, see `flush`.
+        """
+        with self._lock:
+            for key in self._keys(instruments, eventCode):
+                count = self._counts.get(key, 0)
+                self._counts[key] = count + 1
+                if not count:
+                    self._pendingUnsubscribe.discard(key)
+                    if key not in self._active:
+                        self._pendingSubscribe.add(key)
+        return self._maybe_flush()
+
+    def unsubscribe(self, instruments, eventCode):
+        """
+        Drop a reference to every instrument for `eventCode`.
+
+        Instruments without a reference are ignored, so one strategy cannot cancel another's feed.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): The event code, e.g. 1501.
+
+        Returns:
+            list: The responses of the calls sent if the change was flushed, see `flush`.
+        """
+        with self._lock:
+            for key in self._keys(instruments, eventCode):
+                count = self._counts.get(key, 0)
+                if not count:
+                    continue
+                if count > 1:
+                    self._counts[key] = count - 1
+                    continue
+                del self._counts[key]
+                self._pendingSubscribe.discard(key)
+                if key in self._active:
+                    self._pendingUnsubscribe.add(key)
+        return self._maybe_flush()
+
+    def _maybe_flush(self):
+        if self.auto_flush and not self._batchDepth:
+            return self.flush()
+        return []
+
+    @contextmanager
+    def batch(self):
+        """Defer flushing until the outermost ``with manager.batch():`` block exits."""
+        with self._lock:
+            self._batchDepth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batchDepth -= 1
+            self._maybe_flush()
+
+    def flush(self):
+        """
+        Send the pending changes.
+
+        Changes that fail stay pending and are retried by the next flush.
+
+        Returns:
+            list: ``(action, eventCode, instruments, response)`` per call sent, where action is
+            'subscribe' or 'unsubscribe'.
+
+        Raises:
+            UtradeGeneralException: If a call fails; the calls sent before it are kept.
+        """
+        with self._flushLock:
+            with self._lock:
+                unsubscribe = sorted(self._pendingUnsubscribe)
+                subscribe = sorted(self._pendingSubscribe)
+            sent = []
+            for action, keys, send in (('unsubscribe', unsubscribe, self.connect.send_unsubscription),
+                                       ('subscribe', subscribe, self.connect.send_subscription)):
+                for eventCode, chunk in self._chunks(keys):
+                    instruments = [{'exchangeSegment': segment, 'exchangeInstrumentID': instrumentId}
+                                   for segment, instrumentId, _ in chunk]
+                    response = send(instruments, eventCode)
+                    self.calls += 1
+                    with self._lock:
+                        for key in chunk:
+                            if action == 'subscribe':
+                                self._active.add(key)
+                                self._pendingSubscribe.discard(key)
+                            else:
+                                self._active.discard(key)
+                                self._pendingUnsubscribe.discard(key)
+                        self._settle(chunk)
+                    sent.append((action, eventCode, instruments, response))
+            return sent
+
+    def resubscribe(self):
+        """
+        Subscribe every referenced instrument again, e.g. after the socket reconnected.
+
+        The server forgets the subscriptions of a dropped session, so all active pairs are marked
+        pending and flushed in batched calls together with any changes still waiting.
+
+        Returns:
+            list: The calls sent, see `flush`.
+
+        Raises:
+            UtradeGeneralException: If a call fails; the pairs not sent stay pending.
+        """
+        with self._lock:
+            self._pendingSubscribe.update(self._active)
+            self._pendingUnsubscribe.difference_update(self._active)
+            self._active.clear()
+            self._pendingSubscribe.intersection_update(self._counts)
+        return self.flush()
+
+    def _settle(self, chunk):
+        """Queue the reverse change for keys whose reference count changed while they were being sent."""
+        for key in chunk:
+            wanted = key in self._counts
+            if wanted and key not in self._active:
+                self._pendingSubscribe.add(key)
+            elif not wanted and key in self._active:
+                self._pendingUnsubscribe.add(key)
+
+    def _chunks(self, keys):
+        """Group sorted keys by event code and split them into calls of at most `max_instruments`."""
+        byEvent = {}
+        for key in keys:
+            byEvent.setdefault(key[2], []).append(key)
+        for eventCode, eventKeys in sorted(byEvent.items()):
+            for start in range(0, len(eventKeys), self.max_instruments):
+                yield eventCode, eventKeys[start:start + self.max_instruments]
+
+    def subscribed(self, eventCode=None):
+        """
+        The subscriptions currently active on the server.
+
+        Args:
+            eventCode (int, optional): Only return this event code's instruments.
+
+        Returns:
+            list: ``{'exchangeSegment', 'exchangeInstrumentID', 'eventCode'}`` dicts.
+        """
+        with self._lock:
+            keys = sorted(self._active)
+        return [{'exchangeSegment': segment, 'exchangeInstrumentID': instrumentId, 'eventCode': code}
+                for segment, instrumentId, code in keys if eventCode is None or code == eventCode]
+
+    def refcount(self, instrument, eventCode):
+        """
+        The number of references to an instrument and event code.
+
+        Args:
+            instrument (dict): The instrument with exchangeSegment and exchangeInstrumentID.
+            eventCode (int): The event code.
+
+        Returns:
+            int: The reference count, 0 if nobody subscribed it.
+        """
+        return self._counts.get(self._keys([instrument], eventCode)[0], 0)
+
+    def pending(self):
+        """
+        The changes waiting for the next flush.
+
+        Returns:
+            dict: ``{'subscribe': n, 'unsubscribe': n}``.
+        """
+        with self._lock:
+            return {'subscribe': len(self._pendingSubscribe), 'unsubscribe': len(self._pendingUnsubscribe)}
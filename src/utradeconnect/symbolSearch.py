@@ -0,0 +1,239 @@
+"""
+Local symbol search over the instrument master.
+
+`SymbolSearch` answers autocomplete style queries from memory instead of calling
+`search_by_scriptname` for every keystroke. A query is split into tokens:
+
+    - the first token is matched as a prefix of the underlying names ('reli' -> RELIANCE),
+    - every other token must be a prefix of a token of the instrument, taken from its symbol,
+      display name, series, option type and expiry month ('nifty 27apr 17500 ce'),
+    - a single token that matches no name is matched as a prefix of the full trading symbols
+      and display names ('NIFTY23APR175'),
+    - when nothing matches, names sharing enough character trigrams with the first token are
+      used instead, so small typos still find the instrument ('relaince').
+
+Results are ranked by match quality, then liquidity (when provided), exchange segment,
+instrument type (equity, future, option), expiry and strike.
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date
+
+from utradeconnect.instrumentMaster import OPTION_TYPE_NAMES, OPTION_TYPES, segment_code
+
+# Default ranking of exchange segments, lower ranks first
+SEGMENT_RANK = {1: 0, 2: 1, 11: 2, 12: 3, 3: 4, 51: 5}
+
+_MONTH_NAMES = (None, 'JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+_TOKEN = re.compile(r'[A-Z0-9.]+')
+_HIGH = '\U0010ffff'
+
+
+def _trigrams(text):
+    padded = '  {} '.format(text)
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class SymbolSearch:
+    """
+    In-memory search index over an `InstrumentMaster`.
+
+    Args:
+        master (InstrumentMaster): The instruments to search.
+        liquidity (dict, optional): (exchangeSegment, exchangeInstrumentID) -> a liquidity score
+            such as traded volume or open interest, higher ranks first. Defaults to None.
+        segmentRank (dict, optional): Exchange segment code -> rank, lower ranks first. Defaults
+            to NSE before BSE, cash before derivatives.
+    """
+
+    def __init__(self, master, liquidity=None, segmentRank=None):
+        self.master = master
+        self.segmentRank = segmentRank if segmentRank is not None else SEGMENT_RANK
+        columns = master.columns
+        names = defaultdict(list)
+        tokens = defaultdict(set)
+        symbols = []
+        for row, (name, symbol, displayName, series, expiry, optionType) in enumerate(zip(
+                columns['name'], columns['symbol'], columns['displayName'], columns['series'],
+                columns['expiry'], columns['optionType'])):
+            name = name.upper()
+            symbol = symbol.upper()
+            displayName = displayName.upper()
+            names[name].append(row)
+            rowTokens = set(_TOKEN.findall(displayName))
+            rowTokens.update(_TOKEN.findall(symbol))
+            rowTokens.add(series.upper())
+            if expiry:
+                rowTokens.add(_MONTH_NAMES[expiry // 100 % 100])
+                rowTokens.add('FUT' if not optionType else OPTION_TYPE_NAMES.get(optionType, ''))
+            for token in rowTokens:
+                tokens[token].add(row)
+            symbols.append((symbol, row))
+            if displayName and displayName != symbol:
+                symbols.append((displayName, row))
+        self._names = names
+        self._nameKeys = sorted(names)
+        self._tokens = tokens
+        self._tokenKeys = sorted(tokens)
+        symbols.sort()
+        self._symbolKeys = [key for key, _ in symbols]
+        self._symbolRows = [row for _, row in symbols]
+        trigrams = defaultdict(set)
+        for name in names:
+            for trigram in _trigrams(name):
+                trigrams[trigram].add(name)
+        self._trigrams = trigrams
+        self.update_liquidity(liquidity)
+
+    def update_liquidity(self, liquidity):
+        """
+        Re-rank the instruments with new liquidity scores.
+
+        Args:
+            liquidity (dict): (exchangeSegment, exchangeInstrumentID) -> score, higher ranks first.
+        """
+        columns = self.master.columns
+        liquidity = liquidity or {}
+        segmentRank = self.segmentRank
+        ranks = [
+            (-liquidity.get((segment, instrumentId), 0), segmentRank.get(segment, 99),
+             0 if not expiry else (2 if optionType else 1), expiry, strike)
+            for segment, instrumentId, expiry, optionType, strike in zip(
+                columns['exchangeSegment'], columns['exchangeInstrumentID'], columns['expiry'],
+                columns['optionType'], columns['strikePrice'])]
+        self._rank = ranks
+        rank = ranks.__getitem__
+        for rows in self._names.values():
+            rows.sort(key=rank)
+        self._nameRank = {name: ranks[rows[0]] for name, rows in self._names.items()}
+
+    def _prefixed(self, keys, prefix):
+        """The keys of a sorted list starting with `prefix`, as a range of positions."""
+        return range(bisect_left(keys, prefix), bisect_left(keys, prefix + _HIGH))
+
+    def _token_rows(self, token):
+        """Rows having a token starting with `token`."""
+        keys = self._tokenKeys
+        positions = self._prefixed(keys, token)
+        if len(positions) == 1:
+            return self._tokens[keys[positions[0]]]
+        rows = set()
+        for position in positions:
+            rows.update(self._tokens[keys[position]])
+        return rows
+
+    def _fuzzy_names(self, token, count=5):
+        """The names most similar to `token` by trigram overlap."""
+        trigrams = _trigrams(token)
+        shared = defaultdict(int)
+        for trigram in trigrams:
+            for name in self._trigrams.get(trigram, ()):
+                shared[name] += 1
+        scored = []
+        for name, common in shared.items():
+            similarity = common / (len(trigrams) + len(name) + 1 - common)
+            if similarity >= 0.3:
+                scored.append((-similarity, self._nameRank[name], name))
+        scored.sort()
+        return [name for _, _, name in scored[:count]]
+
+    def search_rows(self, query, limit=20, exchangeSegment=None):
+        """
+        Find the rows of the instruments matching `query`, best first.
+
+        Args:
+            query (str): The search text, e.g. 'reliance', 'nifty 27apr 17500 ce'.
+            limit (int, optional): Maximum number of results. Defaults to 20.
+            exchangeSegment (int or str, optional): Only return instruments of this segment.
+
+        Returns:
+            list: Master row numbers.
+        """
+        tokens = _TOKEN.findall(query.upper())
+        if not tokens or limit <= 0:
+            return []
+        if exchangeSegment is not None:
+            exchangeSegment = segment_code(exchangeSegment)
+        first, others = tokens[0], tokens[1:]
+        nameKeys = self._nameKeys
+        names = [nameKeys[position] for position in self._prefixed(nameKeys, first)]
+        nameRank = self._nameRank
+        names.sort(key=lambda name: (name != first, nameRank[name], len(name)))
+
+        filters = sorted((self._token_rows(token) for token in others), key=len)
+        segments = self.master.columns['exchangeSegment']
+        results = self._collect(names, filters, segments, exchangeSegment, limit)
+
+        if len(results) < limit and not others:
+            found = set(results)
+            keys = self._symbolKeys
+            positions = self._prefixed(keys, first)
+            candidates = {self._symbolRows[position] for position in positions[:1000]} - found
+            if exchangeSegment is not None:
+                candidates = {row for row in candidates if segments[row] == exchangeSegment}
+            results.extend(sorted(candidates, key=self._rank.__getitem__)[:limit - len(results)])
+
+        if not results:
+            results = self._collect(self._fuzzy_names(first), filters, segments, exchangeSegment, limit)
+        return results
+
+    def _collect(self, names, filters, segments, exchangeSegment, limit):
+        """Take the ranked rows of `names` that pass every token filter, up to `limit`."""
+        results = []
+        for name in names:
+            for row in self._names[name]:
+                if exchangeSegment is not None and segments[row] != exchangeSegment:
+                    continue
+                for rows in filters:
+                    if row not in rows:
+                        break
+                else:
+                    results.append(row)
+                    if len(results) == limit:
+                        return results
+        return results
+
+    def search(self, query, limit=20, exchangeSegment=None):
+        """
+        Search the instruments, returning the same shape as `search_by_scriptname`.
+
+        Args:
+            query (str): The search text, e.g. 'reliance', 'nifty 27apr 17500 ce'.
+            limit (int, optional): Maximum number of results. Defaults to 20.
+            exchangeSegment (int or str, optional): Only return instruments of this segment.
+
+        Returns:
+            dict: ``{'type': 'success', 'description': ..., 'result': [...]}``, every result
+            holding the master fields of one instrument (ExchangeSegment, ExchangeInstrumentID,
+            Name, Description, DisplayName, LotSize, ...).
+        """
+        return {
+            'type': 'success',
+            'description': 'Instruments matching the search string',
+            'result': [self._result(row) for row in self.search_rows(query, limit, exchangeSegment)],
+        }
+
+    def _result(self, row):
+        """A `search_by_scriptname` style result entry for a row."""
+        instrument = self.master.row(row)
+        return {
+            'ExchangeSegment': instrument.exchangeSegment,
+            'ExchangeInstrumentID': instrument.exchangeInstrumentID,
+            'InstrumentType': instrument.instrumentType,
+            'Name': instrument.name,
+            'Description': instrument.symbol,
+            'Series': instrument.series,
+            'DisplayName': instrument.displayName,
+            'ISIN': instrument.isin,
+            'PriceBand': {'High': instrument.highPriceBand, 'Low': instrument.lowPriceBand},
+            'FreezeQty': instrument.freezeQuantity,
+            'TickSize': instrument.tickSize,
+            'LotSize': instrument.lotSize,
+            'Multiplier': instrument.multiplier,
+            'UnderlyingInstrumentId': instrument.underlyingInstrumentID,
+            'UnderlyingIndexName': instrument.underlyingIndexName,
+            'ContractExpiration': instrument.expiry.isoformat() if isinstance(instrument.expiry, date) else None,
+            'StrikePrice': instrument.strikePrice,
+            'OptionType': OPTION_TYPES.get(instrument.optionType),
+        }
@@ -0,0 +1,362 @@
+"""
+Append-only binary journal of the market data stream.
+
+A journal file starts with the 8 byte header ``UTJ1\\x00\\x00\\x00\\x00`` followed by length prefixed
+records, all integers little endian:
+
+    uint32  payload length
+    uint16  event code, e.g. 1501
+    uint8   flags, bit 0 set for json-partial messages, bit 1 for packed payloads
+    int64   receive timestamp, nanoseconds since the epoch
+    bytes   payload
+
+By default the writer stores the decoded fields: the message is decoded into its
+`utradeconnect.ticks` record on the writer thread and the field values are packed with `marshal`,
+which keeps numbers binary and drops the JSON keys, so a full 1501 event takes a fraction of its
+JSON size and reading it back needs no text parsing. With ``packed=False`` (or for a message that
+cannot be decoded) the payload is the message exactly as received (UTF-8), which makes replay
+byte-identical to the live stream.
+"""
+import marshal
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from utradeconnect.exception import UtradeDataException, UtradeInputException
+from utradeconnect.ticks import decode_event, record_fields, record_from_fields
+
+MAGIC = b'UTJ1\x00\x00\x00\x00'
+RECORD_HEADER = struct.Struct('<IHBq')
+PARTIAL = 1
+PACKED = 2
+
+
+class JournalRecord(namedtuple('JournalRecord', ['event', 'eventCode', 'receivedAt', 'data'])):
+    """
+    One journal entry.
+
+    Attributes:
+        event (str): The socket event name, e.g. '1501-json-full'.
+        eventCode (int): The event code.
+        receivedAt (int): Receive timestamp in nanoseconds since the epoch.
+        data: The message as received, or its decoded record when reading with ``decode=True``
+            or when the entry was stored packed.
+    """
+    __slots__ = ()
+
+
+def _event_name(eventCode, flags):
+    return '{}-json-{}'.format(eventCode, 'partial' if flags & PARTIAL else 'full')
+
+
+class TickJournalWriter:
+    """
+    Records every market data event into daily rotated journal files.
+
+    `record` only timestamps the event and hands it to a background thread, which decodes, packs
+    and writes records in large buffered batches, so the socket receive thread never waits on disk.
+    Files are named ``<prefix>-<YYYYMMDD>.utj`` after the local receive date and are appended to
+    when the process restarts on the same day.
+
+    If writing fails (disk full, a file of the same name that is not a journal) the writer stops
+    and keeps the error in `error`; `record`, `flush` and `close` then raise it.
+
+    Args:
+        directory (str): Directory for the journal files, created if missing.
+        prefix (str, optional): File name prefix. Defaults to 'ticks'.
+        flush_interval (float, optional): Maximum seconds between disk writes. Defaults to 0.5.
+        packed (bool, optional): Store the decoded fields instead of the raw message, see the
+            module documentation. Defaults to True.
+    """
+
+    def __init__(self, directory, prefix='ticks', flush_interval=0.5, packed=True):
+        self.directory = directory
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.packed = packed
+        self.recorded = 0
+        self.written = 0
+        self.path = None
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._dayStart = 0
+        self._dayEnd = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='utrade-journal', daemon=True)
+        self._thread.start()
+
+    def record(self, event, data, receivedAt=None):
+        """
+        Append an event to the journal, called from the socket receive thread.
+
+        Args:
+            event (str): The socket event name, e.g. '1501-json-full'.
+            data (str or bytes): The message as received.
+            receivedAt (int, optional): Receive timestamp in nanoseconds. Defaults to now.
+
+        Raises:
+            UtradeInputException: If `data` is not a string or bytes.
+            UtradeDataException: If the writer thread failed, see `error`.
+        """
+        if self.error is not None:
+            self._raise_error()
+        if not isinstance(data, (str, bytes, bytearray, memoryview)):
+            raise UtradeInputException("Journal payloads must be str or bytes, got {}".format(type(data).__name__))
+        self._queue.put((receivedAt or time.time_ns(), event, data))
+        self.recorded += 1
+
+    def _raise_error(self):
+        raise UtradeDataException("Tick journal writer failed, {} events not written: {}".format(
+            self.recorded - self.written, self.error)) from self.error
+
+    def _run(self):
+        """Writer thread loop: batch queued events and write them to the current day's file."""
+        get = self._queue.get
+        while True:
+            try:
+                batch = [get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stopped.is_set():
+                    break
+                continue
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Stop writing, record/flush/close report the error instead of queueing forever
+                self.error = e
+                break
+        try:
+            self._close_file()
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+
+    def _write(self, batch):
+        """Encode a batch of events, rotating the file when the receive date changes."""
+        buffer = bytearray()
+        pack = RECORD_HEADER.pack
+        packed = self.packed
+        dumps = marshal.dumps
+        for receivedAt, event, data in batch:
+            if not self._dayStart <= receivedAt < self._dayEnd:
+                if buffer:
+                    self._file.write(buffer)
+                    buffer = bytearray()
+                self._rotate(receivedAt)
+            flags = PARTIAL if event.endswith('partial') else 0
+            payload = None
+            if packed:
+                try:
+                    payload = dumps(record_fields(decode_event(event, data)))
+                    flags |= PACKED
+                except Exception:
+                    # Kept as received, the reader decodes it like an unpacked journal
+                    payload = None
+            if payload is None:
+                payload = data.encode('utf8') if isinstance(data, str) else bytes(data)
+            buffer += pack(len(payload), int(event[:4]), flags, receivedAt)
+            buffer += payload
+        self._file.write(buffer)
+        self._file.flush()
+        self.written += len(batch)
+
+    def _rotate(self, receivedAt):
+        """Switch to the journal file of the local day containing `receivedAt`."""
+        self._close_file()
+        midnight = datetime.fromtimestamp(receivedAt / 1e9).replace(hour=0, minute=0, second=0, microsecond=0)
+        self._dayStart = int(midnight.timestamp() * 1e9)
+        self._dayEnd = int((midnight + timedelta(days=1)).timestamp() * 1e9)
+        self.path = os.path.join(self.directory, '{}-{}.utj'.format(self.prefix, midnight.strftime('%Y%m%d')))
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if exists:
+            # Drop a record left truncated by a crash so appended records stay aligned
+            length = _complete_length(self.path)
+            if length < os.path.getsize(self.path):
+                os.truncate(self.path, length)
+            exists = length > 0
+        self._file = open(self.path, 'ab', buffering=1 << 20)
+        if not exists:
+            self._file.write(MAGIC)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def flush(self, timeout=None):
+        """
+        Wait until every recorded event has been written.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait.
+
+        Returns:
+            bool: True if everything was written.
+
+        Raises:
+            UtradeDataException: If the writer thread failed, see `error`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.written < self.recorded and self._thread.is_alive():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        if self.error is not None:
+            self._raise_error()
+        return self.written >= self.recorded
+
+    def close(self):
+        """
+        Write the remaining events and close the journal.
+
+        Raises:
+            UtradeDataException: If the writer thread failed, see `error`.
+        """
+        self._stopped.set()
+        self._thread.join()
+        if self.error is not None:
+            self._raise_error()
+
+
+class TickJournalReader:
+    """
+    Memory-maps a journal file and iterates its records.
+
+    Args:
+        path (str): The journal file.
+        decode (bool, optional): Whether to yield decoded `utradeconnect.ticks` records instead of
+            the raw message strings. Packed entries have no raw message and are always yielded as
+            records. Defaults to False.
+
+    Raises:
+        UtradeDataException: If the file is not a tick journal.
+    """
+
+    def __init__(self, path, decode=False):
+        self.path = path
+        self.decode = decode
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise UtradeDataException("Not a tick journal: {}".format(path))
+
+    def __iter__(self):
+        """
+        Iterate the journal.
+
+        Yields:
+            JournalRecord: Every complete record in file order, a record truncated by a crash
+            while writing ends the iteration.
+        """
+        data = self._map
+        end = len(data)
+        offset = len(MAGIC)
+        unpack = RECORD_HEADER.unpack_from
+        headerSize = RECORD_HEADER.size
+        decode = self.decode
+        names = {}
+        new = tuple.__new__
+        loads = marshal.loads
+        while offset + headerSize <= end:
+            length, eventCode, flags, receivedAt = unpack(data, offset)
+            start = offset + headerSize
+            offset = start + length
+            if offset > end:
+                break
+            event = names.get((eventCode, flags))
+            if event is None:
+                event = names[(eventCode, flags)] = _event_name(eventCode, flags)
+            if flags & PACKED:
+                payload = record_from_fields(eventCode, loads(data[start:offset]))
+            else:
+                payload = data[start:offset].decode('utf8')
+                if decode:
+                    payload = decode_event(event, payload)
+            yield new(JournalRecord, (event, eventCode, receivedAt, payload))
+
+    def iter_raw(self):
+        """
+        Iterate the journal without decoding payloads, the fastest way to scan it.
+
+        Yields:
+            tuple: ``(eventCode, flags, receivedAt, offset, length)`` where the payload is
+            ``reader.buffer[offset:offset + length]``, packed fields when ``flags & PACKED``.
+        """
+        data = self._map
+        end = len(data)
+        offset = len(MAGIC)
+        unpack = RECORD_HEADER.unpack_from
+        headerSize = RECORD_HEADER.size
+        while offset + headerSize <= end:
+            length, eventCode, flags, receivedAt = unpack(data, offset)
+            start = offset + headerSize
+            offset = start + length
+            if offset > end:
+                break
+            yield eventCode, flags, receivedAt, start, length
+
+    @property
+    def buffer(self):
+        """The memory-mapped file contents."""
+        return self._map
+
+    def close(self):
+        """Unmap and close the journal file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _complete_length(path):
+    """
+    Return the size of `path` up to the end of its last complete record.
+
+    A file holding only part of the header, left by a crash right after creating it, has length 0.
+
+    Raises:
+        UtradeDataException: If the file is not a tick journal, it must not be truncated.
+    """
+    with open(path, 'rb') as file:
+        head = file.read(len(MAGIC))
+    if len(head) < len(MAGIC) and MAGIC.startswith(head):
+        return 0
+    with TickJournalReader(path) as reader:
+        end = len(MAGIC)
+        for _, _, _, offset, length in reader.iter_raw():
+            end = offset + length
+    return end
+
+
+def journal_files(directory, prefix='ticks'):
+    """
+    List the journal files of a directory in date order.
+
+    Args:
+        directory (str): The journal directory.
+        prefix (str, optional): File name prefix. Defaults to 'ticks'.
+
+    Returns:
+        list: The journal file paths.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.startswith(prefix + '-') and name.endswith('.utj'))
+    return [os.path.join(directory, name) for name in names]
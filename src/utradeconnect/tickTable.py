@@ -0,0 +1,398 @@
+"""
+A latest-tick table in shared memory, written by one market data process and read by many.
+
+The process owning `MDSocket_io` attaches a `LatestTickTable` to it; every 1501 Touchline,
+1510 Open Interest and 1512 LTP event updates the instrument's row in place. Strategy processes
+on the same host open the table by name and read the latest values straight from the shared
+pages, without a socket, subscription or copy of the feed of their own.
+
+Memory layout, all little endian:
+
+    header    magic ``UTT1\\x00\\x00\\x00\\x00``, then uint32 version, capacity, row size and
+              used rows (the number of instrument keys assigned so far)
+    keys      capacity x (int64 exchangeSegment, int64 exchangeInstrumentID), in row order
+    rows      from the next 64-byte boundary, capacity x row size bytes: a uint64 sequence
+              number, `FIELDS` and the uint32 CRC-32 of the packed fields, padded to whole
+              64-byte cache lines
+
+Rows are guarded by a seqlock: the writer makes the sequence odd, writes the fields and makes it
+even again. A reader copies the row and retries if the sequence was odd or changed meanwhile, so
+readers never block the writer. That alone rules out half written rows only where the CPU keeps
+stores and loads in program order, which x86 (TSO) does and Python offers no fence for elsewhere.
+On other CPUs (`ORDERED_STORES` false, e.g. arm64) readers also check the row's CRC-32 against
+its fields and retry on a mismatch.
+"""
+import platform
+import struct
+import time
+import zlib
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+from utradeconnect.exception import UtradeDataException, UtradeInputException
+from utradeconnect.instrumentMaster import segment_code
+
+MAGIC = b'UTT1\x00\x00\x00\x00'
+VERSION = 2
+
+# Whether the CPU keeps memory accesses in program order (x86 TSO), so shared memory published
+# by counters needs neither locks nor checksums
+ORDERED_STORES = platform.machine().lower() in ('x86_64', 'amd64', 'i386', 'i686', 'x86')
+
+# (name, struct typecode) of the values kept per instrument, prices and averages as float64
+# (NaN until first seen) and quantities and times as int64 (0 until first seen)
+FIELDS = (
+    ('lastTradedPrice', 'd'),
+    ('lastTradedQuantity', 'q'),
+    ('totalTradedQuantity', 'q'),
+    ('averageTradedPrice', 'd'),
+    ('open', 'd'),
+    ('high', 'd'),
+    ('low', 'd'),
+    ('close', 'd'),
+    ('bidPrice', 'd'),
+    ('bidSize', 'q'),
+    ('askPrice', 'd'),
+    ('askSize', 'q'),
+    ('totalBuyQuantity', 'q'),
+    ('totalSellQuantity', 'q'),
+    ('openInterest', 'q'),
+    ('lastTradedTime', 'q'),
+    ('lastUpdateTime', 'q'),
+    ('exchangeTimeStamp', 'q'),
+    ('receivedAt', 'd'),
+)
+
+_HEADER = struct.Struct('<8sIIII')
+_KEY = struct.Struct('<qq')
+_VALUES = struct.Struct('<' + ''.join(typecode for _, typecode in FIELDS))
+_CHECKSUM = struct.Struct('<I')
+_ROW_SIZE = (8 + _VALUES.size + _CHECKSUM.size + 63) // 64 * 64
+_EMPTY = tuple(float('nan') if typecode == 'd' else 0 for _, typecode in FIELDS)
+_POSITIONS = {name: position for position, (name, _) in enumerate(FIELDS)}
+_RECEIVED_AT = _POSITIONS['receivedAt']
+# Offset of the used rows count in the header
+_USED = 20
+
+# The record fields each event code updates
+_EVENT_FIELDS = {
+    1501: ('lastTradedPrice', 'lastTradedQuantity', 'totalTradedQuantity', 'averageTradedPrice', 'open', 'high',
+           'low', 'close', 'bidPrice', 'bidSize', 'askPrice', 'askSize', 'totalBuyQuantity', 'totalSellQuantity',
+           'lastTradedTime', 'lastUpdateTime', 'exchangeTimeStamp'),
+    1510: ('openInterest',),
+    1512: ('lastTradedPrice', 'lastTradedQuantity', 'lastTradedTime', 'lastUpdateTime'),
+}
+
+
+def _rows_offset(capacity):
+    """Start of the rows area, aligned to a cache line."""
+    return (_HEADER.size + capacity * _KEY.size + 63) // 64 * 64
+
+
+class LatestTick(namedtuple('LatestTick', ['exchangeSegment', 'exchangeInstrumentID'] + [name for name, _ in FIELDS])):
+    """The latest values of one instrument, copied consistently out of a `LatestTickTable`."""
+    __slots__ = ()
+
+
+def attach_shared_memory(name):
+    """
+    Map an existing shared memory block without letting this process's resource tracker unlink it at exit.
+
+    Args:
+        name (str): The block's name.
+
+    Returns:
+        SharedMemory: The attached block, closed but never unlinked by this process.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attach is tracked and the block would be unlinked when this
+        # reader exits, while the writer still uses it
+        memory = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(memory._name, 'shared_memory')
+        return memory
+
+
+class LatestTickTable:
+    """
+    The latest touchline, LTP and open interest of every instrument, in shared memory.
+
+    Create the table in the process that owns the market data socket and `attach` it, then open
+    it by name from any number of reader processes:
+
+        writer:  ``table = LatestTickTable('utrade-ticks', capacity=20000); table.attach(socket)``
+        readers: ``table = LatestTickTable('utrade-ticks'); table.get(1, 2885).lastTradedPrice``
+
+    Only one process and one thread may write. Instruments get a row the first time they tick,
+    in arrival order, and keep it for the life of the table.
+
+    Args:
+        name (str, optional): The shared memory name. Defaults to None, a generated name (see
+            `name`) for a new table.
+        capacity (int, optional): Rows of a new table. When given a new table is created, when
+            omitted the existing table `name` is opened for reading. Defaults to None.
+        read_timeout (float, optional): Seconds a read retries a row that stays mid-write, e.g.
+            because the writer died during an update, before raising. Defaults to 1.0.
+
+    Raises:
+        UtradeInputException: If neither a name nor a capacity is given.
+        UtradeDataException: If the block `name` is not a latest-tick table.
+    """
+
+    def __init__(self, name=None, capacity=None, read_timeout=1.0):
+        if capacity is not None:
+            if capacity <= 0:
+                raise UtradeInputException("Latest-tick table capacity must be positive")
+            self.owner = True
+            self.memory = shared_memory.SharedMemory(
+                name=name, create=True, size=_rows_offset(capacity) + capacity * _ROW_SIZE)
+            _HEADER.pack_into(self.memory.buf, 0, MAGIC, VERSION, capacity, _ROW_SIZE, 0)
+        elif name is None:
+            raise UtradeInputException("Open a latest-tick table by name or create one with a capacity")
+        else:
+            self.owner = False
+            self.memory = attach_shared_memory(name)
+            magic, version, capacity, rowSize, _ = _HEADER.unpack_from(self.memory.buf, 0)
+            if magic != MAGIC or version != VERSION or rowSize != _ROW_SIZE:
+                self.memory.close()
+                raise UtradeDataException("Not a compatible latest-tick table: {}".format(name))
+        self.name = self.memory.name
+        self.capacity = capacity
+        buffer = self.memory.buf
+        self._keysOffset = _HEADER.size
+        self._rowsOffset = _rows_offset(capacity)
+        self._buffer = buffer
+        # One uint64 view over the rows area, the sequence of row r is at r * _ROW_SIZE // 8
+        self._sequences = buffer[self._rowsOffset:].cast('Q')
+        self._index = {}
+        self._values = []
+        self.read_timeout = read_timeout
+        self.retries = 0
+        self.dropped = 0
+        self.invalid = 0
+        if self.owner:
+            for row in range(capacity):
+                self._write(self._rowsOffset + row * _ROW_SIZE + 8, _EMPTY)
+
+    def __len__(self):
+        """The number of instruments with a row."""
+        return self._used()
+
+    def _used(self):
+        return struct.unpack_from('<I', self._buffer, _USED)[0]
+
+    def _refresh(self):
+        """Index the rows the writer assigned since the last call."""
+        index = self._index
+        for row in range(len(index), self._used()):
+            key = _KEY.unpack_from(self._buffer, self._keysOffset + row * _KEY.size)
+            if not key[0]:
+                # Without ordered stores the count can be seen before the key, pick it up next time
+                break
+            index[key] = row
+
+    def _assign(self, key):
+        """Give a new instrument the next free row, publishing its key before the row count."""
+        row = len(self._index)
+        if row == self.capacity:
+            self.dropped += 1
+            return None
+        _KEY.pack_into(self._buffer, self._keysOffset + row * _KEY.size, *key)
+        struct.pack_into('<I', self._buffer, _USED, row + 1)
+        self._index[key] = row
+        self._values.append(list(_EMPTY))
+        return row
+
+    def update(self, record):
+        """
+        Write a decoded 1501, 1510 or 1512 record into its instrument's row.
+
+        Fields the record does not carry (None in partial broadcasts) keep their previous value.
+
+        Args:
+            record: A `Touchline`, `OpenInterest` or `LTP` record from `utradeconnect.ticks`.
+
+        Returns:
+            bool: False if the record was not stored, because of its event code, a full table or
+            a missing or unknown exchange segment (counted in `invalid`).
+
+        Raises:
+            UtradeInputException: If the table was opened for reading.
+        """
+        if not self.owner:
+            raise UtradeInputException("Latest-tick table {} is open for reading only".format(self.name))
+        positions = _record_positions(type(record))
+        if positions is None:
+            return False
+        key = (record.exchangeSegment, record.exchangeInstrumentID)
+        row = self._index.get(key)
+        if row is None:
+            # Keys are stored as int64 pairs, decoded records may carry the segment by name
+            try:
+                key = (segment_code(key[0]), int(key[1]))
+            except (UtradeInputException, AttributeError, TypeError, ValueError):
+                self.invalid += 1
+                return False
+            row = self._index.get(key)
+        if row is None:
+            row = self._assign(key)
+            if row is None:
+                return False
+        values = self._values[row]
+        for position, field, cast in positions:
+            value = record[field]
+            if value is not None:
+                values[position] = cast(value)
+        values[_RECEIVED_AT] = time.time()
+        sequence = row * _ROW_SIZE // 8
+        sequences = self._sequences
+        # Odd while the row is being written, readers retry until it is even and unchanged
+        sequences[sequence] += 1
+        self._write(self._rowsOffset + row * _ROW_SIZE + 8, values)
+        sequences[sequence] += 1
+        return True
+
+    def _write(self, offset, values):
+        """Pack a row's values followed by their checksum."""
+        packed = _VALUES.pack(*values)
+        buffer = self._buffer
+        buffer[offset:offset + _VALUES.size] = packed
+        _CHECKSUM.pack_into(buffer, offset + _VALUES.size, zlib.crc32(packed))
+
+    def get(self, exchangeSegment, exchangeInstrumentID):
+        """
+        A consistent copy of an instrument's latest values.
+
+        Args:
+            exchangeSegment (int or str): The exchange segment, e.g. 1 or 'NSECM'.
+            exchangeInstrumentID (int): The instrument ID.
+
+        Returns:
+            LatestTick: The latest values, or None if the instrument has not ticked yet.
+
+        Raises:
+            UtradeDataException: If the row stayed mid-write for `read_timeout` seconds.
+        """
+        key = (segment_code(exchangeSegment), int(exchangeInstrumentID))
+        row = self._index.get(key)
+        if row is None:
+            self._refresh()
+            row = self._index.get(key)
+            if row is None:
+                return None
+        return tuple.__new__(LatestTick, key + self._read(row))
+
+    def _read(self, row):
+        """Copy a row's values under the seqlock."""
+        sequences = self._sequences
+        sequence = row * _ROW_SIZE // 8
+        offset = self._rowsOffset + row * _ROW_SIZE + 8
+        spins = 0
+        deadline = None
+        while True:
+            before = sequences[sequence]
+            if not before & 1:
+                if ORDERED_STORES:
+                    values = _VALUES.unpack_from(self._buffer, offset)
+                    if sequences[sequence] == before:
+                        return values
+                else:
+                    packed = bytes(self._buffer[offset:offset + _VALUES.size + _CHECKSUM.size])
+                    if sequences[sequence] == before and \
+                            zlib.crc32(packed[:_VALUES.size]) == _CHECKSUM.unpack_from(packed, _VALUES.size)[0]:
+                        return _VALUES.unpack(packed[:_VALUES.size])
+            self.retries += 1
+            spins += 1
+            if spins % 64 == 0:
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.read_timeout
+                elif now > deadline:
+                    raise UtradeDataException(
+                        "Row {} of latest-tick table {} stayed mid-write for {}s, the writer may have died "
+                        "during an update".format(row, self.name, self.read_timeout))
+                # The writer was descheduled mid-write, let it run
+                time.sleep(0)
+
+    def get_many(self, instruments):
+        """
+        The latest values of several instruments.
+
+        Args:
+            instruments (list): Instrument dicts with exchangeSegment and exchangeInstrumentID.
+
+        Returns:
+            list: One `LatestTick` or None per instrument, in input order.
+        """
+        return [self.get(instrument['exchangeSegment'], instrument['exchangeInstrumentID'])
+                for instrument in instruments]
+
+    def keys(self):
+        """
+        The instruments with a row, in row order.
+
+        Returns:
+            list: ``(exchangeSegment, exchangeInstrumentID)`` tuples.
+        """
+        self._refresh()
+        return list(self._index)
+
+    def attach(self, socket):
+        """
+        Keep the table updated from a market data socket.
+
+        Args:
+            socket (MDSocket_io): The market data socket.
+        """
+        for eventCode in _EVENT_FIELDS:
+            socket.add_listener(eventCode, self.update)
+
+    def detach(self, socket):
+        """
+        Stop updating the table from a socket.
+
+        Args:
+            socket (MDSocket_io): The socket passed to `attach`.
+        """
+        for eventCode in _EVENT_FIELDS:
+            socket.remove_listener(eventCode, self.update)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # The row views must be released before SharedMemory can unmap the block
+        self.close()
+
+    def close(self):
+        """Unmap the table from this process."""
+        if getattr(self, '_buffer', None) is None:
+            return
+        self._sequences.release()
+        self._buffer = self._sequences = None
+        self.memory.close()
+
+    def unlink(self):
+        """Free the shared memory, called by the writer once it is done with the table."""
+        self.memory.unlink()
+
+
+_record_fields = {}
+
+
+def _record_positions(recordType):
+    """``(value position, record field, cast)`` of the table fields a record type updates, None if it updates none."""
+    try:
+        return _record_fields[recordType]
+    except KeyError:
+        names = _EVENT_FIELDS.get(getattr(recordType, 'eventCode', None))
+        positions = None
+        if names is not None:
+            positions = [(_POSITIONS[name], recordType._fields.index(name), float if FIELDS[_POSITIONS[name]][1] == 'd' else int)
+                         for name in names]
+        _record_fields[recordType] = positions
+        return positions
@@ -0,0 +1,500 @@
+"""
+Typed market data records and decoders for the market data socket events.
+
+Every event is decoded into a fixed-schema record: a `namedtuple` subclass with `__slots__ = ()`,
+so a tick is a single tuple allocation and fields are read by attribute (`tick.lastTradedPrice`).
+
+Partial ("json-partial") broadcast messages are comma separated ``key:value`` pairs, the
+instrument is given as ``t:<exchangeSegment>_<exchangeInstrumentID>`` and best bid/ask or
+depth levels as ``|`` separated ``level|size|price|orders`` groups, e.g.:
+
+    t:1_22,ltp:1567.5,ltq:75,v:4059,bi:0|58|1567.5|1,ai:0|73|1568|2
+
+The keys understood for each event code are listed in the `partialKeys` of the record classes.
+
+Full ("json-full") messages are parsed with the fastest JSON backend available (orjson, then
+ujson, then the standard library) and copied straight into the record, the intermediate dicts
+are not kept.
+"""
+from collections import namedtuple
+
+from utradeconnect.exception import UtradeDataException
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    try:
+        from ujson import loads as _loads
+    except ImportError:
+        from json import loads as _loads
+
+
+class Touchline(namedtuple('Touchline', [
+        'exchangeSegment', 'exchangeInstrumentID', 'exchangeTimeStamp', 'lastTradedPrice',
+        'lastTradedQuantity', 'totalBuyQuantity', 'totalSellQuantity', 'totalTradedQuantity',
+        'averageTradedPrice', 'lastTradedTime', 'lastUpdateTime', 'percentChange', 'open', 'high',
+        'low', 'close', 'totalValueTraded', 'bidSize', 'bidPrice', 'bidOrders', 'askSize', 'askPrice',
+        'askOrders'], defaults=(None,) * 23)):
+    """1501 Touchline (Level 1) event."""
+    __slots__ = ()
+    eventCode = 1501
+    partialKeys = {
+        'ltp': ('lastTradedPrice', float),
+        'ltq': ('lastTradedQuantity', int),
+        'tb': ('totalBuyQuantity', int),
+        'ts': ('totalSellQuantity', int),
+        'v': ('totalTradedQuantity', int),
+        'ap': ('averageTradedPrice', float),
+        'ltt': ('lastTradedTime', int),
+        'lut': ('lastUpdateTime', int),
+        'pc': ('percentChange', float),
+        'o': ('open', float),
+        'h': ('high', float),
+        'l': ('low', float),
+        'c': ('close', float),
+        'tv': ('totalValueTraded', float),
+    }
+
+
+class MarketDepth(namedtuple('MarketDepth', [
+        'exchangeSegment', 'exchangeInstrumentID', 'exchangeTimeStamp', 'bidSizes', 'bidPrices',
+        'bidOrders', 'askSizes', 'askPrices', 'askOrders', 'touchline', 'bidLevels', 'askLevels'],
+        defaults=(None,) * 12)):
+    """
+    1502 Market depth (Level 2) event, levels are tuples ordered from the best price.
+
+    Full messages carry the whole ladder and leave `bidLevels`/`askLevels` None. Partial messages
+    may carry only some levels, `bidLevels`/`askLevels` then hold the level number (0 is the
+    best) of each entry.
+    """
+    __slots__ = ()
+    eventCode = 1502
+    partialKeys = {}
+
+
+class Candle(namedtuple('Candle', [
+        'exchangeSegment', 'exchangeInstrumentID', 'barTime', 'barVolume', 'open', 'high', 'low',
+        'close', 'openInterest', 'sumOfQtyInToPrice'], defaults=(None,) * 10)):
+    """1505 Candle data event."""
+    __slots__ = ()
+    eventCode = 1505
+    partialKeys = {
+        'bt': ('barTime', int),
+        'bv': ('barVolume', int),
+        'o': ('open', float),
+        'h': ('high', float),
+        'l': ('low', float),
+        'c': ('close', float),
+        'oi': ('openInterest', int),
+        'pv': ('sumOfQtyInToPrice', float),
+    }
+
+
+class OpenInterest(namedtuple('OpenInterest', [
+        'exchangeSegment', 'exchangeInstrumentID', 'xMarketType', 'openInterest'], defaults=(None,) * 4)):
+    """1510 Open interest event."""
+    __slots__ = ()
+    eventCode = 1510
+    partialKeys = {
+        'oi': ('openInterest', int),
+    }
+
+
+class LTP(namedtuple('LTP', [
+        'exchangeSegment', 'exchangeInstrumentID', 'lastTradedPrice', 'lastTradedQuantity',
+        'lastTradedTime', 'lastUpdateTime'], defaults=(None,) * 6)):
+    """1512 Last traded price event."""
+    __slots__ = ()
+    eventCode = 1512
+    partialKeys = {
+        'ltp': ('lastTradedPrice', float),
+        'ltq': ('lastTradedQuantity', int),
+        'ltt': ('lastTradedTime', int),
+        'lut': ('lastUpdateTime', int),
+    }
+
+
+class MarketStatus(namedtuple('MarketStatus', [
+        'exchangeSegment', 'exchangeInstrumentID', 'securityType', 'tradingSession', 'marketType',
+        'message'], defaults=(None,) * 6)):
+    """1507 Market status event."""
+    __slots__ = ()
+    eventCode = 1507
+    partialKeys = {}
+
+
+class InstrumentPropertyChange(namedtuple('InstrumentPropertyChange', [
+        'exchangeSegment', 'exchangeInstrumentID', 'highPriceBand', 'lowPriceBand', 'freezeQuantity',
+        'tickSize', 'lotSize', 'status', 'properties'], defaults=(None,) * 9)):
+    """1105 Instrument property change event, unrecognised properties are kept in `properties`."""
+    __slots__ = ()
+    eventCode = 1105
+    partialKeys = {
+        'hpb': ('highPriceBand', float),
+        'lpb': ('lowPriceBand', float),
+        'fq': ('freezeQuantity', int),
+        'tks': ('tickSize', float),
+        'ls': ('lotSize', int),
+        'st': ('status', str),
+    }
+
+
+# Level numbers of the usual dense ladders, 0 to N - 1, shared instead of parsed per message
+_DENSE_LEVEL_NAMES = [[str(level) for level in range(count)] for count in range(65)]
+_DENSE_LEVELS = [tuple(range(count)) for count in range(65)]
+
+
+class _IntTable(dict):
+    """Decimal strings of the small numbers most sizes and order counts are, parsing any other."""
+
+    def __missing__(self, key):
+        return int(key)
+
+
+# A dict hit is about half the cost of int() on a string
+_SMALL_INTS = _IntTable((str(number), number) for number in range(10000))
+
+
+def _split_fields(message):
+    """Split a partial message whose values hold colons, each field at its first one."""
+    items = []
+    for field in message.split(','):
+        key, colon, value = field.partition(':')
+        if not colon:
+            raise UtradeDataException("Partial message field without a value: {!r}".format(field))
+        items += (key, value)
+    return items
+
+
+class PartialParser:
+    """
+    Decoder for the partial broadcast format of one event code.
+
+    The key table of the record class is resolved to tuple positions once and bound into a
+    specialised `parse` function, so decoding a message is a single split followed by one dict
+    lookup and one conversion per field, and the result is built with a single tuple allocation.
+    Messages are ``key:value`` fields separated by commas; values may themselves contain colons
+    (e.g. times), such messages take a slower path splitting every field on its first colon.
+
+    Args:
+        record (type): The record class to produce, e.g. `Touchline`.
+        depth (bool, optional): Whether ``bi``/``ai`` carry every depth level (1502) instead of
+            only the best bid/ask. Defaults to False.
+    """
+
+    def __init__(self, record, depth=False):
+        self.record = record
+        self.depth = depth
+        positions = {name: index for index, name in enumerate(record._fields)}
+        keys = {key: (positions[name], convert) for key, (name, convert) in record.partialKeys.items()}
+        if depth:
+            levels = {'bi': positions['bidSizes'], 'ai': positions['askSizes']}
+            levelNumbers = {'bi': positions['bidLevels'], 'ai': positions['askLevels']}
+        else:
+            levels = {'bi': positions.get('bidSize'), 'ai': positions.get('askSize')}
+            levelNumbers = None
+        properties = positions.get('properties')
+        self.parse = self._build(record, keys, levels, levelNumbers, depth, properties)
+
+    @staticmethod
+    def _build(record, keys, levels, levelNumbers, depth, properties):
+        """Create the parse function with every lookup table bound as a local."""
+        template = [None] * len(record._fields)
+        get = keys.get
+        new = tuple.__new__
+        denseNames = _DENSE_LEVEL_NAMES
+        denseLevels = _DENSE_LEVELS
+        smallInt = _SMALL_INTS.__getitem__
+
+        def parse(message):
+            """
+            Decode one partial message.
+
+            Args:
+                message (str): The raw partial message.
+
+            Returns:
+                The decoded record.
+            """
+            values = template[:]
+            items = message.replace(':', ',').split(',')
+            if len(items) != 2 * message.count(',') + 2:
+                items = _split_fields(message)
+            items = iter(items)
+            for key in items:
+                value = next(items)
+                slot = get(key)
+                if slot is not None:
+                    values[slot[0]] = slot[1](value)
+                elif key == 't':
+                    segment, _, instrument = value.partition('_')
+                    values[0] = int(segment)
+                    values[1] = int(instrument)
+                elif key in levels:
+                    # level|size|price|orders groups, every level for depth, the best one otherwise
+                    start = levels[key]
+                    parts = value.split('|')
+                    if depth:
+                        names = parts[0::4]
+                        count = len(names)
+                        # Only sparse ladders need their level numbers converted
+                        if count < 65 and names == denseNames[count]:
+                            values[levelNumbers[key]] = denseLevels[count]
+                        else:
+                            values[levelNumbers[key]] = tuple(map(int, names))
+                        # Sizes and order counts alternate at the odd positions, convert them in one pass
+                        counts = tuple(map(smallInt, parts[1::2]))
+                        values[start] = counts[0::2]
+                        values[start + 1] = tuple(map(float, parts[2::4]))
+                        values[start + 2] = counts[1::2]
+                    elif start is not None:
+                        values[start] = int(parts[1])
+                        values[start + 1] = float(parts[2])
+                        values[start + 2] = int(parts[3])
+                elif properties is not None:
+                    if values[properties] is None:
+                        values[properties] = {}
+                    values[properties][key] = value
+            return new(record, values)
+
+        return parse
+
+    def __call__(self, message):
+        """Decode one partial message, see `parse`."""
+        return self.parse(message)
+
+
+def _touchline(message):
+    """Build a `Touchline` from a decoded 1501 message or the Touchline block of a 1502 message."""
+    touchline = message.get('Touchline') or message
+    bid = touchline.get('BidInfo') or {}
+    ask = touchline.get('AskInfo') or {}
+    quantity = touchline.get('LastTradedQunatity')
+    return tuple.__new__(Touchline, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        message.get('ExchangeTimeStamp'),
+        touchline.get('LastTradedPrice'),
+        quantity if quantity is not None else touchline.get('LastTradedQuantity'),
+        touchline.get('TotalBuyQuantity'),
+        touchline.get('TotalSellQuantity'),
+        touchline.get('TotalTradedQuantity'),
+        touchline.get('AverageTradedPrice'),
+        touchline.get('LastTradedTime'),
+        touchline.get('LastUpdateTime'),
+        touchline.get('PercentChange'),
+        touchline.get('Open'),
+        touchline.get('High'),
+        touchline.get('Low'),
+        touchline.get('Close'),
+        touchline.get('TotalValueTraded'),
+        bid.get('Size'),
+        bid.get('Price'),
+        bid.get('TotalOrders'),
+        ask.get('Size'),
+        ask.get('Price'),
+        ask.get('TotalOrders'),
+    ))
+
+
+def _market_depth(message):
+    """Build a `MarketDepth` from a decoded 1502 message."""
+    bids = message.get('Bids') or ()
+    asks = message.get('Asks') or ()
+    return tuple.__new__(MarketDepth, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        message.get('ExchangeTimeStamp'),
+        tuple([level.get('Size') for level in bids]),
+        tuple([level.get('Price') for level in bids]),
+        tuple([level.get('TotalOrders') for level in bids]),
+        tuple([level.get('Size') for level in asks]),
+        tuple([level.get('Price') for level in asks]),
+        tuple([level.get('TotalOrders') for level in asks]),
+        _touchline(message) if message.get('Touchline') else None,
+        None,
+        None,
+    ))
+
+
+def _candle(message):
+    """Build a `Candle` from a decoded 1505 message."""
+    return tuple.__new__(Candle, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        message.get('BarTime'),
+        message.get('BarVolume'),
+        message.get('Open'),
+        message.get('High'),
+        message.get('Low'),
+        message.get('Close'),
+        message.get('OpenInterest'),
+        message.get('SumOfQtyInToPrice'),
+    ))
+
+
+def _market_status(message):
+    """Build a `MarketStatus` from a decoded 1507 message."""
+    return tuple.__new__(MarketStatus, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        message.get('SecurityType'),
+        message.get('TradingSession'),
+        message.get('MarketType'),
+        message.get('message') or message.get('Message'),
+    ))
+
+
+def _open_interest(message):
+    """Build an `OpenInterest` from a decoded 1510 message."""
+    return tuple.__new__(OpenInterest, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        message.get('XMarketType'),
+        message.get('OpenInterest'),
+    ))
+
+
+def _ltp(message):
+    """Build an `LTP` from a decoded 1512 message."""
+    quantity = message.get('LastTradedQunatity')
+    return tuple.__new__(LTP, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        message.get('LastTradedPrice'),
+        quantity if quantity is not None else message.get('LastTradedQuantity'),
+        message.get('LastTradedTime'),
+        message.get('LastUpdateTime'),
+    ))
+
+
+_PROPERTY_FIELDS = ('ExchangeSegment', 'ExchangeInstrumentID', 'PriceBand', 'HighPriceBand', 'LowPriceBand',
+                    'FreezeQty', 'FreezeQuantity', 'TickSize', 'LotSize', 'Status')
+
+
+def _instrument_property_change(message):
+    """Build an `InstrumentPropertyChange` from a decoded 1105 message."""
+    band = message.get('PriceBand') or {}
+    freeze = message.get('FreezeQty')
+    properties = {key: value for key, value in message.items() if key not in _PROPERTY_FIELDS}
+    return tuple.__new__(InstrumentPropertyChange, (
+        message.get('ExchangeSegment'),
+        message.get('ExchangeInstrumentID'),
+        band.get('High', message.get('HighPriceBand')),
+        band.get('Low', message.get('LowPriceBand')),
+        freeze if freeze is not None else message.get('FreezeQuantity'),
+        message.get('TickSize'),
+        message.get('LotSize'),
+        message.get('Status'),
+        properties or None,
+    ))
+
+
+RECORDS = {
+    1501: Touchline,
+    1502: MarketDepth,
+    1505: Candle,
+    1507: MarketStatus,
+    1510: OpenInterest,
+    1512: LTP,
+    1105: InstrumentPropertyChange,
+}
+
+PARTIAL_PARSERS = {
+    1501: PartialParser(Touchline).parse,
+    1502: PartialParser(MarketDepth, depth=True).parse,
+    1505: PartialParser(Candle).parse,
+    1510: PartialParser(OpenInterest).parse,
+    1512: PartialParser(LTP).parse,
+    1105: PartialParser(InstrumentPropertyChange).parse,
+}
+
+
+def decode_partial(eventCode, message):
+    """
+    Decode a partial broadcast message into its record.
+
+    Args:
+        eventCode (int): The event code of the message, e.g. 1501.
+        message (str): The raw partial message.
+
+    Returns:
+        The decoded record, e.g. a `Touchline` for 1501.
+    """
+    return PARTIAL_PARSERS[eventCode](message)
+
+
+FULL_DECODERS = {
+    1501: _touchline,
+    1502: _market_depth,
+    1505: _candle,
+    1507: _market_status,
+    1510: _open_interest,
+    1512: _ltp,
+    1105: _instrument_property_change,
+}
+
+
+def decode_full(eventCode, message):
+    """
+    Decode a full JSON broadcast message into its record.
+
+    Args:
+        eventCode (int): The event code of the message, e.g. 1501.
+        message (str, bytes or dict): The raw JSON message, or an already decoded one.
+
+    Returns:
+        The decoded record, e.g. a `Touchline` for 1501.
+    """
+    if not isinstance(message, dict):
+        message = _loads(message)
+    return FULL_DECODERS[eventCode](message)
+
+
+def record_fields(record):
+    """
+    The fields of a record as plain tuples, the form `marshal` can store.
+
+    Args:
+        record: A `utradeconnect.ticks` record, e.g. a `Touchline`.
+
+    Returns:
+        tuple: The field values, with the nested touchline of a 1502 record as a plain tuple.
+    """
+    if record.eventCode == 1502 and record.touchline is not None:
+        record = record._replace(touchline=tuple(record.touchline))
+    return tuple(record)
+
+
+def record_from_fields(eventCode, fields):
+    """
+    Rebuild a record from the output of `record_fields`.
+
+    Args:
+        eventCode (int): The event code of the record, e.g. 1501.
+        fields (tuple): The field values.
+
+    Returns:
+        The record, e.g. a `Touchline` for 1501.
+    """
+    record = tuple.__new__(RECORDS[eventCode], fields)
+    if eventCode == 1502 and record.touchline is not None:
+        record = record._replace(touchline=tuple.__new__(Touchline, record.touchline))
+    return record
+
+
+def decode_event(event, message):
+    """
+    Decode a message received on a market data socket event.
+
+    Args:
+        event (str): The socket event name, e.g. '1501-json-full' or '1502-json-partial'.
+        message (str): The raw message.
+
+    Returns:
+        The decoded record.
+    """
+    eventCode = int(event[:4])
+    if event.endswith('partial'):
+        return PARTIAL_PARSERS[eventCode](message)
+    return decode_full(eventCode, message)
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from utradeconnect.asyncIndex import AsyncUtradeConnect
+from utradeconnect.exception import UtradeGeneralException, UtradeNetworkException
+from utradeconnect.index import UtradeConnect
+
+
+class FakeResponse:
+    def __init__(self, body, status=200, headers=None):
+        self.status = status
+        self.headers = dict({'content-type': 'application/json'}, **(headers or {}))
+        self._body = json.dumps(body).encode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self):
+        return self._body
+
+
+class FakeSession:
+    """Stands in for aiohttp.ClientSession, answering requests from a list of responses."""
+
+    closed = False
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        self.requests.append({'method': method, 'url': url, 'data': data, 'params': params, 'headers': headers})
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def close(self):
+        self.closed = True
+
+
+def async_client(session, **options):
+    client = AsyncUtradeConnect('key', 'secret', 'WEBAPI', root='http://127.0.0.1:1/', **options)
+    client.apiRequest.reqsession = session
+    return client
+
+
+LOGIN = {'type': 'success', 'result': {'token': 'abc', 'userID': 'U1', 'isInvestorClient': True}}
+OK = {'type': 'success', 'result': {'AppOrderID': 7}}
+ORDER = ('NSECM', 22, 'MIS', 'LIMIT', 'BUY', 'DAY', 0, 10, 101.5, 0, 'tag-1')
+
+
+def test_login_and_order_go_through_the_session():
+    session = FakeSession(FakeResponse(LOGIN), FakeResponse(OK))
+    client = async_client(session)
+
+    async def run():
+        await client.interactive_login()
+        return await client.place_order(*ORDER)
+
+    assert asyncio.run(run()) == OK
+    login, order = session.requests
+    assert login['method'] == 'POST' and login['url'].endswith('/api/V2/accounts/login/')
+    assert client.token == 'abc' and client.isInvestorClient is True
+    assert order['headers']['Authorization'] == 'abc'
+    assert json.loads(order['data'])['orderUniqueIdentifier'] == 'tag-1'
+    # Investor clients send no clientID
+    assert 'clientID' not in json.loads(order['data'])
+
+
+def test_sync_and_async_clients_build_the_same_requests():
+    sent = []
+
+    def record(route, method, params=None, priority=None):
+        sent.append((route, method, params))
+        return OK
+
+    sync = UtradeConnect('key', 'secret', 'WEBAPI', root='http://127.0.0.1:1/')
+    sync.apiRequest._request = record
+    sync.isInvestorClient = False
+    sync.place_order(*ORDER, clientID='C1')
+    sync.get_ohlc(1, 22, 'Jan 01 2024 091500', 'Jan 01 2024 153000', 60)
+    sync.apiRequest.close()
+
+    session = FakeSession(FakeResponse(OK))
+    client = async_client(session)
+    client.isInvestorClient = False
+
+    async def run():
+        await client.place_order(*ORDER, clientID='C1')
+        await client.get_ohlc(1, 22, 'Jan 01 2024 091500', 'Jan 01 2024 153000', 60)
+
+    asyncio.run(run())
+    (_, _, order), (_, _, ohlc) = sent
+    assert json.loads(session.requests[0]['data']) == json.loads(order)
+    assert session.requests[1]['params'] == {key: str(value) for key, value in ohlc.items()}
+
+
+def test_transport_errors_become_the_method_error():
+    client = async_client(FakeSession(ConnectionError('reset')))
+    with pytest.raises(UtradeGeneralException, match='Get order book failed'):
+        asyncio.run(client.get_order_book())
+    with pytest.raises(UtradeGeneralException, match='Error while retrieving quotes: reset'):
+        asyncio.run(client.get_quote([{'exchangeSegment': 1, 'exchangeInstrumentID': 22}], 1501, 'JSON'))
+
+
+def test_429_is_retried_after_retry_after():
+    session = FakeSession(FakeResponse({}, status=429, headers={'Retry-After': '0'}), FakeResponse(OK))
+    client = async_client(session, rate_limits=True)
+    assert asyncio.run(client.get_series(1)) == OK
+    assert len(session.requests) == 2
+    assert client.get_rate_limit_stats()['market']['throttled'] == 1
+
+
+def test_429_fails_after_the_retries():
+    client = async_client(FakeSession(FakeResponse({}, status=429, headers={'Retry-After': '0'})))
+    client.apiRequest.throttle_retries = 1
+    with pytest.raises(UtradeNetworkException, match='Rate limited'):
+        asyncio.run(client.apiRequest._get('market.instruments.instrument.series', {'exchangeSegment': 1}))
+
+
+def test_rate_limits_pace_concurrent_requests():
+    session = FakeSession(FakeResponse(OK))
+    client = async_client(session, rate_limits={'market': {'rate': 20, 'burst': 1}})
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(client.get_series(1) for _ in range(4)))
+        return time.monotonic() - start
+
+    # One request from the burst, then one every 50 ms
+    assert asyncio.run(run()) >= 0.14
+    stats = client.get_rate_limit_stats()['market']
+    assert stats['requests'] == 4 and stats['queued'] == 3
+
+
+def test_combined_client_shares_one_transport(monkeypatch):
+    from utradeconnect import base
+    created = []
+
+    class CountingRequest(base.AsyncAPIRequest):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(base, 'AsyncAPIRequest', CountingRequest)
+    client = AsyncUtradeConnect('key', 'secret', 'WEBAPI', root='http://127.0.0.1:1/')
+    assert created == [client.apiRequest]
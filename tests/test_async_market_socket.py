@@ -0,0 +1,16 @@
+import asyncio
+
+from utradeconnect.asyncMarketSocket import AsyncMDSocket_io
+
+
+def test_iteration_ends_after_the_connection_is_closed():
+    async def run():
+        socket = AsyncMDSocket_io('token', 'user', base_url='http://127.0.0.1:1', reconnection=False)
+        socket._make_handler('1501-json-full')('tick-1')
+        socket._make_handler('1501-json-full')('tick-2')
+        await socket._on_disconnect()
+        received = [data async for _, data in socket]
+        assert await socket.get() is None
+        return received
+
+    assert asyncio.run(run()) == ['tick-1', 'tick-2']
@@ -0,0 +1,127 @@
+from utradeconnect.barBuilder import BarBuilder
+from utradeconnect.ticks import LTP, Candle, OpenInterest, Touchline
+
+
+def touchline(price, tradeTime, volume=None):
+    return Touchline(1, 22, lastTradedPrice=price, lastTradedTime=tradeTime, totalTradedQuantity=volume)
+
+
+def ltp(price, tradeTime, quantity):
+    return LTP(1, 22, lastTradedPrice=price, lastTradedTime=tradeTime, lastTradedQuantity=quantity)
+
+
+def builder(**options):
+    bars = []
+    return BarBuilder(60, on_bar=bars.append, clock=lambda: 0, **options), bars
+
+
+def test_a_trade_in_the_next_interval_closes_the_bar():
+    bars_builder, bars = builder()
+    for price, tradeTime in ((10, 600), (12, 610), (9, 620), (11, 659)):
+        bars_builder.update(touchline(price, tradeTime))
+    assert bars == []
+    assert bars_builder.forming(1, 22)[2:9] == (600, 10, 12, 9, 11, 0, 0)
+
+    bars_builder.update(touchline(13, 665))
+    [bar] = bars
+    assert (bar.barTime, bar.open, bar.high, bar.low, bar.close, bar.ticks) == (600, 10, 12, 9, 11, 4)
+    assert bars_builder.forming(1, 22).barTime == 660
+    assert bars_builder.get(1, 22)[-1] == bar
+
+
+def test_ticks_of_closed_bars_are_counted_late():
+    bars_builder, bars = builder()
+    bars_builder.update(touchline(10, 600))
+    bars_builder.update(touchline(11, 665))
+    bars_builder.update(touchline(99, 650))
+    assert bars_builder.late == 1
+    assert bars[0].high == 10 and bars_builder.forming(1, 22).high == 11
+
+    # Also after close_due, when no bar is forming
+    bars_builder.close_due(720)
+    bars_builder.update(touchline(99, 700))
+    assert bars_builder.late == 2
+    assert len(bars) == 2 and bars_builder.forming(1, 22) is None
+
+
+def test_1501_volume_is_the_cumulative_quantity_delta():
+    bars_builder, bars = builder()
+    bars_builder.update(touchline(10, 600, volume=1000))
+    bars_builder.update(touchline(10, 610, volume=1040))
+    # A missed tick does not lose volume, the next cumulative quantity covers it
+    bars_builder.update(touchline(10, 620, volume=1100))
+    # 1512 quantities are already part of the 1501 cumulative quantity
+    bars_builder.update(ltp(10, 630, 500))
+    bars_builder.update(touchline(10, 660, volume=1130))
+    assert bars[0].volume == 100
+    assert bars_builder.forming(1, 22).volume == 30
+
+
+def test_1512_only_instruments_add_up_last_traded_quantities():
+    bars_builder, bars = builder()
+    for tradeTime, quantity in ((600, 5), (610, 7), (620, 3), (660, 4)):
+        bars_builder.update(ltp(10, tradeTime, quantity))
+    assert bars[0].volume == 15
+    assert bars_builder.forming(1, 22).volume == 4
+
+
+def test_candle_of_a_closed_bar_replaces_it():
+    bars_builder, bars = builder()
+    bars_builder.update(touchline(10, 600))
+    bars_builder.update(OpenInterest(1, 22, openInterest=70))
+    bars_builder.update(touchline(11, 665))
+    bars_builder.update(Candle(1, 22, barTime=600, barVolume=42, open=10, high=10.5, low=9.5, close=10.25))
+    closed, reconciled = bars
+    assert not closed.reconciled
+    assert reconciled.reconciled and (reconciled.low, reconciled.close, reconciled.volume) == (9.5, 10.25, 42)
+    # The open interest the candle does not carry is kept
+    assert reconciled.openInterest == 70
+    assert bars_builder.get(1, 22)[-1] == reconciled and bars_builder.reconciled == 1
+
+
+def test_candle_of_the_forming_bar_is_applied_when_it_closes():
+    bars_builder, bars = builder()
+    bars_builder.update(touchline(10, 600))
+    bars_builder.update(Candle(1, 22, barTime=600, barVolume=42, open=10, high=10.5, low=9.5, close=10.25))
+    assert bars == [] and bars_builder.forming(1, 22).low == 10
+    bars_builder.update(touchline(11, 610))
+    bars_builder.update(touchline(12, 660))
+    [bar] = bars
+    assert bar.reconciled and (bar.high, bar.volume, bar.ticks) == (10.5, 42, 2)
+    assert bars_builder._pendingCandles == {}
+
+
+def test_candles_of_other_intervals_or_unknown_bars_are_ignored():
+    bars_builder, bars = builder(candle_interval=300)
+    bars_builder.update(touchline(10, 600))
+    assert not bars_builder.reconcile(Candle(1, 22, barTime=600, open=1, high=1, low=1, close=1))
+
+    bars_builder, bars = builder(candle_time='end')
+    bars_builder.update(touchline(10, 600))
+    bars_builder.update(touchline(11, 665))
+    # A candle ending at 660 is the bar starting at 600
+    assert bars_builder.reconcile(Candle(1, 22, barTime=660, open=1, high=1, low=1, close=1))
+    assert not bars_builder.reconcile(Candle(1, 22, barTime=60, open=1, high=1, low=1, close=1))
+
+
+def test_close_due_closes_bars_once_their_interval_ended():
+    bars_builder, bars = builder()
+    bars_builder.update(touchline(10, 600))
+    bars_builder.update(Touchline(1, 23, lastTradedPrice=5, lastTradedTime=665))
+    assert bars_builder.close_due(659) == []
+    [bar] = bars_builder.close_due(660)
+    assert bar.exchangeInstrumentID == 22 and bars == [bar]
+    assert bars_builder.forming(1, 22) is None and bars_builder.forming(1, 23) is not None
+    # Nothing left to close for the instrument until it trades again
+    assert [bar.exchangeInstrumentID for bar in bars_builder.close_due(10000)] == [23]
+
+
+def test_close_due_drops_candles_of_bars_that_never_formed():
+    bars_builder, bars = builder()
+    bars_builder.update(touchline(10, 600))
+    bars_builder.reconcile(Candle(1, 22, barTime=660, open=1, high=1, low=1, close=1))
+    bars_builder.close_due(700)
+    assert list(bars_builder._pendingCandles) == [(1, 22, 660)]
+    bars_builder.close_due(720)
+    assert bars_builder._pendingCandles == {}
+    assert [bar.reconciled for bar in bars] == [False]
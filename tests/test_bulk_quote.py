@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utradeconnect.asyncMarket import AsyncUtradeMarketConnect
+from utradeconnect.bulkQuote import QUOTE_CHUNK_SIZE
+from utradeconnect.exception import UtradeGeneralException, UtradeInputException
+from utradeconnect.market import UtradeMarketConnect
+
+
+class FakeClient:
+    def get_quote(self, instruments, eventCode, publishFormat):
+        raise AssertionError('no request expected')
+
+
+def test_binary_bulk_quotes_are_rejected_before_any_request():
+    instruments = [{'exchangeSegment': 1, 'exchangeInstrumentID': 22}]
+    with pytest.raises(UtradeInputException, match='publishFormat'):
+        UtradeMarketConnect.get_bulk_quote(FakeClient(), instruments, 1501, publishFormat='Binary')
+
+
+def quote(instrument):
+    return json.dumps({'ExchangeSegment': instrument['exchangeSegment'],
+                       'ExchangeInstrumentID': instrument['exchangeInstrumentID'],
+                       'Touchline': {'LastTradedPrice': int(instrument['exchangeInstrumentID']) / 10}})
+
+
+class QuoteClient:
+    """Answers every chunk with its quotes in reverse order, the later chunks first."""
+
+    apiRequest = SimpleNamespace(pool={'pool_maxsize': 4})
+
+    def __init__(self, failing=(), error_response=()):
+        self.failing = failing
+        self.error_response = error_response
+        self.chunks = []
+        self.lock = threading.Lock()
+
+    def get_quote(self, instruments, eventCode, publishFormat):
+        with self.lock:
+            self.chunks.append([instrument['exchangeInstrumentID'] for instrument in instruments])
+        first = int(instruments[0]['exchangeInstrumentID'])
+        # Earlier chunks answer later, so responses complete out of request order
+        time.sleep(0.02 / (1 + first // QUOTE_CHUNK_SIZE))
+        if first in self.failing:
+            raise UtradeGeneralException('Error while retrieving quotes: timeout')
+        if first in self.error_response:
+            return {'type': 'error', 'description': 'Invalid instrument'}
+        return {'type': 'success', 'result': {'listQuotes': [quote(instrument) for instrument in reversed(instruments)],
+                                              'quotesList': instruments}}
+
+
+def instruments(count):
+    return [{'exchangeSegment': 'NSECM' if instrumentId % 2 else 1, 'exchangeInstrumentID': instrumentId}
+            for instrumentId in range(count)]
+
+
+def prices(response):
+    return [json.loads(quote)['Touchline']['LastTradedPrice'] if quote else None
+            for quote in response['result']['listQuotes']]
+
+
+def test_quotes_are_chunked_and_matched_back_in_input_order():
+    client = QuoteClient()
+    requested = instruments(2 * QUOTE_CHUNK_SIZE + 7)
+    response = UtradeMarketConnect.get_bulk_quote(client, requested, 1501)
+    assert sorted(map(len, client.chunks)) == [7, QUOTE_CHUNK_SIZE, QUOTE_CHUNK_SIZE]
+    assert response['type'] == 'success'
+    assert prices(response) == [instrumentId / 10 for instrumentId in range(len(requested))]
+    assert response['result']['quotesList'] is requested
+    assert [chunk['size'] for chunk in response['chunks']] == [QUOTE_CHUNK_SIZE, QUOTE_CHUNK_SIZE, 7]
+    assert all(chunk['latency'] > 0 and chunk['error'] is None for chunk in response['chunks'])
+
+
+def test_repeated_instruments_all_get_their_quote():
+    requested = instruments(3) + [{'exchangeSegment': 'nsecm', 'exchangeInstrumentID': '1'}]
+    response = UtradeMarketConnect.get_bulk_quote(QuoteClient(), requested, 1501, chunk_size=2, max_workers=1)
+    assert prices(response) == [0.0, 0.1, 0.2, 0.1]
+    assert UtradeMarketConnect.get_bulk_quote(QuoteClient(), [], 1501)['result']['listQuotes'] == []
+
+
+def test_failed_chunks_leave_gaps_or_raise():
+    requested = instruments(3 * QUOTE_CHUNK_SIZE)
+    client = QuoteClient(failing=(QUOTE_CHUNK_SIZE,), error_response=(2 * QUOTE_CHUNK_SIZE,))
+    response = UtradeMarketConnect.get_bulk_quote(client, requested, 1501, raise_errors=False)
+    assert response['type'] == 'partial'
+    values = prices(response)
+    assert values[:QUOTE_CHUNK_SIZE] == [instrumentId / 10 for instrumentId in range(QUOTE_CHUNK_SIZE)]
+    assert values[QUOTE_CHUNK_SIZE:] == [None] * 2 * QUOTE_CHUNK_SIZE
+    assert [chunk['error'] for chunk in response['chunks']] == [
+        None, 'Error while retrieving quotes: timeout', 'Invalid instrument']
+
+    with pytest.raises(UtradeGeneralException, match='2 of 3 chunks failed'):
+        UtradeMarketConnect.get_bulk_quote(client, requested, 1501)
+
+
+def test_async_bulk_quotes_match_the_sync_ones():
+    sync = QuoteClient(failing=(QUOTE_CHUNK_SIZE,))
+
+    class AsyncQuoteClient:
+        async def get_quote(self, instruments, eventCode, publishFormat):
+            await asyncio.sleep(0)
+            return sync.get_quote(instruments, eventCode, publishFormat)
+
+    requested = instruments(2 * QUOTE_CHUNK_SIZE + 1)
+    response = asyncio.run(AsyncUtradeMarketConnect.get_bulk_quote(AsyncQuoteClient(), requested, 1501,
+                                                                   raise_errors=False))
+    assert response == dict(UtradeMarketConnect.get_bulk_quote(sync, requested, 1501, raise_errors=False),
+                            chunks=response['chunks'])
+    assert [chunk['error'] is None for chunk in response['chunks']] == [True, False, True]
@@ -0,0 +1,128 @@
+import time
+
+from utradeconnect.conflation import TickConflator, merge_partial
+from utradeconnect.marketSocket import MDSocket_io
+from utradeconnect.ticks import decode_full, decode_partial
+
+
+def conflating_socket(decode=False):
+    return MDSocket_io('token', 'user', base_url='http://127.0.0.1:1', conflate=True, decode=decode)
+
+
+def test_partial_messages_are_merged_not_replaced():
+    socket = conflating_socket()
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:10,bi:0|5|9.5|1,ai:0|7|10.5|2')
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:11')
+    batch = socket.drain()
+    assert batch.conflated == 1
+    [(event, message)] = batch.ticks
+    record = decode_partial(1501, message)
+    assert record.lastTradedPrice == 11.0
+    assert (record.bidPrice, record.bidSize) == (9.5, 5)
+    assert (record.askPrice, record.askSize) == (10.5, 7)
+
+
+def test_decoded_partial_records_are_merged():
+    socket = conflating_socket(decode=True)
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:10,v:100,bi:0|5|9.5|1')
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:11')
+    [(_, record)] = socket.drain().ticks
+    assert record.lastTradedPrice == 11.0
+    assert record.totalTradedQuantity == 100
+    assert record.bidPrice == 9.5
+
+
+def test_partial_depth_levels_are_kept_in_order():
+    older = decode_partial(1502, 't:2_5,bi:0|5|9.5|1,ai:0|3|10|1')
+    newer = decode_partial(1502, 't:2_5,bi:1|6|9.4|2')
+    merged = merge_partial(1502, older, newer)
+    assert merged.bidLevels == (0, 1)
+    assert merged.bidPrices == (9.5, 9.4)
+    assert merged.askPrices == (10.0,)
+    message = merge_partial(1502, 't:2_5,bi:0|5|9.5|1', 't:2_5,bi:1|6|9.4|2')
+    assert decode_partial(1502, message).bidLevels == (0, 1)
+
+
+def test_repeated_depth_levels_collapse_to_the_latest():
+    socket = conflating_socket(decode=True)
+    for size in range(1, 200):
+        socket.dispatch_event('1502-json-partial', 't:2_5,bi:0|{}|9.5|1|1|7|9.4|2'.format(size))
+    [(_, record)] = socket.drain().ticks
+    assert record.bidLevels == (0, 1)
+    assert record.bidSizes == (199, 7)
+
+
+def test_repeated_raw_depth_levels_collapse_to_the_latest():
+    message = 't:2_5,bi:0|5|9.5|1'
+    for size in range(6, 100):
+        message = merge_partial(1502, message, 't:2_5,bi:2|{}|9.3|1|0|{}|9.5|1'.format(size, size + 1))
+    record = decode_partial(1502, message)
+    assert record.bidLevels == (0, 2)
+    assert record.bidSizes == (100, 99)
+
+
+def test_newer_levels_update_an_older_full_ladder():
+    older = decode_full(1502, {'ExchangeSegment': 2, 'ExchangeInstrumentID': 5,
+                               'Bids': [{'Size': 5, 'Price': 9.5, 'TotalOrders': 1},
+                                        {'Size': 6, 'Price': 9.4, 'TotalOrders': 1}]})
+    merged = merge_partial(1502, older, decode_partial(1502, 't:2_5,bi:1|8|9.45|3'))
+    assert merged.bidLevels == (0, 1)
+    assert merged.bidPrices == (9.5, 9.45)
+    assert merged.bidOrders == (1, 3)
+
+
+def test_interval_drains_without_a_manual_call():
+    socket = MDSocket_io('token', 'user', base_url='http://127.0.0.1:1', conflate=True, conflate_interval=0.01)
+    delivered = []
+    socket.on_message1501_json_partial = delivered.append
+    socket.start_conflation()
+    try:
+        socket.dispatch_event('1501-json-partial', 't:1_22,ltp:10')
+        socket.dispatch_event('1501-json-partial', 't:1_22,ltp:11')
+        deadline = time.monotonic() + 5
+        while not delivered and time.monotonic() < deadline:
+            time.sleep(0.005)
+    finally:
+        socket.conflator.stop()
+    assert delivered == ['t:1_22,ltp:11']
+
+
+def test_candles_are_not_conflated():
+    socket = conflating_socket()
+    delivered = []
+    socket.on_message1505_json_partial = delivered.append
+    socket.dispatch_event('1505-json-partial', 't:1_22,bt:60,o:10,h:11,l:9,c:10.5,v:100')
+    socket.dispatch_event('1505-json-partial', 't:1_22,bt:120,o:10.5,h:12,l:10,c:11,v:80')
+    assert len(delivered) == 2
+    assert not socket.drain().ticks
+
+
+def test_full_updates_still_replace():
+    conflator = TickConflator()
+    conflator.push((1, 22, 1501), 'first')
+    conflator.push((1, 22, 1501), 'second')
+    assert conflator.drain().ticks == ['second']
+
+
+def buffered_socket():
+    return MDSocket_io('token', 'user', base_url='http://127.0.0.1:1', buffer_size=16, overflow='conflate')
+
+
+def test_ring_buffer_conflation_merges_partial_messages():
+    socket = buffered_socket()
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:10,bi:0|5|9.5|1')
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:11')
+    buffer = socket.dispatcher.buffer
+    assert len(buffer) == 1
+    _, message = buffer.get(timeout=0)
+    record = decode_partial(1501, message)
+    assert (record.lastTradedPrice, record.bidPrice) == (11.0, 9.5)
+
+
+def test_ring_buffer_conflation_skips_unconflated_events():
+    socket = buffered_socket()
+    for _ in range(2):
+        socket.dispatch_event('1507-json-full', '{"ExchangeSegment": 1, "TradingSession": 1}')
+        socket.dispatch_event('1505-json-partial', 't:1_22,bt:60,o:10')
+    assert len(socket.dispatcher.buffer) == 4
+    assert socket.dispatcher.buffer.conflated == 0
@@ -0,0 +1,49 @@
+import math
+
+from utradeconnect.depthBook import ASK, BID, DepthBook
+from utradeconnect.ticks import MarketDepth, decode_partial
+
+
+def test_zero_size_padding_is_not_depth():
+    book = DepthBook(2, 51601, levels=5)
+    book.update(MarketDepth(2, 51601, None, (5, 0, 0), (10.0, 0.0, 0.0), (1, 0, 0), (0, 0), (0.0, 0.0), (0, 0)))
+    assert book.depth == [1, 0]
+    assert book.best_bid() == (10.0, 5)
+    assert book.best_ask() is None
+    assert math.isnan(book.spread())
+    assert math.isnan(book.mid())
+    assert book.total_quantity(ASK) == 0
+
+
+def test_partial_levels_and_totals():
+    book = DepthBook(2, 51601, levels=5)
+    book.update(decode_partial(1502, 't:2_51601,bi:0|10|100|1|1|20|99|2,ai:0|5|101|1'))
+    book.update(decode_partial(1502, 't:2_51601,bi:1|30|99|3'))
+    assert book.ladder(BID) == [(100.0, 10, 1), (99.0, 30, 3)]
+    assert book.total_quantity(BID) == 40
+    assert book.total_quantity(BID, 1) == 10
+    assert book.weighted_price(BID) == (100.0 * 10 + 99.0 * 30) / 40
+    assert book.mid() == 100.5
+
+
+def test_dense_level_numbers_are_decoded():
+    record = decode_partial(1502, 't:2_1,bi:0|1|2.5|1|1|2|2.4|1,ai:3|4|3|1')
+    assert record.bidLevels == (0, 1)
+    assert record.askLevels == (3,)
+    assert record.bidSizes == (1, 2) and record.bidOrders == (1, 1)
+
+
+def test_zero_size_partial_level_empties_only_that_level():
+    book = DepthBook(2, 51601, levels=5)
+    book.update(decode_partial(1502, 't:2_51601,bi:0|10|100|1|1|20|99|2|2|30|98|3'))
+    book.update(decode_partial(1502, 't:2_51601,bi:1|0|99|0'))
+    assert book.depth[BID] == 3
+    assert book.ladder(BID)[0] == (100.0, 10, 1) and book.ladder(BID)[2] == (98.0, 30, 3)
+    assert math.isnan(book.ladder(BID)[1][0])
+    assert book.total_quantity(BID) == 40 and book.total_quantity(BID, 2) == 10
+    assert book.weighted_price(BID) == (100.0 * 10 + 98.0 * 30) / 40
+
+    # Emptying the deepest levels shrinks the depth past the gap
+    book.update(decode_partial(1502, 't:2_51601,bi:2|0|98|0'))
+    assert book.depth[BID] == 1 and book.ladder(BID) == [(100.0, 10, 1)]
+    assert book.total_quantity(BID) == 10
@@ -0,0 +1,90 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from utradeconnect.exception import UtradeDataException, UtradeInputException
+from utradeconnect.instrumentMaster import InstrumentMaster, expiry_key, segment_code
+from utradeconnect.ticks import InstrumentPropertyChange
+
+MASTER = '\n'.join([
+    'NSECM|2885|8|RELIANCE|RELIANCE-EQ|EQ|RELIANCE-EQ|1100100002885|2800|2300|100000|0.05|1|1|RELIANCE|INE002A01018|1|1',
+    'BSECM|500325|8|RELIANCE|RELIANCE-A|A|RELIANCE-A|1200100500325|2800|2300|100000|0.05|1|1|RELIANCE|INE002A01018|1|1',
+])
+
+
+DERIVATIVES = '\n'.join([
+    'NSEFO|35001|1|NIFTY|NIFTY23APRFUT|FUTIDX|NIFTY-FUTIDX|2035001|19000|16000|2800|0.05|50|1|-1|NIFTY|'
+    '2023-04-27T14:30:00|NIFTY 27APR2023|1|1',
+    'NSEFO|40001|2|NIFTY|NIFTY23APR17500CE|OPTIDX|NIFTY-OPTIDX|2040001|500|1|2800|0.05|50|1|-1|NIFTY|'
+    '2023-04-27T14:30:00|17500|3|NIFTY 27APR2023 CE 17500|1|1',
+    'NSEFO|40002|2|NIFTY|NIFTY23APR17500PE|OPTIDX|NIFTY-OPTIDX|2040002|500|1|2800|0.05|50|1|-1|NIFTY|'
+    '2023-04-27T14:30:00|17500|4|NIFTY 27APR2023 PE 17500|1|1',
+    # A futures line as wide as the option lines
+    'NSEFO|35002|1|NIFTY|NIFTY23MAYFUT|FUTIDX|NIFTY-FUTIDX|2035002|19000|16000|2800|0.05|50|1|-1|NIFTY|'
+    '2023-05-25T14:30:00|NIFTY 25MAY2023|1|1||',
+    'NSEFO|40003|2|NIFTY|NIFTY23MAY17500CE|OPTIDX|NIFTY-OPTIDX|2040003|500|1|2800|0.05|50|1|-1|NIFTY|'
+    '2023-05-25T14:30:00|17500|CE|NIFTY 25MAY2023 CE 17500|1|1',
+])
+
+
+def segments(response):
+    return [row['ExchangeSegment'] for row in response['result']]
+
+
+def test_search_ranks_by_liquidity_and_keeps_the_scores():
+    master = InstrumentMaster.from_response(MASTER)
+    assert segments(master.search('reliance'))[0] == 1
+    assert segments(master.search('reliance', liquidity={(11, 500325): 10}))[0] == 11
+    assert segments(master.search('reliance'))[0] == 11
+    assert master.search_index() is master.search_index()
+
+
+def test_lookups_by_id_symbol_and_contract():
+    master = InstrumentMaster.from_response({'type': 'success', 'result': MASTER + '\n\n' + DERIVATIVES})
+    assert len(master) == 7
+    reliance = master.get('NSECM', 2885)
+    assert reliance.symbol == 'RELIANCE-EQ' and reliance.isin == 'INE002A01018' and reliance.expiry is None
+    assert master.get(11, '500325').exchangeSegment == 11
+    assert master.get(1, 1) is None
+
+    call = master.by_symbol('nifty23apr17500ce')
+    assert (call.expiry, call.strikePrice, call.optionType, call.lotSize) == (date(2023, 4, 27), 17500.0, 'CE', 50)
+    assert master.by_symbol('NIFTY 27APR2023 PE 17500').exchangeInstrumentID == 40002
+    for expiry in (date(2023, 4, 27), 20230427, '2023-04-27', '27APR2023'):
+        assert master.option('NIFTY', expiry, 17500, 'CE') == call
+    assert master.option('NIFTY', '2023-04-27', 17500, 4).optionType == 'PE'
+    assert master.future('NIFTY', '25MAY2023').exchangeInstrumentID == 35002
+    assert master.option('NIFTY', '25MAY2023', 17500, 'CE').exchangeInstrumentID == 40003
+    assert master.expiries('NIFTY') == [date(2023, 4, 27), date(2023, 5, 25)]
+    assert master.expiries('NIFTY', options=False) == [date(2023, 4, 27), date(2023, 5, 25)]
+    assert len(master.derivative_rows('NIFTY')) == 5 and master.derivative_rows('RELIANCE') == []
+
+
+def test_numpy_integers_are_accepted():
+    assert segment_code(np.int64(2)) == 2 and type(segment_code(np.int32(2))) is int
+    assert segment_code('nsefo') == segment_code('2') == 2
+    assert expiry_key(np.int64(20230427)) == 20230427
+    with pytest.raises(UtradeInputException):
+        segment_code('NYSE')
+    master = InstrumentMaster.from_response(DERIVATIVES)
+    assert master.get(np.int64(2), np.int64(40001)).symbol == 'NIFTY23APR17500CE'
+    assert master.row_of(np.uint16(2), 35001) is not None
+    assert master.option('NIFTY', '2023-04-27', np.float64(17500), np.int8(3)).exchangeInstrumentID == 40001
+
+
+def test_property_changes_are_applied_in_place():
+    master = InstrumentMaster.from_response(DERIVATIVES)
+    change = InstrumentPropertyChange(np.int64(2), 40001, highPriceBand=600, lotSize=75, status='Suspended')
+    assert master.apply(change)
+    call = master.get(2, 40001)
+    assert (call.highPriceBand, call.lowPriceBand, call.lotSize, call.status) == (600.0, 1.0, 75, 'Suspended')
+    assert master.updates == 1
+    assert not master.apply(InstrumentPropertyChange(2, 1, lotSize=1))
+
+
+def test_malformed_masters_are_rejected():
+    with pytest.raises(UtradeDataException):
+        InstrumentMaster.from_response({'type': 'success', 'result': None})
+    with pytest.raises(UtradeDataException, match='Malformed'):
+        InstrumentMaster.from_response('NSECM|1|8|X')
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from utradeconnect.marketSocket import MDSocket_io
+
+
+class FakeClient:
+    def __init__(self, token):
+        self.token = token
+        self.userID = 'user'
+        self.apiRequest = SimpleNamespace(token=token)
+        self.logins = 0
+
+    def marketdata_login(self):
+        self.logins += 1
+        self.token = self.apiRequest.token = 'market-2'
+        return {'result': {'token': 'market-2', 'userID': 'user'}}
+
+
+def test_relogin_keeps_the_interactive_token_of_a_combined_client(monkeypatch):
+    client = FakeClient('interactive')
+    socket = MDSocket_io('market-1', 'user', base_url='http://127.0.0.1:1', client=client)
+    monkeypatch.setattr(socket, '_separate_login',
+                        lambda: {'result': {'token': 'market-2', 'userID': 'user'}})
+    socket.relogin()
+    assert client.logins == 0
+    assert client.token == client.apiRequest.token == 'interactive'
+    assert socket.token == 'market-2'
+    assert 'market-2' in socket.connection_url
+
+
+def test_relogin_updates_a_market_data_client():
+    client = FakeClient('market-1')
+    socket = MDSocket_io('market-1', 'user', base_url='http://127.0.0.1:1', client=client)
+    socket.relogin()
+    assert client.logins == 1
+    assert client.apiRequest.token == socket.token == 'market-2'
+
+
+def test_failing_listener_does_not_stop_dispatch():
+    socket = MDSocket_io('token', 'user', base_url='http://127.0.0.1:1')
+    seen, delivered = [], []
+
+    def broken(record):
+        raise ValueError('broken listener')
+
+    socket.add_listener(1501, broken)
+    socket.add_listener(1501, seen.append)
+    socket.on_message1501_json_partial = delivered.append
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:10')
+    assert len(seen) == 1 and delivered == ['t:1_22,ltp:10']
+    assert socket.listener_errors == 1
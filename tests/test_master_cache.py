@@ -0,0 +1,42 @@
+import asyncio
+import json
+import sys
+
+from utradeconnect.asyncMarket import AsyncUtradeMarketConnect
+from utradeconnect.instrumentMaster import InstrumentMaster
+from utradeconnect.masterCache import MAGIC, _LENGTH, InstrumentMasterCache, write_master
+
+
+def test_foreign_byte_order_is_stale(tmp_path):
+    cache = InstrumentMasterCache(str(tmp_path))
+    path = cache.path(['NSECM'])
+    write_master(InstrumentMaster(), path)
+    assert cache.is_fresh(path)
+    with open(path, 'rb') as file:
+        data = file.read()
+    length, = _LENGTH.unpack_from(data, len(MAGIC))
+    start = len(MAGIC) + _LENGTH.size
+    header = json.loads(data[start:start + length])
+    header['byteorder'] = 'big' if sys.byteorder == 'little' else 'little'
+    patched = json.dumps(header).encode().ljust(length)
+    with open(path, 'wb') as file:
+        file.write(data[:start] + patched + data[start + length:])
+    assert not cache.is_fresh(path)
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.downloads = 0
+
+    async def get_master(self, exchangeSegmentList):
+        self.downloads += 1
+        return {'result': ''}
+
+
+def test_async_master_goes_through_the_locked_cache(tmp_path):
+    client = FakeAsyncClient()
+    load = AsyncUtradeMarketConnect.get_instrument_master
+    first = asyncio.run(load(client, ['NSECM'], cache_dir=str(tmp_path)))
+    second = asyncio.run(load(client, ['NSECM'], cache_dir=str(tmp_path)))
+    assert client.downloads == 1
+    assert len(first) == len(second) == 0
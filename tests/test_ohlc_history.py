@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.ohlcHistory import OhlcCache, OhlcHistory, epoch_seconds, exchange_now, parse_ohlc
+
+
+def test_exchange_clock_is_ist_whatever_the_host_zone():
+    ist = datetime.now(timezone(timedelta(hours=5, minutes=30))).replace(tzinfo=None)
+    assert abs(exchange_now() - epoch_seconds(ist)) <= 1
+
+
+class FakeConnect:
+    apiRequest = SimpleNamespace(pool={'pool_maxsize': 8})
+
+    def get_ohlc(self, exchangeSegment, exchangeInstrumentID, startTime, endTime, compressionValue):
+        bar = '{}|10|11|9|10.5|100|0|'.format(epoch_seconds(startTime))
+        return {'type': 'success', 'result': {'dataReponse': bar}}
+
+
+def test_parallel_windows_are_all_counted():
+    history = OhlcHistory(FakeConnect(), window_bars=10, max_workers=8)
+    instruments = [{'exchangeSegment': 1, 'exchangeInstrumentID': instrumentId} for instrumentId in range(20)]
+    bars = history.load(instruments, '2023-01-02 09:15:00', '2023-01-02 15:29:00', 60)
+    assert len(bars) == 20
+    assert history.requests == 20 * 38
+    assert history.retried == 0
+
+
+def test_responses_parse_into_typed_columns():
+    bars = parse_ohlc({'result': {'dataReponse': '1672650900|10|11|9|10.5|100|7|,1672650960|10.5|12|10|11|250|8|'}})
+    assert bars['timestamp'].dtype == np.int64 and bars['volume'].dtype == np.int64
+    assert bars['timestamp'].tolist() == [1672650900, 1672650960]
+    assert bars['high'].tolist() == [11.0, 12.0] and bars['openInterest'].tolist() == [7, 8]
+    assert all(column.flags['C_CONTIGUOUS'] for column in bars.values())
+    # Empty fields take the bar by bar path and read as 0
+    ragged = parse_ohlc({'result': {'dataReponse': '1672650900|10|11|9|10.5||,1672650960|10.5|12|10|11|250|8|'}})
+    assert ragged['volume'].tolist() == [0, 250] and ragged['openInterest'].tolist() == [0, 8]
+    assert len(parse_ohlc({'result': {'dataReponse': ''}})['timestamp']) == 0
+    assert len(parse_ohlc({'type': 'success', 'result': None})['close']) == 0
+
+
+class RecordingConnect(FakeConnect):
+    """Answers with one bar per compression interval of the requested range."""
+
+    def __init__(self):
+        self.windows = []
+
+    def get_ohlc(self, exchangeSegment, exchangeInstrumentID, startTime, endTime, compressionValue):
+        start, end = epoch_seconds(startTime), epoch_seconds(endTime)
+        self.windows.append((exchangeInstrumentID, start, end, compressionValue))
+        bars = ['{}|{}|{}|{}|{}|1|{}|'.format(stamp, stamp % 1000, stamp % 1000 + 0.5, stamp % 1000 - 0.5,
+                                             stamp % 1000 + 0.25, stamp % 1000)
+                for stamp in range(start - start % compressionValue, end + 1, compressionValue) if stamp >= start]
+        return {'type': 'success', 'result': {'dataReponse': ','.join(bars)}}
+
+
+def test_cached_ranges_are_not_downloaded_again(tmp_path):
+    connect = RecordingConnect()
+    instruments = [{'exchangeSegment': 'NSECM', 'exchangeInstrumentID': 22}]
+    history = OhlcHistory(connect, cache_dir=str(tmp_path), window_bars=60, max_workers=1)
+    first = history.load(instruments, '2023-01-02 10:00:00', '2023-01-02 11:59:00', 60)[(1, 22)]
+    assert len(first['timestamp']) == 120 and len(connect.windows) == 2
+
+    # A fresh loader reads the cache, only the part before the cached range is downloaded
+    history = OhlcHistory(connect, cache_dir=str(tmp_path), window_bars=60, max_workers=1)
+    bars = history.load(instruments, '2023-01-02 09:30:00', '2023-01-02 11:00:00', 60)[(1, 22)]
+    assert connect.windows[2:] == [(22, epoch_seconds('2023-01-02 09:30:00'), epoch_seconds('2023-01-02 10:00:00'), 60)]
+    assert len(bars['timestamp']) == 91 and np.all(np.diff(bars['timestamp']) == 60)
+    assert history.load(instruments, '2023-01-02 09:45:00', '2023-01-02 11:30:00', 60)[(1, 22)]['timestamp'][0] == \
+        epoch_seconds('2023-01-02 09:45:00')
+    assert len(connect.windows) == 3
+
+    _, coverage = OhlcCache(str(tmp_path)).load(1, 22, 60)
+    assert coverage == [(epoch_seconds('2023-01-02 09:30:00'), epoch_seconds('2023-01-02 11:59:00'))]
+
+
+def test_the_forming_bar_is_not_cached(tmp_path):
+    connect = RecordingConnect()
+    instruments = [{'exchangeSegment': 1, 'exchangeInstrumentID': 22}]
+    history = OhlcHistory(connect, cache_dir=str(tmp_path), max_workers=1)
+    now = exchange_now()
+    history.load(instruments, now - 600, now + 60, 60)
+    history.load(instruments, now - 600, now + 60, 60)
+    # The settled part is cached, the range from the forming bar on is downloaded again
+    assert len(connect.windows) == 2 and connect.windows[1][1] >= now - 60
+
+
+def test_compressions_are_resampled_from_one_download():
+    connect = RecordingConnect()
+    instruments = [{'exchangeSegment': 1, 'exchangeInstrumentID': 22}]
+    history = OhlcHistory(connect, window_bars=1000, max_workers=1)
+    compressions = history.load_compressions(instruments, '2023-01-02 09:17:00', '2023-01-02 10:20:00', [3600, 60, 300])
+    # One download of the base bars, widened to whole hourly bars aligned to the session start
+    assert connect.windows == [(22, epoch_seconds('2023-01-02 09:15:00'), epoch_seconds('2023-01-02 11:14:00'), 60)]
+
+    minutes = compressions[60][(1, 22)]
+    assert len(minutes['timestamp']) == 64 and minutes['timestamp'][0] == epoch_seconds('2023-01-02 09:17:00')
+
+    five = compressions[300][(1, 22)]
+    assert five['timestamp'][0] == epoch_seconds('2023-01-02 09:15:00') and len(five['timestamp']) == 14
+    # The first five minute bar is built from the 09:15 to 09:19 minutes before the range start
+    base = history.load(instruments, '2023-01-02 09:15:00', '2023-01-02 09:19:00', 60)[(1, 22)]
+    assert len(base['timestamp']) == 5
+    assert (five['open'][0], five['high'][0], five['low'][0], five['close'][0]) == (
+        base['open'][0], base['high'].max(), base['low'].min(), base['close'][-1])
+    assert five['volume'][0] == 5 and five['openInterest'][0] == base['openInterest'][-1]
+
+    hours = compressions[3600][(1, 22)]
+    assert hours['timestamp'].tolist() == [epoch_seconds('2023-01-02 09:15:00'), epoch_seconds('2023-01-02 10:15:00')]
+    assert hours['volume'].tolist() == [60, 60]
+
+
+def test_resampling_through_load_and_its_errors():
+    connect = RecordingConnect()
+    instruments = [{'exchangeSegment': 1, 'exchangeInstrumentID': 22}]
+    history = OhlcHistory(connect, window_bars=1000, max_workers=1)
+    bars = history.load(instruments, '2023-01-02 09:15:00', '2023-01-02 09:59:00', 900, base_compression=300)[(1, 22)]
+    assert bars['volume'].tolist() == [3, 3, 3] and connect.windows[0][3] == 300
+    with pytest.raises(UtradeInputException):
+        history.load_compressions(instruments, '2023-01-02 09:15:00', '2023-01-02 09:59:00', [60, 90])
+    with pytest.raises(UtradeInputException):
+        history.load_compressions(instruments, '2023-01-02 10:00:00', '2023-01-02 09:59:00', [60])
+    assert history.load_compressions(instruments, '2023-01-02 09:15:00', '2023-01-02 09:59:00', []) == {}
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.instrumentMaster import InstrumentMaster
+from utradeconnect.marketSocket import MDSocket_io
+from utradeconnect.optionChain import CALL, PUT
+from utradeconnect.ticks import Candle, LTP
+
+
+def option(segment, instrumentId, expiry, strike, optionType):
+    return '{}|{}|2|NIFTY|NIFTY{}{}|OPTIDX|NIFTY-OPTIDX|{}|500|1|2800|0.05|{}|1|-1|NIFTY|{}T14:30:00|{}|{}|NIFTY|1|1'.format(
+        segment, instrumentId, strike, optionType, instrumentId, 25 if segment == 'BSEFO' else 50, expiry, strike,
+        optionType)
+
+
+MASTER = '\n'.join([
+    option('NSEFO', 101, '2023-04-27', 17600, 'CE'),
+    option('NSEFO', 102, '2023-04-27', 17400, 'PE'),
+    option('NSEFO', 103, '2023-04-27', 17400, 'CE'),
+    option('NSEFO', 104, '2023-04-27', 17500, 'PE'),
+    option('NSEFO', 105, '2023-04-27', 17500, 'CE'),
+    option('NSEFO', 201, '2023-05-25', 17500, 'CE'),
+    option('BSEFO', 301, '2023-04-27', 17500, 'CE'),
+    'NSEFO|401|1|NIFTY|NIFTY23APRFUT|FUTIDX|NIFTY-FUTIDX|401|19000|16000|2800|0.05|50|1|-1|NIFTY|'
+    '2023-04-27T14:30:00|NIFTY|1|1',
+])
+
+
+@pytest.fixture
+def master():
+    return InstrumentMaster.from_response(MASTER)
+
+
+def test_chain_is_laid_out_by_strike_and_side(master):
+    chain = master.option_chain('NIFTY', '27APR2023')
+    assert chain.exchangeSegment == 2
+    assert chain.strikes.tolist() == [17400, 17500, 17600]
+    assert chain.exchangeInstrumentID.tolist() == [[103, 102], [105, 104], [101, -1]]
+    assert chain.lotSize[:, CALL].tolist() == [50, 50, 50] and chain.lotSize[2, PUT] == 0
+    assert np.isnan(chain.lastTradedPrice).all() and not chain.openInterest.any()
+    assert sorted(instrument['exchangeInstrumentID'] for instrument in chain.instruments()) == [101, 102, 103, 104, 105]
+
+
+def test_segment_and_expiry_select_the_contracts(master):
+    chain = master.option_chain('NIFTY', 20230427, exchangeSegment='BSEFO')
+    assert chain.exchangeInstrumentID.tolist() == [[301, -1]] and chain.lotSize[0, CALL] == 25
+    assert master.option_chain('NIFTY', '2023-05-25').exchangeInstrumentID.tolist() == [[201, -1]]
+    with pytest.raises(UtradeInputException):
+        master.option_chain('NIFTY', '2023-06-29')
+    with pytest.raises(UtradeInputException):
+        master.option_chain('BANKNIFTY', '2023-04-27')
+
+
+def test_strike_lookups(master):
+    chain = master.option_chain('NIFTY', '2023-04-27')
+    assert chain.strike_index(17500) == 1 and chain.strike_index(17550) is None
+    assert chain.strike_index(99999) is None
+    assert chain.atm_index(17540) == 1 and chain.atm_index(20000) == 2
+
+
+def test_ticks_update_the_chain_in_place(master):
+    chain = master.option_chain('NIFTY', '2023-04-27')
+    socket = MDSocket_io('token', 'user', base_url='http://127.0.0.1:1')
+    chain.attach(socket)
+    socket.dispatch_event('1501-json-partial', 't:2_104,ltp:85.5,ltq:50,v:1000,lut:7,bi:0|50|85|1,ai:0|50|86|2')
+    socket.dispatch_event('1510-json-partial', 't:2_104,oi:125000')
+    socket.dispatch_event('1512-json-partial', 't:2_101,ltp:12.5')
+    # Other instruments and events leave the chain alone
+    socket.dispatch_event('1512-json-partial', 't:2_201,ltp:99')
+    assert not chain.update(Candle(2, 104, open=1))
+    assert not chain.update(LTP(1, 104, 1.0))
+
+    row = chain.strike_index(17500)
+    assert (chain.lastTradedPrice[row, PUT], chain.bidPrice[row, PUT], chain.askPrice[row, PUT]) == (85.5, 85, 86)
+    assert (chain.totalTradedQuantity[row, PUT], chain.openInterest[row, PUT], chain.lastUpdateTime[row, PUT]) == (1000, 125000, 7)
+    assert chain.lastTradedPrice[2, CALL] == 12.5
+    assert np.isnan(chain.lastTradedPrice[row, CALL])
+    assert chain.updates == 3
+
+    chain.detach(socket)
+    socket.dispatch_event('1512-json-partial', 't:2_101,ltp:13')
+    assert chain.lastTradedPrice[2, CALL] == 12.5
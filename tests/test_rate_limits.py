@@ -0,0 +1,20 @@
+from utradeconnect.apiConfig import get_rate_limits
+from utradeconnect.request import APIRequest
+
+
+def scheduler(rate_limits):
+    request = APIRequest(base_url='http://127.0.0.1:1', rate_limits=rate_limits)
+    request.close()
+    return request.scheduler
+
+
+def test_client_side_limiting_is_off_by_default():
+    assert scheduler(None) is None
+    assert scheduler(False) is None
+
+
+def test_limits_are_opt_in():
+    assert set(scheduler(True).buckets) == set(get_rate_limits())
+    buckets = scheduler({'market': {'rate': 2, 'burst': 4}}).buckets
+    assert (buckets['market'].rate, buckets['market'].burst) == (2, 4)
+    assert 'orders' in buckets
@@ -0,0 +1,105 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from utradeconnect.exception import UtradeInputException
+from utradeconnect.marketSocket import MDSocket_io
+from utradeconnect.replay import JournalReplay
+from utradeconnect.tickJournal import TickJournalWriter
+from utradeconnect.ticks import LTP
+
+# Noon local time, so the recorded events stay on one journal day
+NOON = int(datetime(2024, 1, 2, 12).timestamp() * 1e9)
+MS = 1000000
+
+
+def journal(directory, events, packed=False):
+    writer = TickJournalWriter(str(directory), flush_interval=0.01, packed=packed)
+    for receivedAt, event, message in events:
+        writer.record(event, message, NOON + receivedAt)
+    writer.close()
+    return writer.path
+
+
+def recording_socket(decode=False):
+    socket = MDSocket_io('', '', base_url='replay', decode=decode)
+    received = []
+    socket.on_message1501_json_partial = lambda data: received.append(('1501', data))
+    socket.on_message1512_json_partial = lambda data: received.append(('1512', data))
+    socket.on_message1512_json_full = lambda data: received.append(('1512-full', data))
+    return socket, received
+
+
+EVENTS = [
+    (0, '1501-json-partial', 't:1_22,ltp:10'),
+    (100 * MS, '1512-json-partial', 't:1_22,ltp:11'),
+    (200 * MS, '1512-json-full', '{"LastTradedPrice": 12}'),
+]
+
+
+def test_events_reach_the_callbacks_as_recorded(tmp_path):
+    path = journal(tmp_path, EVENTS)
+    socket, received = recording_socket()
+    result = JournalReplay(socket, path).run()
+    assert received == [('1501', 't:1_22,ltp:10'), ('1512', 't:1_22,ltp:11'), ('1512-full', '{"LastTradedPrice": 12}')]
+    assert result['events'] == 3 and result['eventsPerSecond'] > 0
+
+
+def test_packed_journals_deliver_records(tmp_path):
+    path = journal(tmp_path, EVENTS[1:2], packed=True)
+    socket, received = recording_socket()
+    JournalReplay(socket, path).run()
+    assert received == [('1512', LTP(1, 22, 11.0))]
+
+
+def test_window_and_event_filters(tmp_path):
+    path = journal(tmp_path, EVENTS)
+    socket, received = recording_socket()
+    assert JournalReplay(socket, path).run(start=NOON + 1, end=NOON + 200 * MS)['events'] == 1
+    assert received == [('1512', 't:1_22,ltp:11')]
+    del received[:]
+    JournalReplay(socket, path).run(events=(1501,))
+    assert received == [('1501', 't:1_22,ltp:10')]
+
+
+def test_directories_replay_their_days_in_order(tmp_path):
+    journal(tmp_path, EVENTS[:1])
+    journal(tmp_path, [(86400 * 10 ** 9, '1512-json-partial', 't:1_22,ltp:13')])
+    socket, received = recording_socket()
+    JournalReplay(socket, str(tmp_path)).run()
+    assert received == [('1501', 't:1_22,ltp:10'), ('1512', 't:1_22,ltp:13')]
+    (tmp_path / 'empty').mkdir()
+    with pytest.raises(UtradeInputException):
+        JournalReplay(socket, str(tmp_path / 'empty'))
+
+
+def test_speed_paces_the_recorded_gaps(tmp_path):
+    path = journal(tmp_path, EVENTS)
+    socket, received = recording_socket()
+    replay = JournalReplay(socket, path)
+    times = []
+    socket.on_message1512_json_partial = socket.on_message1512_json_full = lambda data: times.append(time.perf_counter())
+
+    started = time.perf_counter()
+    assert replay.run(speed=1.0)['seconds'] >= 0.2
+    assert times[0] - started >= 0.1 and times[1] - started >= 0.2
+    # Twice as fast halves the gaps
+    assert 0.1 <= replay.run(speed=2.0)['seconds'] < 0.2
+    assert replay.run()['seconds'] < 0.1
+    with pytest.raises(UtradeInputException):
+        replay.run(speed=-1)
+
+
+def test_stop_ends_a_paced_replay(tmp_path):
+    path = journal(tmp_path, [(0, '1512-json-partial', 't:1_22,ltp:10'), (60 * 10 ** 9, '1512-json-partial', 't:1_22,ltp:11')])
+    socket, received = recording_socket()
+    replay = JournalReplay(socket, path)
+    thread = replay.start()
+    deadline = time.monotonic() + 5
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+    replay.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert received == [('1512', 't:1_22,ltp:10')]
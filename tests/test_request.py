@@ -0,0 +1,68 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from utradeconnect import base
+from utradeconnect.index import UtradeConnect
+from utradeconnect.request import APIRequest
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"type": "success"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_port)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_pool_stats_count_reused_connections(server):
+    request = APIRequest(base_url=server)
+    for _ in range(3):
+        request.reqsession.get(server + '/').raise_for_status()
+    stats = request.get_pool_stats()['hosts']
+    request.close()
+    host = stats['http://127.0.0.1:{}'.format(server.rsplit(':', 1)[1])]
+    assert host == {'connections_opened': 1, 'requests': 3, 'reused': 2, 'idle': 1}
+
+
+def test_pool_stats_survive_missing_urllib3_internals():
+    request = APIRequest(base_url='http://127.0.0.1:1')
+    pools = request.reqsession.get_adapter('https://').poolmanager.pools
+    pools[('https', 'example.com', 443)] = object()
+    stats = request.get_pool_stats()
+    request.close()
+    assert stats['hosts'] == {'None://None:None': {'connections_opened': None, 'requests': None,
+                                                   'reused': None, 'idle': None}}
+
+
+def test_combined_client_shares_one_transport(monkeypatch):
+    created = []
+
+    class CountingRequest(APIRequest):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(base, 'APIRequest', CountingRequest)
+    client = UtradeConnect('key', 'secret', 'WEBAPI', root='http://127.0.0.1:1/',
+                           market_data_api_key='mkey', market_data_api_secret='msecret')
+    client.apiRequest.close()
+    assert created == [client.apiRequest]
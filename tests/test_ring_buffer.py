@@ -0,0 +1,39 @@
+import threading
+
+from utradeconnect.ringBuffer import BufferedDispatcher, RingBuffer
+
+
+def test_dispatcher_delivers_again_after_stop_and_start():
+    dispatcher = BufferedDispatcher(16)
+    seen = []
+    delivered = threading.Event()
+
+    def callback(data):
+        seen.append(data)
+        if len(seen) == 2:
+            delivered.set()
+
+    dispatcher.start()
+    dispatcher.submit(callback, 1)
+    dispatcher.stop(timeout=5)
+    assert seen == [1] and dispatcher.buffer.closed
+    # A stopped dispatcher discards submissions until it is started again
+    dispatcher.submit(callback, 'lost')
+    dispatcher.start()
+    assert all(thread.is_alive() for thread in dispatcher._threads)
+    dispatcher.submit(callback, 2)
+    assert delivered.wait(5)
+    dispatcher.stop(timeout=5)
+    assert seen == [1, 2]
+    assert dispatcher.stats()['pushed'] == 2
+
+
+def test_closed_buffer_hands_out_what_is_left_then_none():
+    buffer = RingBuffer(4)
+    buffer.put('a')
+    buffer.close()
+    assert not buffer.put('b')
+    assert buffer.get() == 'a'
+    assert buffer.get() is None
+    buffer.reopen()
+    assert buffer.put('c') and buffer.get(timeout=1) == 'c'
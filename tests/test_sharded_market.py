@@ -0,0 +1,78 @@
+import multiprocessing
+
+import pytest
+
+from utradeconnect.exception import UtradeGeneralException
+from utradeconnect.shardedMarket import GAP, SharedRing, ShardedMarketData, decode_record, encode_gap
+
+
+def test_blocking_ring_rejects_messages_larger_than_half_its_capacity():
+    ring = SharedRing(64, overflow='block')
+    try:
+        assert ring.put(b'x' * 20)
+        ring.get_many()
+        # Would need the wrap skip plus itself, more than the whole ring, and block forever
+        assert not ring.put(b'x' * 40)
+        assert ring.stats()['dropped'] == 1
+        assert ring.put(b'x' * 28)
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def failing_client():
+    raise RuntimeError('login refused')
+
+
+def test_worker_failure_is_raised_to_the_reader():
+    sharded = ShardedMarketData(failing_client, {1501: [{'exchangeSegment': 1, 'exchangeInstrumentID': 22}]},
+                                shards=1, ring_size=4096, start_method='fork').start()
+    try:
+        with pytest.raises(UtradeGeneralException, match='login refused'):
+            next(iter(sharded))
+    finally:
+        sharded.stop()
+
+
+def test_ring_under_a_lock_round_trips_across_the_wrap():
+    ring = SharedRing(64, overflow='drop', lock=multiprocessing.Lock())
+    try:
+        for round in range(10):
+            assert ring.put(bytes([round]) * 20)
+            assert ring.get_many() == [bytes([round]) * 20]
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_attached_ring_is_not_unlinked_when_the_worker_exits():
+    ring = SharedRing(4096)
+    try:
+        process = multiprocessing.get_context('spawn').Process(target=_attach_and_put, args=(ring.name,))
+        process.start()
+        process.join(30)
+        assert process.exitcode == 0
+        assert ring.get_many() == [b'from worker']
+        # Still mapped by name once the worker and its resource tracker are gone
+        again = SharedRing(4096, name=ring.name)
+        again.close()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def _attach_and_put(name):
+    ring = SharedRing(4096, name=name)
+    ring.put(b'from worker')
+    ring.close()
+
+
+def test_oversize_gap_is_sent_without_its_snapshot():
+    gap = {'disconnectedAt': 1.0, 'reconnectedAt': 2.0, 'duration': 1.0, 'relogin': False, 'resubscribed': 3,
+           'errors': [], 'snapshot': {1501: {'listQuotes': [str(index) * 200 for index in range(10)]}}}
+    assert decode_record(encode_gap(gap, 4096)) == (GAP, gap)
+    eventCode, trimmed = decode_record(encode_gap(gap, 1024))
+    assert eventCode == GAP
+    assert trimmed['snapshot'] == {} and trimmed['resubscribed'] == 3
+    assert 'exceeds the shard ring message limit of 1024 bytes' in trimmed['errors'][0]
+    assert gap['errors'] == []
@@ -0,0 +1,105 @@
+import pytest
+
+from utradeconnect.exception import UtradeGeneralException
+from utradeconnect.subscriptionManager import SubscriptionManager
+
+
+class FakeConnect:
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def send_subscription(self, instruments, eventCode):
+        return self._send('subscribe', instruments, eventCode)
+
+    def send_unsubscription(self, instruments, eventCode):
+        return self._send('unsubscribe', instruments, eventCode)
+
+    def _send(self, action, instruments, eventCode):
+        if self.fail:
+            raise UtradeGeneralException('Subscription failed')
+        self.calls.append((action, eventCode, [instrument['exchangeInstrumentID'] for instrument in instruments]))
+        return {'type': 'success'}
+
+
+def instruments(*ids, segment=1):
+    return [{'exchangeSegment': segment, 'exchangeInstrumentID': instrumentId} for instrumentId in ids]
+
+
+def test_overlapping_strategies_share_references():
+    connect = FakeConnect()
+    manager = SubscriptionManager(connect)
+    manager.subscribe(instruments(22, 23), 1501)
+    manager.subscribe(instruments(23, 24), 1501)
+    assert connect.calls == [('subscribe', 1501, [22, 23]), ('subscribe', 1501, [24])]
+    assert manager.refcount({'exchangeSegment': 'NSECM', 'exchangeInstrumentID': '23'}, 1501) == 2
+
+    manager.unsubscribe(instruments(22, 23), 1501)
+    assert connect.calls[-1] == ('unsubscribe', 1501, [22])
+    assert [row['exchangeInstrumentID'] for row in manager.subscribed(1501)] == [23, 24]
+    # Instruments without a reference are ignored
+    assert manager.unsubscribe(instruments(22, 99), 1501) == []
+    assert len(connect.calls) == 3
+
+
+def test_changes_cancel_out_inside_a_batch():
+    connect = FakeConnect()
+    manager = SubscriptionManager(connect)
+    manager.subscribe(instruments(22), 1501)
+    with manager.batch():
+        manager.subscribe(instruments(30), 1501)
+        manager.unsubscribe(instruments(30), 1501)
+        manager.unsubscribe(instruments(22), 1501)
+        manager.subscribe(instruments(22), 1501)
+        with manager.batch():
+            manager.subscribe(instruments(40), 1512)
+        assert manager.pending() == {'subscribe': 1, 'unsubscribe': 0}
+    assert connect.calls == [('subscribe', 1501, [22]), ('subscribe', 1512, [40])]
+
+
+def test_flush_sends_unsubscriptions_first_in_chunks_per_event():
+    connect = FakeConnect()
+    manager = SubscriptionManager(connect, max_instruments=3, auto_flush=False)
+    manager.subscribe(instruments(1, 2), 1502)
+    manager.flush()
+    manager.subscribe(instruments(*range(10, 17)), 1501)
+    manager.subscribe(instruments(5), 1512)
+    manager.unsubscribe(instruments(1, 2), 1502)
+    assert connect.calls == [('subscribe', 1502, [1, 2])]
+
+    sent = manager.flush()
+    assert [(action, eventCode) for action, eventCode, _, _ in sent] == [
+        ('unsubscribe', 1502), ('subscribe', 1501), ('subscribe', 1501), ('subscribe', 1501), ('subscribe', 1512)]
+    assert [call[2] for call in connect.calls[1:]] == [[1, 2], [10, 11, 12], [13, 14, 15], [16], [5]]
+    assert sent[1][2][0] == {'exchangeSegment': 1, 'exchangeInstrumentID': 10}
+    assert manager.calls == 6 and manager.flush() == []
+
+
+def test_failed_calls_stay_pending():
+    connect = FakeConnect()
+    manager = SubscriptionManager(connect, max_instruments=2, auto_flush=False)
+    manager.subscribe(instruments(1, 2, 3), 1501)
+    connect.fail = True
+    with pytest.raises(UtradeGeneralException):
+        manager.flush()
+    assert manager.pending() == {'subscribe': 3, 'unsubscribe': 0}
+    connect.fail = False
+    manager.flush()
+    assert [call[2] for call in connect.calls] == [[1, 2], [3]]
+    assert manager.pending() == {'subscribe': 0, 'unsubscribe': 0}
+
+
+def test_resubscribe_sends_every_referenced_pair_again():
+    connect = FakeConnect()
+    manager = SubscriptionManager(connect, max_instruments=2)
+    manager.subscribe(instruments(1, 2, 3), 1501)
+    manager.subscribe(instruments(4, segment=2), 1502)
+    manager.auto_flush = False
+    # Pending changes go out with the resubscription
+    manager.unsubscribe(instruments(3), 1501)
+    manager.subscribe(instruments(9), 1512)
+    del connect.calls[:]
+
+    manager.resubscribe()
+    assert connect.calls == [('subscribe', 1501, [1, 2]), ('subscribe', 1502, [4]), ('subscribe', 1512, [9])]
+    assert len(manager.subscribed()) == 4
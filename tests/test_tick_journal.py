@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from utradeconnect.exception import UtradeDataException, UtradeInputException
+from utradeconnect.marketSocket import MDSocket_io
+from utradeconnect.tickJournal import PACKED, TickJournalReader, TickJournalWriter
+from utradeconnect.ticks import Touchline, decode_event
+
+
+def test_raw_records_round_trip(tmp_path):
+    writer = TickJournalWriter(str(tmp_path), flush_interval=0.01, packed=False)
+    writer.record('1501-json-partial', 't:1_22,ltp:10')
+    writer.close()
+    with TickJournalReader(writer.path) as reader:
+        assert [record.data for record in reader] == ['t:1_22,ltp:10']
+
+
+def test_packed_records_keep_the_decoded_fields(tmp_path):
+    full = json.dumps({'ExchangeSegment': 2, 'ExchangeInstrumentID': 5, 'ExchangeTimeStamp': 7,
+                       'Bids': [{'Size': 5, 'Price': 9.5, 'TotalOrders': 1}],
+                       'Asks': [{'Size': 3, 'Price': 10.0, 'TotalOrders': 2}],
+                       'Touchline': {'LastTradedPrice': 9.75, 'TotalTradedQuantity': 100}})
+    messages = [('1501-json-partial', 't:1_22,ltp:10,v:100'), ('1502-json-full', full), ('1512-json-partial', 'bad')]
+    writer = TickJournalWriter(str(tmp_path), flush_interval=0.01)
+    for event, message in messages:
+        writer.record(event, message)
+    writer.close()
+    with TickJournalReader(writer.path) as reader:
+        records = [record.data for record in reader]
+        flags = [flags for _, flags, _, _, _ in reader.iter_raw()]
+    assert records[:2] == [decode_event(event, message) for event, message in messages[:2]]
+    assert isinstance(records[1].touchline, Touchline)
+    # A message that cannot be decoded is kept as received
+    assert records[2] == 'bad'
+    assert [bool(flag & PACKED) for flag in flags] == [True, True, False]
+
+
+def test_rejects_unsupported_payload(tmp_path):
+    writer = TickJournalWriter(str(tmp_path), flush_interval=0.01)
+    with pytest.raises(UtradeInputException):
+        writer.record('1501-json-full', {'LastTradedPrice': 10})
+    writer.close()
+
+
+def test_write_failure_is_reported(tmp_path):
+    # A file that is not a journal occupies today's journal name
+    writer = TickJournalWriter(str(tmp_path), flush_interval=0.01)
+    writer.record('1501-json-partial', 't:1_22,ltp:10')
+    writer.flush()
+    path = writer.path
+    writer.close()
+    with open(path, 'wb') as file:
+        file.write(b'not a journal at all')
+    writer = TickJournalWriter(str(tmp_path), flush_interval=0.01)
+    writer.record('1501-json-partial', 't:1_22,ltp:11')
+    with pytest.raises(UtradeDataException):
+        writer.flush(timeout=5)
+    with pytest.raises(UtradeDataException):
+        writer.record('1501-json-partial', 't:1_22,ltp:12')
+    with pytest.raises(UtradeDataException):
+        writer.close()
+    with open(path, 'rb') as file:
+        assert file.read() == b'not a journal at all'
+
+
+def test_failed_journal_does_not_stop_market_data():
+    class BrokenJournal:
+        def record(self, event, data):
+            raise UtradeDataException('disk full')
+
+    socket = MDSocket_io('token', 'user', base_url='http://127.0.0.1:1', journal=BrokenJournal())
+    delivered = []
+    socket.on_message1501_json_partial = delivered.append
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:10')
+    socket.dispatch_event('1501-json-partial', 't:1_22,ltp:11')
+    assert delivered == ['t:1_22,ltp:10', 't:1_22,ltp:11']
+    assert socket.journal_errors == 2
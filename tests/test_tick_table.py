@@ -0,0 +1,91 @@
+import multiprocessing
+
+import pytest
+
+from utradeconnect import tickTable
+from utradeconnect.exception import UtradeDataException
+from utradeconnect.tickTable import LatestTickTable
+from utradeconnect.ticks import LTP, Touchline
+
+UPDATES = 20000
+
+
+def touchline(n, segment=1):
+    return Touchline(exchangeSegment=segment, exchangeInstrumentID=22, lastTradedPrice=float(n),
+                     lastTradedQuantity=n, totalTradedQuantity=n, averageTradedPrice=float(n), open=float(n),
+                     high=float(n), low=float(n), close=float(n), bidPrice=float(n), bidSize=n, askPrice=float(n),
+                     askSize=n, totalBuyQuantity=n, totalSellQuantity=n, lastTradedTime=n, lastUpdateTime=n,
+                     exchangeTimeStamp=n)
+
+
+def write_touchlines(table, ready):
+    # Forked, the child writes through its copy of the parent's mapping
+    ready.set()
+    for n in range(1, UPDATES + 1):
+        table.update(touchline(n))
+
+
+def assert_consistent(tick):
+    values = {tick.lastTradedPrice, tick.lastTradedQuantity, tick.totalTradedQuantity, tick.averageTradedPrice,
+              tick.open, tick.high, tick.low, tick.close, tick.bidPrice, tick.bidSize, tick.askPrice,
+              tick.askSize, tick.totalBuyQuantity, tick.totalSellQuantity, tick.lastTradedTime,
+              tick.lastUpdateTime, tick.exchangeTimeStamp}
+    assert len(values) == 1, tick
+
+
+@pytest.mark.parametrize('orderedStores', [True, False])
+def test_readers_never_see_a_half_written_row(monkeypatch, orderedStores):
+    monkeypatch.setattr(tickTable, 'ORDERED_STORES', orderedStores)
+    writer = LatestTickTable(capacity=4)
+    writer.update(touchline(0))
+    context = multiprocessing.get_context('fork')
+    ready = context.Event()
+    process = context.Process(target=write_touchlines, args=(writer, ready))
+    reader = LatestTickTable(writer.name)
+    try:
+        process.start()
+        ready.wait(10)
+        last = 0
+        while process.is_alive() or last < UPDATES:
+            tick = reader.get(1, 22)
+            assert_consistent(tick)
+            assert tick.lastTradedQuantity >= last
+            last = tick.lastTradedQuantity
+        process.join(10)
+        assert last == UPDATES
+    finally:
+        reader.close()
+        writer.close()
+        writer.unlink()
+
+
+def test_read_gives_up_on_a_row_left_mid_write():
+    writer = LatestTickTable(capacity=4)
+    reader = LatestTickTable(writer.name, read_timeout=0.05)
+    try:
+        writer.update(touchline(1))
+        # A writer that died between the two sequence increments
+        writer._sequences[0] += 1
+        with pytest.raises(UtradeDataException, match='mid-write'):
+            reader.get(1, 22)
+        writer._sequences[0] += 1
+        assert reader.get(1, 22).lastTradedQuantity == 1
+    finally:
+        reader.close()
+        writer.close()
+        writer.unlink()
+
+
+def test_segment_names_share_the_row_of_their_code_and_missing_segments_are_skipped():
+    with LatestTickTable(capacity=4) as table:
+        try:
+            assert table.update(touchline(1, segment='NSECM'))
+            assert table.update(LTP(exchangeSegment=1, exchangeInstrumentID=22, lastTradedPrice=101.5))
+            assert not table.update(touchline(2, segment=None))
+            assert not table.update(touchline(3, segment='NOWHERE'))
+            assert table.invalid == 2
+            assert table.keys() == [(1, 22)]
+            tick = table.get('NSECM', 22)
+            assert tick.lastTradedPrice == 101.5 and tick.totalTradedQuantity == 1
+        finally:
+            table.unlink()
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from utradeconnect.exception import UtradeDataException
+from utradeconnect.marketSocket import MDSocket_io
+from utradeconnect.ticks import (LTP, Candle, InstrumentPropertyChange, MarketDepth, Touchline, decode_event,
+                                 decode_full, decode_partial, record_fields, record_from_fields)
+
+TOUCHLINE = {
+    'LastTradedPrice': 1567.5, 'LastTradedQunatity': 75, 'TotalTradedQuantity': 4059, 'LastTradedTime': 1300000000,
+    'Open': 1560, 'High': 1570, 'Low': 1555, 'Close': 1558,
+    'BidInfo': {'Size': 58, 'Price': 1567.5, 'TotalOrders': 1},
+    'AskInfo': {'Size': 73, 'Price': 1568, 'TotalOrders': 2},
+}
+DEPTH = {
+    'ExchangeSegment': 1, 'ExchangeInstrumentID': 22, 'ExchangeTimeStamp': 1300000001, 'Touchline': TOUCHLINE,
+    'Bids': [{'Size': 58, 'Price': 1567.5, 'TotalOrders': 1}, {'Size': 10, 'Price': 1567, 'TotalOrders': 3}],
+    'Asks': [{'Size': 73, 'Price': 1568, 'TotalOrders': 2}],
+}
+
+
+def test_values_holding_colons_keep_their_keys_aligned():
+    change = decode_partial(1105, 't:1_22,st:Suspended,rt:09:15:00,hpb:110.5,ls:50')
+    assert change.exchangeSegment == 1 and change.exchangeInstrumentID == 22
+    assert change.status == 'Suspended'
+    assert change.highPriceBand == 110.5 and change.lotSize == 50
+    assert change.properties == {'rt': '09:15:00'}
+
+
+def test_depth_sizes_beyond_the_small_number_table_are_parsed():
+    depth = decode_partial(1502, 't:2_51601,bi:0|50|101.5|2|1|1250000|101.45|3,ai:0|25|101.55|1')
+    assert depth.bidLevels == (0, 1)
+    assert depth.bidSizes == (50, 1250000) and depth.bidOrders == (2, 3)
+    assert depth.bidPrices == (101.5, 101.45)
+    assert depth.askSizes == (25,) and depth.askPrices == (101.55,)
+
+
+def test_field_without_a_value_is_rejected():
+    with pytest.raises(UtradeDataException, match='without a value'):
+        decode_partial(1512, 't:1_22,bad')
+
+
+def test_full_touchline_is_read_by_attribute():
+    message = dict(TOUCHLINE, ExchangeSegment=1, ExchangeInstrumentID=22)
+    touchline = decode_full(1501, json.dumps(message))
+    assert type(touchline) is Touchline
+    assert (touchline.exchangeSegment, touchline.exchangeInstrumentID) == (1, 22)
+    # The misspelt server field is read as the last traded quantity
+    assert touchline.lastTradedQuantity == 75 and touchline.totalTradedQuantity == 4059
+    assert (touchline.bidSize, touchline.bidPrice, touchline.askOrders) == (58, 1567.5, 2)
+    # Already decoded dicts and bytes are accepted too
+    assert decode_full(1501, message) == touchline == decode_full(1501, json.dumps(message).encode())
+
+
+def test_full_depth_keeps_the_ladder_and_its_touchline():
+    depth = decode_full(1502, json.dumps(DEPTH))
+    assert type(depth) is MarketDepth
+    assert depth.bidPrices == (1567.5, 1567) and depth.bidOrders == (1, 3)
+    assert depth.askSizes == (73,)
+    assert depth.bidLevels is None and depth.askLevels is None
+    assert depth.touchline.lastTradedPrice == 1567.5 and depth.touchline.exchangeInstrumentID == 22
+
+
+def test_full_records_of_the_other_events():
+    candle = decode_full(1505, {'ExchangeSegment': 1, 'ExchangeInstrumentID': 22, 'BarTime': 1300000020,
+                                'BarVolume': 12, 'Open': 1, 'High': 2, 'Low': 0.5, 'Close': 1.5})
+    assert candle == Candle(1, 22, 1300000020, 12, 1, 2, 0.5, 1.5)
+    ltp = decode_full(1512, {'ExchangeSegment': 1, 'ExchangeInstrumentID': 22, 'LastTradedPrice': 10,
+                             'LastTradedQuantity': 5})
+    assert ltp == LTP(1, 22, 10, 5)
+    change = decode_full(1105, {'ExchangeSegment': 1, 'ExchangeInstrumentID': 22, 'TickSize': 0.05,
+                                'PriceBand': {'High': 110, 'Low': 90}, 'FreezeQty': 5000, 'Series': 'EQ'})
+    assert type(change) is InstrumentPropertyChange
+    assert (change.highPriceBand, change.lowPriceBand, change.freezeQuantity) == (110, 90, 5000)
+    assert change.properties == {'Series': 'EQ'}
+    assert decode_full(1507, {'message': 'open'}).message == 'open'
+
+
+def test_events_are_decoded_by_their_mode():
+    assert decode_event('1512-json-partial', 't:1_22,ltp:10,ltq:5') == LTP(1, 22, 10.0, 5)
+    assert decode_event('1512-json-full', '{"ExchangeSegment": 1, "LastTradedPrice": 10}').lastTradedPrice == 10
+
+
+def test_records_round_trip_through_plain_fields():
+    depth = decode_full(1502, DEPTH)
+    fields = record_fields(depth)
+    assert type(fields) is tuple and type(fields[9]) is tuple
+    restored = record_from_fields(1502, fields)
+    assert restored == depth and type(restored.touchline) is Touchline
+
+
+def test_socket_hands_records_to_callbacks_when_decoding():
+    received = []
+    socket = MDSocket_io('token', 'user', base_url='http://127.0.0.1:1', decode=True)
+    socket.on_message1512_json_full = received.append
+    socket.dispatch_event('1512-json-full', '{"ExchangeSegment": 1, "ExchangeInstrumentID": 22, "LastTradedPrice": 10}')
+    assert received == [LTP(1, 22, 10)]
+
+    raw = MDSocket_io('token', 'user', base_url='http://127.0.0.1:1')
+    raw.on_message1512_json_full = received.append
+    raw.dispatch_event('1512-json-full', '{"LastTradedPrice": 10}')
+    assert received[-1] == '{"LastTradedPrice": 10}'